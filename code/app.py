@@ -10,20 +10,25 @@ import plotly.express as px
 from dash import dcc, html, Dash
 from dash.dependencies import Input, Output
 from plotly.subplots import make_subplots
-from data_prep_visualizations import (
-    skills_df,
-    highest_education_level,
-    popular_major_type_df,
-    overall_years_of_exp,
-    pds_roles_df,
-    cto_roles_df,
-    consultant_roles_df,
-    time_period_latest_company,
-    num_roles_latest_company
-)
 
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
+from artifact_store import load_artifacts
+
+############# Load Precomputed Analytics #############
+### built offline by build_artifacts.py, nothing is recomputed when the app starts
+artifacts = load_artifacts()
+
+top_skills_df = artifacts['top_skills_df']
+highest_education_level = artifacts['highest_education_level']
+popular_major_type_df = artifacts['popular_major_type_df']
+overall_years_of_exp = artifacts['overall_years_of_exp']
+pds_roles_df = artifacts['pds_roles_df']
+cto_roles_df = artifacts['cto_roles_df']
+consultant_roles_df = artifacts['consultant_roles_df']
+time_period_latest_company = artifacts['time_period_latest_company']
+num_roles_latest_company = artifacts['num_roles_latest_company']
+
 ############# Initialize Dash App #############
 
 app = Dash(__name__)
@@ -40,16 +45,7 @@ def skills_barplot(profile_type):
     '''
     helper function for generating the skills barplot
     '''
-    single_profile_type_skills = skills_df[skills_df['profile_category'] == profile_type].copy()
-    skills_cols = single_profile_type_skills.columns.difference(
-        ['profile_id_dummy', 'all_skills_link', 'skills_list', 'profile_category']
-    )
-
-    top_skills = single_profile_type_skills[skills_cols].sum(axis=0).sort_values(ascending=False).reset_index()
-    top_skills.columns = ['skill_name', 'count_people']
-    top_skills['percent_people'] = round((top_skills['count_people']/single_profile_type_skills.shape[0])*100,0)
-
-    plt_df = top_skills.head(30)
+    plt_df = top_skills_df[top_skills_df['profile_category'] == profile_type]
     
     fig = px.bar(
         plt_df,
@@ -0,0 +1,109 @@
+'''
+Code for storing the precomputed analytics of the dashboard as versioned artifacts
+
+Note:
+- Every build writes all the artifacts (small aggregated dataframes) as parquet files to a new version folder
+  `data/artifacts/{version}/` together with a `manifest.json`, then points `data/artifacts/current.json` to it
+- A version folder is written under a temporary name and renamed when complete, `current.json` is replaced in one step,
+  so the dashboard never reads a half written build
+- `ARTIFACT_FORMAT_VERSION` is bumped whenever the set or the columns of the artifacts change,
+  artifacts of another format raise a ValueError instead of breaking the plots
+- Only the latest `KEEP_VERSIONS` builds are kept
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import json
+import shutil
+import pandas as pd
+
+
+######### Initializations #########
+ARTIFACTS_PATH = 'data/artifacts/'
+
+CURRENT_VERSION_FILENAME = 'current.json'
+
+MANIFEST_FILENAME = 'manifest.json'
+
+ARTIFACT_FORMAT_VERSION = 1
+
+KEEP_VERSIONS = 3
+
+
+######### Define Helper Functions #########
+
+def write_artifacts(artifacts, artifacts_path=ARTIFACTS_PATH):
+    '''
+    Helper function for writing a new version of the artifacts and making it the current one, returns the version
+
+    Inputs:
+    - artifacts: dict of artifact name to dataframe
+    - artifacts_path: string, folder with the artifact versions
+    '''
+    created_at = pd.Timestamp.now()
+    version = '{:%Y%m%d_%H%M%S}'.format(created_at)
+
+    temp_path = os.path.join(artifacts_path, '.' + version + '.tmp')
+    os.makedirs(temp_path, exist_ok=True)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'version': version,
+        'created_at': str(created_at),
+        'artifacts': {}
+    }
+    for artifact_name, artifact_df in artifacts.items():
+        artifact_filename = artifact_name + '.parquet'
+        artifact_df.to_parquet(os.path.join(temp_path, artifact_filename), index=False)
+        manifest['artifacts'][artifact_name] = {'filename': artifact_filename, 'rows': artifact_df.shape[0]}
+
+    with open(os.path.join(temp_path, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    os.replace(temp_path, os.path.join(artifacts_path, version))
+
+    ### the new version only becomes current once all its files are in place
+    temp_current = os.path.join(artifacts_path, '.' + CURRENT_VERSION_FILENAME + '.tmp')
+    with open(temp_current, 'w') as f:
+        json.dump({'version': version}, f, indent=4)
+    os.replace(temp_current, os.path.join(artifacts_path, CURRENT_VERSION_FILENAME))
+
+    ### remove the oldest builds
+    all_versions = sorted(i for i in os.listdir(artifacts_path) if not i.startswith('.') and i != CURRENT_VERSION_FILENAME)
+    for old_version in all_versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(artifacts_path, old_version))
+
+    return version
+
+
+def load_artifacts(artifacts_path=ARTIFACTS_PATH, version=None):
+    '''
+    Helper function for reading all the artifacts of a version, returns a dict of artifact name to dataframe
+
+    Inputs:
+    - artifacts_path: string, folder with the artifact versions
+    - version: string, version to read (the current one if None)
+    '''
+    if version is None:
+        current_filename = os.path.join(artifacts_path, CURRENT_VERSION_FILENAME)
+        if not os.path.exists(current_filename):
+            raise FileNotFoundError('No artifacts in ' + artifacts_path + ', build them with code/build_artifacts.py')
+
+        with open(current_filename) as f:
+            version = json.load(f)['version']
+
+    with open(os.path.join(artifacts_path, version, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+
+    if manifest['format_version'] != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            'Artifacts ' + version + ' have format ' + str(manifest['format_version']) + ', expected ' +
+            str(ARTIFACT_FORMAT_VERSION) + ', rebuild them with code/build_artifacts.py'
+        )
+
+    return {
+        artifact_name: pd.read_parquet(os.path.join(artifacts_path, version, artifact_info['filename']))
+        for artifact_name, artifact_info in manifest['artifacts'].items()
+    }
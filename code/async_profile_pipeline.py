@@ -0,0 +1,436 @@
+'''
+Code for scraping individual profiles with an asyncio pipeline
+
+Note:
+- Alternative to scrape_individual_profiles.py, uses the async playwright driver instead of selenium
+- Every worker process drives `TABS_PER_WORKER` browser tabs concurrently, the pages they fetch
+  go through bounded queues to a parse stage (process pool) and a write stage (parquet shards + queue updates)
+- Shares the work queue, page archive, global rate limiter, login cookies and blocked url patterns with
+  the selenium scraper, so both scrapers can be used on the same run
+- Throughput is set by the rate limiter budgets (rate_limiter.py), add tabs/workers until they are the limit
+- Only loads the login cookies saved by the selenium sessions, a worker checks them before claiming any profile
+  and stops with a RuntimeError if they are expired (log in again with browser_sessions.BrowserSession)
+- Run from the repository root: `python code/async_profile_pipeline.py`
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import json
+import time
+import fnmatch
+import asyncio
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+from dotenv import load_dotenv
+
+### async browser driver
+from playwright.async_api import async_playwright
+
+### shared scraper building blocks
+from browser_sessions import BLOCKED_URL_PATTERNS, COOKIES_FILENAME, LINKEDIN_URL, SCRAPE_MODE, SCRAPE_MODES
+from page_archive import PageArchive, new_run_name
+from profile_parser import ALL_SKILLS_LINK_PATTERN, _parse_profile_safe
+from profile_shards import ProfileShardWriter
+from scrape_queue import ScrapeQueue
+from rate_limiter import RATE_LIMITER_FILENAME, THROTTLED_URL_MARKERS, RateLimiter, page_request_ok
+from pipeline_config import PAGE_ARCHIVE_FOLDER, SCRAPE_LOG_FILENAME, SCRAPE_QUEUE_FILENAME, SCRAPED_PROFILES_PATH
+from scraper_common import ERROR_LOG_STRING_FORMAT, error_logging_helper, setup_scrape_queue
+
+
+######### Initializations #########
+load_dotenv()
+
+NUM_WORKERS = int(os.environ.get('NUM_SCRAPE_WORKERS', 2))
+
+TABS_PER_WORKER = int(os.environ.get('TABS_PER_WORKER', 4))
+
+PARSER_PROCESSES_PER_WORKER = 2
+
+### bounded queues between the stages, fetching pauses when parsing or writing falls behind
+FETCHED_QUEUE_SIZE = 16
+PARSED_QUEUE_SIZE = 16
+
+PAGE_READY_TIMEOUT_MS = 20000
+
+PROFILE_READY_SELECTORS = ['#experience', '#education', 'span.pvs-navigation__text']
+
+SKILLS_READY_SELECTOR = 'span.mr1.t-bold > span.visually-hidden'
+
+BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font'}
+
+logger = error_logging_helper(SCRAPE_LOG_FILENAME)
+
+ALL_SKILLS_LINK_SCRIPT = '''
+    (pattern) => {
+        const regex = new RegExp(pattern);
+        const span = [...document.querySelectorAll('span.pvs-navigation__text')].find(i => regex.test(i.textContent));
+        const link = span ? span.parentElement.parentElement.querySelector('a') : null;
+        return link ? link.href : null;
+    }
+'''
+
+
+######### Define Helper Functions #########
+
+def selenium_cookies_to_playwright(selenium_cookies):
+    '''
+    Helper function for converting cookies saved by browser_sessions (selenium format) to playwright format
+
+    Inputs:
+    - selenium_cookies: list of dicts, cookies as returned by selenium `get_cookies`
+    '''
+    playwright_cookies = []
+    for cookie in selenium_cookies:
+        single_cookie = {
+            'name': cookie['name'],
+            'value': cookie['value'],
+            'domain': cookie['domain'],
+            'path': cookie.get('path', '/'),
+            'httpOnly': cookie.get('httpOnly', False),
+            'secure': cookie.get('secure', False)
+        }
+        if 'expiry' in cookie:
+            single_cookie['expires'] = cookie['expiry']
+        if cookie.get('sameSite') in ('Strict', 'Lax', 'None'):
+            single_cookie['sameSite'] = cookie['sameSite']
+
+        playwright_cookies.append(single_cookie)
+
+    return playwright_cookies
+
+
+async def block_resources(route):
+    '''
+    Helper function used as the playwright route handler in 'lite' mode,
+    aborts images, media, fonts and third party tracking requests
+    '''
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+        fnmatch.fnmatch(request.url, i) for i in BLOCKED_URL_PATTERNS
+    ):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def acquire_rate_limit(db_call, endpoint):
+    '''
+    Helper function for waiting on the global rate limiter without blocking the event loop
+
+    Inputs:
+    - db_call: coroutine function running sqlite work on the dedicated db thread
+    - endpoint: string, key of `rate_limiter.ENDPOINT_BUDGETS`
+    '''
+    seconds_to_wait = await db_call(lambda resources: resources['limiter'].try_acquire(endpoint))
+
+    while seconds_to_wait > 0:
+        await asyncio.sleep(seconds_to_wait)
+        seconds_to_wait = await db_call(lambda resources: resources['limiter'].try_acquire(endpoint))
+
+
+async def wait_for_selectors(page, selectors, endpoint, db_call):
+    '''
+    Helper function for waiting until all selectors are on the page, the outcome is
+    reported to the global rate limiter
+
+    Inputs:
+    - page: playwright page (browser tab)
+    - selectors: list of css selectors
+    - endpoint: string, key of `rate_limiter.ENDPOINT_BUDGETS`
+    - db_call: coroutine function running sqlite work on the dedicated db thread
+    '''
+    request_ok = False
+    try:
+        for selector in selectors:
+            await page.wait_for_selector(selector, state='attached', timeout=PAGE_READY_TIMEOUT_MS)
+        request_ok = page_request_ok(True, page.url)
+    finally:
+        await db_call(lambda resources: resources['limiter'].record_result(endpoint, request_ok))
+
+
+async def fetch_profile_pages(page, profile_url, db_call):
+    '''
+    Helper function for fetching the main profile page and the skills page in one tab,
+    returns (profile_html, skills_html, all_skills_link)
+
+    Inputs:
+    - page: playwright page (browser tab)
+    - profile_url: string, url of the profile
+    - db_call: coroutine function running sqlite work on the dedicated db thread
+    '''
+    await acquire_rate_limit(db_call, 'profile_page')
+    await page.goto(profile_url, wait_until='domcontentloaded')
+
+    ### scrolling makes linkedin load the lazy sections
+    await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+    await page.evaluate('window.scrollTo(0, 700)')
+    await wait_for_selectors(page, PROFILE_READY_SELECTORS, 'profile_page', db_call)
+
+    profile_html = await page.content()
+    all_skills_link = await page.evaluate(ALL_SKILLS_LINK_SCRIPT, ALL_SKILLS_LINK_PATTERN.pattern)
+
+    if all_skills_link is None:
+        raise ValueError('No "Show all skills" link found on ' + profile_url)
+
+    await acquire_rate_limit(db_call, 'skills_page')
+    await page.goto(all_skills_link, wait_until='domcontentloaded')
+    await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+    await wait_for_selectors(page, [SKILLS_READY_SELECTOR], 'skills_page', db_call)
+
+    skills_html = await page.content()
+
+    return profile_html, skills_html, all_skills_link
+
+
+async def check_logged_in(page):
+    '''
+    Helper function for making sure the saved cookies still log the browser in,
+    raises a RuntimeError when linkedin sends the tab to the login page instead
+
+    Inputs:
+    - page: playwright page (browser tab) of a context with the saved cookies
+    '''
+    await page.goto(LINKEDIN_URL + '/feed/', wait_until='domcontentloaded')
+
+    if any(i in page.url for i in THROTTLED_URL_MARKERS + ['/login']):
+        raise RuntimeError(
+            'The saved cookies in ' + COOKIES_FILENAME + ' are expired (redirected to ' + page.url + '), ' +
+            'log in again with browser_sessions.BrowserSession (e.g. run scrape_individual_profiles.py) to renew them'
+        )
+
+
+######### Pipeline Stages #########
+
+async def fetch_stage(tab_num, page, worker_name, db_call, fetched_queue, pipeline_stats):
+    '''
+    Fetch stage, one coroutine per tab. Claims profiles from the work queue until nothing is left,
+    archives the raw pages and hands them to the parse stage
+
+    Inputs:
+    - tab_num: int, number of the tab inside the worker
+    - page: playwright page (browser tab)
+    - worker_name: string, name of the worker process
+    - db_call: coroutine function running sqlite work on the dedicated db thread
+    - fetched_queue: asyncio.Queue, bounded queue towards the parse stage
+    - pipeline_stats: dict, counters of the worker
+    '''
+    tab_name = worker_name + '_tab_' + str(tab_num)
+
+    while True:
+        job = await db_call(lambda resources: resources['queue'].claim_next(tab_name))
+
+        if job is None:
+            seconds_to_wait = await db_call(lambda resources: resources['queue'].seconds_until_next_retry())
+            if seconds_to_wait is None:
+                break
+            await asyncio.sleep(seconds_to_wait)
+            continue
+
+        profile_id, profile_url = job
+        fetch_start = time.time()
+
+        try:
+            profile_html, skills_html, all_skills_link = await fetch_profile_pages(page, profile_url, db_call)
+        except Exception as err_str:
+            pipeline_stats['fetch_failed'] += 1
+            await db_call(lambda resources: resources['queue'].mark_failed(profile_id, str(err_str)))
+            logger.error(
+                ERROR_LOG_STRING_FORMAT.format(
+                    section_title = 'Error in Fetching Profile (async pipeline)',
+                    description = 'Error for  Profile Dummy ID: ' + str(profile_id),
+                    error_message = str(err_str) + "\n" + str(traceback.format_exc())
+                )
+            )
+            continue
+
+        pipeline_stats['fetch_seconds'] += time.time() - fetch_start
+        pipeline_stats['fetched'] += 1
+
+        await db_call(lambda resources: (
+            resources['archive'].put_page(profile_id, profile_url, 'profile', profile_html, page_url=profile_url),
+            resources['archive'].put_page(profile_id, profile_url, 'skills', skills_html, page_url=all_skills_link)
+        ))
+
+        await fetched_queue.put((profile_id, profile_html, skills_html, all_skills_link))
+
+
+async def parse_stage(parser_pool, fetched_queue, parsed_queue):
+    '''
+    Parse stage, hands the fetched pages to the parser processes
+
+    Inputs:
+    - parser_pool: ProcessPoolExecutor running profile_parser
+    - fetched_queue: asyncio.Queue, pages coming from the fetch stage (None ends the stage)
+    - parsed_queue: asyncio.Queue, bounded queue towards the write stage
+    '''
+    loop = asyncio.get_running_loop()
+
+    while True:
+        page_tuple = await fetched_queue.get()
+        if page_tuple is None:
+            break
+
+        parsed_profile = await loop.run_in_executor(parser_pool, _parse_profile_safe, page_tuple)
+        await parsed_queue.put(parsed_profile)
+
+
+async def write_stage(db_call, shard_writer, parsed_queue, pipeline_stats):
+    '''
+    Write stage, adds every parsed profile to the parquet shards and marks the profiles
+    of a shard done once it is written
+
+    Inputs:
+    - db_call: coroutine function running sqlite work on the dedicated db thread
+    - shard_writer: ProfileShardWriter of the worker
+    - parsed_queue: asyncio.Queue, parsed profiles coming from the parse stage (None ends the stage)
+    - pipeline_stats: dict, counters of the worker
+    '''
+    while True:
+        parsed_profile = await parsed_queue.get()
+        if parsed_profile is None:
+            break
+
+        profile_id = parsed_profile.profile_id_dummy
+
+        if parsed_profile.error != '':
+            pipeline_stats['parse_failed'] += 1
+            await db_call(lambda resources: resources['queue'].mark_failed(profile_id, parsed_profile.error))
+            continue
+
+        written_ids = await asyncio.to_thread(shard_writer.add, parsed_profile)
+        await db_call(lambda resources: [resources['queue'].mark_done(i) for i in written_ids])
+        pipeline_stats['written'] += len(written_ids)
+
+    written_ids = await asyncio.to_thread(shard_writer.close)
+    await db_call(lambda resources: [resources['queue'].mark_done(i) for i in written_ids])
+    pipeline_stats['written'] += len(written_ids)
+
+
+######### Worker Process #########
+
+async def run_pipeline(worker_name, run_name, scrape_mode):
+    '''
+    Runs the fetch, parse and write stages of one worker process
+
+    Inputs:
+    - worker_name: string, name of the worker
+    - run_name: string, name of the run, raw pages are archived into `{run_name}.pack`
+    - scrape_mode: string, key of `browser_sessions.SCRAPE_MODES`
+    '''
+    pipeline_stats = {
+        'worker_name': worker_name, 'fetched': 0, 'written': 0,
+        'fetch_failed': 0, 'parse_failed': 0, 'fetch_seconds': 0.0
+    }
+    worker_start = time.time()
+
+    ### sqlite connections can only be used from the thread that opened them
+    loop = asyncio.get_running_loop()
+    db_executor = ThreadPoolExecutor(max_workers=1)
+    db_resources = await loop.run_in_executor(db_executor, lambda: {
+        'queue': ScrapeQueue(SCRAPE_QUEUE_FILENAME),
+        'archive': PageArchive(PAGE_ARCHIVE_FOLDER, run_name=run_name),
+        'limiter': RateLimiter(RATE_LIMITER_FILENAME)
+    })
+
+    async def db_call(function):
+        return await loop.run_in_executor(db_executor, function, db_resources)
+
+    with open(COOKIES_FILENAME) as f:
+        saved_cookies = selenium_cookies_to_playwright(json.load(f))
+
+    fetched_queue = asyncio.Queue(maxsize=FETCHED_QUEUE_SIZE)
+    parsed_queue = asyncio.Queue(maxsize=PARSED_QUEUE_SIZE)
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=SCRAPE_MODES[scrape_mode]['headless'])
+        context = await browser.new_context()
+        await context.add_cookies(saved_cookies)
+
+        if SCRAPE_MODES[scrape_mode]['block_resources']:
+            await context.route('**/*', block_resources)
+
+        pages = [await context.new_page() for _ in range(TABS_PER_WORKER)]
+
+        ### with expired cookies every profile would end up on the login page, stop before claiming any
+        await check_logged_in(pages[0])
+
+        with ProcessPoolExecutor(max_workers=PARSER_PROCESSES_PER_WORKER) as parser_pool:
+            parse_tasks = [
+                asyncio.create_task(parse_stage(parser_pool, fetched_queue, parsed_queue))
+                for _ in range(PARSER_PROCESSES_PER_WORKER)
+            ]
+            shard_writer = ProfileShardWriter(SCRAPED_PROFILES_PATH, worker_name, run_name)
+            write_task = asyncio.create_task(write_stage(db_call, shard_writer, parsed_queue, pipeline_stats))
+
+            await asyncio.gather(*[
+                fetch_stage(tab_num, page, worker_name, db_call, fetched_queue, pipeline_stats)
+                for tab_num, page in enumerate(pages)
+            ])
+
+            ### fetching is done, let the parse and write stages drain their queues
+            for _ in parse_tasks:
+                await fetched_queue.put(None)
+            await asyncio.gather(*parse_tasks)
+
+            await parsed_queue.put(None)
+            await write_task
+
+        await browser.close()
+
+    await db_call(lambda resources: [i.close() for i in resources.values()])
+    db_executor.shutdown()
+
+    pipeline_stats['wall_seconds'] = round(time.time() - worker_start, 1)
+    pipeline_stats['fetch_seconds'] = round(pipeline_stats['fetch_seconds'], 1)
+    pipeline_stats['profiles_per_minute'] = round(
+        pipeline_stats['written']/(pipeline_stats['wall_seconds']/60), 2
+    )
+
+    return pipeline_stats
+
+
+def run_pipeline_worker(worker_name, run_name, scrape_mode=SCRAPE_MODE):
+    '''
+    Helper function for running the pipeline of one worker in its own process (and event loop)
+
+    Inputs:
+    - worker_name: string, name of the worker
+    - run_name: string, name of the run, raw pages are archived into `{run_name}.pack`
+    - scrape_mode: string, key of `browser_sessions.SCRAPE_MODES`
+    '''
+    return asyncio.run(run_pipeline(worker_name, run_name, scrape_mode))
+
+
+######### Main block for combining everything together #########
+
+if __name__ == '__main__':
+    ### queue set up is the same as for the selenium scraper
+    scrape_queue = setup_scrape_queue()
+
+    if not os.path.exists(COOKIES_FILENAME):
+        raise FileNotFoundError(
+            COOKIES_FILENAME + ' not found, log in once with browser_sessions.BrowserSession to create it'
+        )
+
+    print('Workers: ', NUM_WORKERS, ' Tabs per Worker: ', TABS_PER_WORKER, ' Scrape Mode: ', SCRAPE_MODE)
+
+    run_name = new_run_name()
+    start = time.time()
+
+    ### the workers are not daemonic (unlike mp.Pool), so each of them can run its own parser processes
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS) as worker_pool:
+        result = list(worker_pool.map(
+            run_pipeline_worker,
+            ['worker_' + str(worker_num) for worker_num in range(NUM_WORKERS)],
+            [run_name]*NUM_WORKERS
+        ))
+
+    print(pd.DataFrame(result))
+    print(scrape_queue.status_counts())
+    scrape_queue.close()
+
+    end = time.time()
+    print(end-start)
@@ -0,0 +1,351 @@
+'''
+Code for managing logged in selenium browser sessions
+
+Note:
+- ChromeDriver is installed once per run (`install_chromedriver`) and the path is handed to the workers
+- The cookies of a logged in session are saved to disk, new browsers (other workers, recycled
+  browsers, restarted runs) reuse them instead of going through the login form again
+- Cookies are only saved after a successful form login, a failed login raises a RuntimeError
+- A browser is transparently recycled after `RECYCLE_AFTER_PAGES` pages or when it crashed
+- `BrowserSession.stats()` returns the counters of a session, `combine_session_stats` sums them up for the whole pool
+- Two scrape modes: 'full' (headed chrome, downloads everything) and 'lite' (headless chrome that blocks
+  images, media, fonts and third party tracking domains). Chosen with the `SCRAPE_MODE` environment variable
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import json
+import time
+
+### selenium imports
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import WebDriverException
+from webdriver_manager.chrome import ChromeDriverManager
+
+### condition based page waits
+from page_waits import LOGIN_FORM_READY, LOGGED_IN_READY, wait_for_page_ready
+
+
+######### Initializations #########
+LINKEDIN_URL = 'https://www.linkedin.com'
+
+COOKIES_FILENAME = 'data/linkedin_session_cookies.json'
+
+RECYCLE_AFTER_PAGES = 150
+
+COOKIE_LOGIN_TIMEOUT = 10
+
+SCRAPE_MODES = {
+    'full': {'headless': False, 'block_resources': False},
+    'lite': {'headless': True, 'block_resources': True}
+}
+
+SCRAPE_MODE = os.environ.get('SCRAPE_MODE', 'full')
+
+### url patterns blocked in 'lite' mode, none of them are needed for reading the profile text
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    '*media.licdn.com*', '*dms.licdn.com*',
+    '*doubleclick.net*', '*google-analytics.com*', '*googletagmanager.com*',
+    '*px.ads.linkedin.com*', '*snap.licdn.com*', '*bing.com*', '*facebook.net*'
+]
+
+### keeps every resource of a page in the performance timeline, so the transferred bytes can be measured
+RESOURCE_TIMING_BUFFER_SCRIPT = 'performance.setResourceTimingBufferSize(10000);'
+
+
+######### Define Helper Functions #########
+
+def install_chromedriver():
+    '''
+    Helper function for installing chromedriver, call once per run and pass the path to the workers
+    '''
+    return ChromeDriverManager().install()
+
+
+def build_chrome_options(scrape_mode=SCRAPE_MODE):
+    '''
+    Helper function for building the chrome options of a scrape mode
+
+    Inputs:
+    - scrape_mode: string, key of `SCRAPE_MODES`
+    '''
+    mode_settings = SCRAPE_MODES[scrape_mode]
+    chrome_options = webdriver.ChromeOptions()
+
+    if mode_settings['headless']:
+        chrome_options.add_argument('--headless=new')
+        chrome_options.add_argument('--window-size=1920,1080')
+
+    if mode_settings['block_resources']:
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.managed_default_content_settings.media_stream': 2
+        })
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_argument('--mute-audio')
+
+    return chrome_options
+
+
+def start_chrome(driver_path, scrape_mode=SCRAPE_MODE):
+    '''
+    Helper function for starting chrome in the given scrape mode.
+    Resource blocking is done through request interception (chrome devtools protocol)
+
+    Inputs:
+    - driver_path: string, path of the installed chromedriver
+    - scrape_mode: string, key of `SCRAPE_MODES`
+    '''
+    driver = webdriver.Chrome(
+        service = Service(driver_path),
+        options = build_chrome_options(scrape_mode)
+    )
+
+    driver.execute_cdp_cmd(
+        'Page.addScriptToEvaluateOnNewDocument', {'source': RESOURCE_TIMING_BUFFER_SCRIPT}
+    )
+
+    if SCRAPE_MODES[scrape_mode]['block_resources']:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+
+    return driver
+
+
+def login_linkedin(driver, email_linkedin, password_linkedin):
+    '''
+    Helper function for logging in through the linkedin login form
+
+    Inputs:
+    - driver: selenium webdriver
+    - email_linkedin: string, linkedin email
+    - password_linkedin: string, linkedin password
+    '''
+    driver.get(LINKEDIN_URL)
+
+    wait_for_page_ready(driver, LOGIN_FORM_READY, 'login')
+
+    input_elements = driver.find_elements(
+        By.XPATH,
+        "//input[contains(@class, 'input__input' )][1]"
+    )
+    input_elements[0].send_keys(email_linkedin)
+    input_elements[1].send_keys(password_linkedin)
+
+    submit_button = driver.find_elements(
+        By.XPATH,
+        "//button[contains(@class, 'sign-in-form__submit-button')]"
+    )
+    submit_button[0].click()
+
+    return wait_for_page_ready(driver, LOGGED_IN_READY, 'login')['ready']
+
+
+def save_cookies(driver, cookies_filename):
+    '''
+    Helper function for saving the cookies of a logged in browser.
+    Written to a temporary file first and renamed, so other workers never read a half written file
+
+    Inputs:
+    - driver: selenium webdriver
+    - cookies_filename: string, json file the cookies are written to
+    '''
+    temp_filename = cookies_filename + '.' + str(os.getpid()) + '.tmp'
+
+    with open(temp_filename, 'w') as f:
+        json.dump(driver.get_cookies(), f)
+
+    os.replace(temp_filename, cookies_filename)
+
+
+def load_cookies(driver, cookies_filename):
+    '''
+    Helper function for loading saved cookies into a browser and checking that the session is
+    still logged in. Returns False when there are no saved cookies or they have expired
+
+    Inputs:
+    - driver: selenium webdriver
+    - cookies_filename: string, json file with the saved cookies
+    '''
+    if not os.path.exists(cookies_filename):
+        return False
+
+    with open(cookies_filename) as f:
+        saved_cookies = json.load(f)
+
+    ### cookies can only be added for the domain the browser is currently on
+    driver.get(LINKEDIN_URL)
+    for cookie in saved_cookies:
+        try:
+            driver.add_cookie(cookie)
+        except WebDriverException:
+            pass
+
+    driver.get(LINKEDIN_URL + '/feed/')
+
+    return wait_for_page_ready(
+        driver, LOGGED_IN_READY, 'cookie_login', timeout=COOKIE_LOGIN_TIMEOUT
+    )['ready']
+
+
+class BrowserSession:
+    '''
+    One logged in browser that is recycled every `recycle_after_pages` pages or after a crash
+
+    Inputs:
+    - driver_path: string, path of the installed chromedriver
+    - email_linkedin: string, linkedin email
+    - password_linkedin: string, linkedin password
+    - cookies_filename: string, json file shared by all sessions for reusing the login
+    - recycle_after_pages: int, number of pages after which the browser is restarted
+    - scrape_mode: string, key of `SCRAPE_MODES`
+    '''
+
+    def __init__(self, driver_path, email_linkedin, password_linkedin,
+                 cookies_filename=COOKIES_FILENAME, recycle_after_pages=RECYCLE_AFTER_PAGES,
+                 scrape_mode=SCRAPE_MODE):
+        self.driver_path = driver_path
+        self.scrape_mode = scrape_mode
+        self.email_linkedin = email_linkedin
+        self.password_linkedin = password_linkedin
+        self.cookies_filename = cookies_filename
+        self.recycle_after_pages = recycle_after_pages
+
+        self.driver = None
+        self.pages_since_start = 0
+
+        self.session_stats = {
+            'browsers_started': 0,
+            'form_logins': 0,
+            'cookie_logins': 0,
+            'recycles': 0,
+            'crashes': 0,
+            'pages_served': 0,
+            'startup_seconds': 0.0
+        }
+
+
+    def start(self):
+        '''
+        Start a browser and log it in, reusing the saved cookies whenever possible
+        '''
+        start = time.time()
+
+        self.driver = start_chrome(self.driver_path, self.scrape_mode)
+        self.pages_since_start = 0
+        self.session_stats['browsers_started'] += 1
+
+        if load_cookies(self.driver, self.cookies_filename):
+            self.session_stats['cookie_logins'] += 1
+        else:
+            ### never save or count a failed login, the workers would reuse a logged out session
+            if not login_linkedin(self.driver, self.email_linkedin, self.password_linkedin):
+                self.quit()
+                raise RuntimeError('LinkedIn login failed for ' + self.email_linkedin)
+            save_cookies(self.driver, self.cookies_filename)
+            self.session_stats['form_logins'] += 1
+
+        self.session_stats['startup_seconds'] += time.time() - start
+
+        return self.driver
+
+
+    def quit(self):
+        '''
+        Close the browser, errors are ignored since the browser might already be dead
+        '''
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except WebDriverException:
+                pass
+        self.driver = None
+
+
+    def recycle(self):
+        '''
+        Restart the browser with a fresh process
+        '''
+        self.quit()
+        self.session_stats['recycles'] += 1
+        return self.start()
+
+
+    def is_alive(self):
+        '''
+        Check if the browser still responds
+        '''
+        if self.driver is None:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+
+    def restart_if_crashed(self):
+        '''
+        Recycle the browser if it stopped responding, returns True if it was restarted
+        '''
+        if self.is_alive():
+            return False
+
+        self.session_stats['crashes'] += 1
+        self.recycle()
+        return True
+
+
+    def get(self, url):
+        '''
+        Open a url, starting or recycling the browser first when needed.
+        A crashed browser is restarted and the url retried once
+
+        Inputs:
+        - url: string, url to open
+        '''
+        if self.driver is None:
+            self.start()
+        elif self.pages_since_start >= self.recycle_after_pages:
+            self.recycle()
+
+        try:
+            self.driver.get(url)
+        except WebDriverException:
+            if not self.restart_if_crashed():
+                raise
+            self.driver.get(url)
+
+        self.pages_since_start += 1
+        self.session_stats['pages_served'] += 1
+
+        return self.driver
+
+
+    def stats(self):
+        '''
+        Counters of the session, as a dict
+        '''
+        return {key: (round(value, 1) if type(value) == float else value) for key, value in self.session_stats.items()}
+
+
+def combine_session_stats(list_of_session_stats):
+    '''
+    Helper function for summing up the stats of all the sessions of a pool
+
+    Inputs:
+    - list_of_session_stats: list of dicts returned by `BrowserSession.stats`
+    '''
+    pool_stats = {}
+    for single_session_stats in list_of_session_stats:
+        for key, value in single_session_stats.items():
+            pool_stats[key] = pool_stats.get(key, 0) + value
+
+    return pool_stats
@@ -0,0 +1,28 @@
+'''
+offline build of the analytics shown in the dashboard
+
+Note:
+- runs all the transformations of `data_prep_visualizations.py` on the final tables and stores the results
+  as a new version of the artifacts (see `artifact_store.py`), `app.py` only reads these at startup
+- to be run from the repository root after `concatenating_and_merging.py`: `python code/build_artifacts.py`
+'''
+
+import data_prep_visualizations as dp
+from artifact_store import write_artifacts
+
+### everything the dashboard plots
+ARTIFACT_NAMES = [
+    'top_skills_df',
+    'highest_education_level',
+    'popular_major_type_df',
+    'overall_years_of_exp',
+    'pds_roles_df',
+    'cto_roles_df',
+    'consultant_roles_df',
+    'time_period_latest_company',
+    'num_roles_latest_company'
+]
+
+if __name__ == '__main__':
+    version = write_artifacts({i: getattr(dp, i) for i in ARTIFACT_NAMES})
+    print('Artifacts Version: ', version)
@@ -1,66 +1,50 @@
 '''
 initial basic data cleaning on the scraped profile links data
+
+Note:
+- the link csvs of every profile category come from `pipeline_config.PROFILE_CATEGORIES`
+- categories without any scraped link csv are skipped
 '''
 
+import os
 import pandas as pd
 
-### cleaning cto profile link dataset
-df = pd.read_csv('data/CTOProfiles.csv')
-
-
-print(df.shape)
-df = df.dropna(axis=0)
-df.drop_duplicates(inplace=True)
-
-if 'profile_id_dummy' not in df.columns:
-    df = df.reset_index(drop=True).reset_index()
-    df.rename(columns={'index':'profile_id_dummy'}, inplace=True)
-else:
-    print('Already Exists')
-
-print(df.head(30))
-print(df.shape)
-
-df.to_csv('data/cleaned_cto_files/cto_profile_links.csv', index=False)
+### paths of every profile category
+from pipeline_config import PROFILE_CATEGORIES
 
 
-### cleaning and consolidating consultant profile link dataset
-consultant_df = pd.concat(
-    [
-        pd.read_csv('data/ConsultantProfiles-V1.csv').head(60),
-        pd.read_csv('data/ConsultantProfiles-V2.csv').head(70),
-        pd.read_csv('data/ConsultantProfiles-V3.csv').head(70)
-    ]
-).reset_index(drop=True)
+def clean_profile_links(category_name):
+    '''
+    helper function for consolidating and cleaning the profile link csvs of a profile category
+    '''
+    category_config = PROFILE_CATEGORIES[category_name]
 
-print(consultant_df.shape)
-consultant_df.drop_duplicates(inplace=True)
-consultant_df = consultant_df.dropna(axis=0)
+    df = pd.concat(
+        [pd.read_csv(link_csv).head(max_rows) if max_rows is not None else pd.read_csv(link_csv)
+         for link_csv, max_rows in category_config['link_csvs']]
+    ).reset_index(drop=True)
 
-if 'profile_id_dummy' not in consultant_df.columns:
-    consultant_df = consultant_df.reset_index(drop=True).reset_index()
-    consultant_df.rename(columns={'index':'profile_id_dummy'}, inplace=True)
-else:
-    print('Already Exists')
+    print(category_name, df.shape)
+    df = df.dropna(axis=0)
+    df.drop_duplicates(inplace=True)
 
-print(consultant_df.head(30))
-print(consultant_df.shape)
-consultant_df.to_csv('data/cleaned_consultant_files/consultant_profile_links.csv', index=False)
+    if 'profile_id_dummy' not in df.columns:
+        df = df.reset_index(drop=True).reset_index()
+        df.rename(columns={'index':'profile_id_dummy'}, inplace=True)
+    else:
+        print('Already Exists')
 
+    print(df.head(30))
+    print(df.shape)
 
-### Data Science Profile Links
-df = pd.read_csv('data/DataScienceProfiles.csv')
+    os.makedirs(category_config['cleaned_files_path'], exist_ok=True)
+    df.to_csv(category_config['profile_links_csv'], index=False)
 
-print(df.shape)
-df = df.dropna(axis=0)
-df.drop_duplicates(inplace=True)
 
-if 'profile_id_dummy' not in df.columns:
-    df = df.reset_index(drop=True).reset_index()
-    df.rename(columns={'index':'profile_id_dummy'}, inplace=True)
-else:
-    print('Already Exists')
+if __name__ == '__main__':
+    for category_name, category_config in PROFILE_CATEGORIES.items():
+        if not all(os.path.exists(link_csv) for link_csv, _ in category_config['link_csvs']):
+            print('No profile links for ', category_name, ', skipping')
+            continue
 
-print(df.head(30))
-print(df.shape)
-df.to_csv('data/cleaned_data_science_files/data_science_profile_links.csv', index=False)
+        clean_profile_links(category_name)
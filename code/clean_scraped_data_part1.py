@@ -1,324 +1,410 @@
 '''
 Code for Initial Cleaning of Scraped LinkedIn Data
+
+Note:
+- The paths of every profile category (consultant, cto, data science, ceo) come from `pipeline_config.PROFILE_CATEGORIES`
+- The categories are cleaned at the same time, one process per category, each writing to its own `cleaned_*_files` folder
+- Usage (from the repository root):
+    - all categories: `python code/clean_scraped_data_part1.py`
+    - some categories: `python code/clean_scraped_data_part1.py --categories cto data_science --processes 2`
+    - only new or re-scraped profiles: `python code/clean_scraped_data_part1.py --incremental`
+    - bounded memory: `python code/clean_scraped_data_part1.py --batch-size 5000 --memory-limit-mb 1024`
+- Incremental runs look up the shards that are new or changed since the last run in `cleaning_manifest.py`,
+  clean only their profiles and replace the rows of those profiles in the existing outputs
+- With `--batch-size` the profiles are read, cleaned and appended to the outputs a batch at a time, batches are made
+  smaller when needed to stay under `--memory-limit-mb` (per category process). Rows are in the order of the shards
+- Categories without scraped profiles or without cleaned profile links (`clean_scraped_data_part0.py`) are skipped
 '''
 
 ############## IMPORTS ##############
 import os
-import ast
-import re
-import dateutil.parser
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-from nltk.stem import WordNetLemmatizer
+
+### paths of every profile category
+from pipeline_config import PROFILE_CATEGORIES
+
+### batched parquet output of the scraper
+from profile_shards import SHARD_BATCH_SIZE, ProfileBatchReader, check_legacy_csvs_migrated, load_profile_records, shards_folder
+
+### cached skill lemmatization and the skill taxonomy
+from skill_normalizer import SkillNormalizer
+from skill_taxonomy import SKILL_TAXONOMY_FILENAME, load_skill_taxonomy
+
+### sparse skills output
+from skills_matrix import SkillsMatrixWriter, build_skills_long_df, load_skills_long_df, save_skills_matrix
+
+### shards and profiles that were already cleaned
+from cleaning_manifest import CleaningManifest
+
+### vectorized record cleaning
+from record_cleaning import explode_experience, parse_degrees, split_durations
 
 
 ############## INITIALIZATIONS ##############
-BASE_PATH = 'data/individual_consultant_profiles/'
 
-MAIN_PROFILE_CSV = 'data/cleaned_consultant_files/consultant_profile_links.csv'
+### date used for "Present" in experience durations, pass the date the profiles were scraped
+PRESENT_DATE = os.environ.get('CLEANING_PRESENT_DATE', 'Nov 2022')
 
-CLEANED_FILES_PATH = 'data/cleaned_consultant_files/'
+EDUCATION_INFO_FILENAME = 'education_info.csv'
 
-SKILLS_DF_COMBINED_FILE = ''
+EXPERIENCE_INFO_FILENAME = 'name_and_experience_info.csv'
 
-############## Load Files ##############
-main_df = pd.read_csv(MAIN_PROFILE_CSV)
-print(main_df.head())
+### memory ceiling of a category process when cleaning in batches (`--batch-size`)
+MEMORY_LIMIT_MB = 2048
 
+### peak memory of cleaning a batch as a multiple of the arrow size of its records
+BATCH_MEMORY_FACTOR = 10
+
+### optional parquet file (inside the scraped profiles folder) with the skills of all profiles, same schema as the skills shards
+SKILLS_DF_COMBINED_FILE = ''
 
-all_files = os.listdir(BASE_PATH)
-print(len(all_files))
 
-education_files = [i for i in all_files if 'education' in i]
-experience_files = [i for i in all_files if 'experience' in i]
-skill_files = [i for i in all_files if 'skill' in i]
+############## Clean Education DF ##############
 
-### helper function for concatenating
-def concatenate_dfs_helper(filenames_list, base_path):
+def clean_education(education_df):
     '''
-    helper function for concatenating csv files
+    helper function for splitting the degree lists of the education records into degree name, start and end year
     '''
-    df_list = []
+    education_df = education_df.copy()
 
-    for file in filenames_list:
-        temp_df = pd.read_csv(base_path+file)
-        df_list.append(temp_df)
+    education_df[['degree_name', 'start_year_degree', 'end_year_degree', 'parse_status']] = parse_degrees(
+        education_df['degree_list']
+    )
+    print(education_df['parse_status'].value_counts())
 
-    full_df = pd.concat(df_list).reset_index(drop=True)
-    return full_df
+    return education_df.sort_values('profile_id_dummy').drop('degree_list', axis=1)
 
 
-### load all individual files and concatenate into a single df
-education_df = concatenate_dfs_helper(
-    education_files,
-    BASE_PATH
-)
+############## Clean Experience DF ##############
 
-experience_df = concatenate_dfs_helper(
-    experience_files,
-    BASE_PATH
-)
+def clean_experience(experience_df, main_df, present_date=PRESENT_DATE):
+    '''
+    helper function for turning the experience records into one row per position with its start and end date
+    '''
+    ### one row per position with its cleaned duration
+    long_experience_df = explode_experience(experience_df)
 
-if SKILLS_DF_COMBINED_FILE != '':
-    skills_df = pd.read_csv(
-        BASE_PATH + SKILLS_DF_COMBINED_FILE
-    )
-else:
-    skills_df = concatenate_dfs_helper(
-        skill_files,
-        BASE_PATH
+    long_experience_df[['start_date', 'end_date']] = split_durations(
+        long_experience_df['durations_cleaned'],
+        present_date
     )
 
-print(len(education_df['profile_id_dummy'].unique()))
-print(education_df.shape)
-print(experience_df.shape)
-print(skills_df.shape)
+    name_and_experience_df = pd.merge(
+        long_experience_df,
+        main_df,
+        on = 'profile_id_dummy',
+        how = 'left'
+    )
 
+    name_and_experience_df = name_and_experience_df.drop('durations', axis=1, errors='ignore')
+    return name_and_experience_df.sort_values('profile_id_dummy')
 
-############## Clean Education DF ##############
 
-print("................. Cleaning Education .................")
+############## Clean Skills DF ##############
 
-def clean_degree_list(df_temp):
+def clean_skills(skills_df, skill_normalizer, skill_taxonomy):
     '''
-    helper function for cleaning `degree_list` column in education
+    helper function for turning the skills records into the long profile/skill table
     '''
-    single_degree_list = df_temp['degree_list']
-    try:
-        str_to_list = ast.literal_eval(single_degree_list)
-
-        if len(str_to_list) == 1:
-            #### handle cases where year is not available or degree name is not available
-            if re.match(r'[0-9\-]', str_to_list[0]) is not None:
-                time_period = str_to_list[0].strip()
-                degree_name = ''
-            else:
-                degree_name = str_to_list[0].strip()
-                time_period = ''
-        else:
-            #### both are available
-            time_period = str_to_list[1]
-            degree_name = str_to_list[0].strip()
+    ### one row per listed skill, each distinct skill is lemmatized and remapped only once
+    exploded_skills_df = skills_df[['profile_id_dummy', 'skills_list']].explode('skills_list')
 
+    exploded_skills_df['skill'] = skill_normalizer.normalize(exploded_skills_df['skills_list'], skill_taxonomy)
+    print(skill_normalizer.cache_stats)
 
-        if time_period != '':
-            #### split time period into start and end
-            time_period_split = time_period.split('-')
+    return build_skills_long_df(exploded_skills_df['profile_id_dummy'], exploded_skills_df['skill'])
 
-            if len(time_period_split) == 1:
-                #### if either end or start is not available make both the same
-                end = int(re.search(r'\d+', time_period_split[0].strip()).group(0))
-                start = end
-            else:
-                #### both start and end are available
-                start = int(re.search(r'\d+', time_period_split[0].strip()).group(0))
-                end = int(re.search(r'\d+', time_period_split[1].strip()).group(0))
-        else:
-            ### set arbitrary value in case nothing is available
-            start = 1900
-            end = 1900
 
-        return degree_name, start, end
+############## Incremental Cleaning ##############
 
-    except Exception as err_str:
-        print(err_str)
-        print(single_degree_list)
+def load_changed_records(changed_shards, record_type, profile_shards):
+    '''
+    helper function for reading the records of the changed shards of a record type.
+    A profile scraped again shows up in more than one shard, only the records of its latest shard are kept
+    (the shards of all record types of a batch have the same filename)
+    '''
+    latest_shards = {
+        single_profile_id: os.path.basename(shard_path) for single_profile_id, (shard_path, _) in profile_shards.items()
+    }
 
-        return '', 1900, 1900
+    shard_dfs = []
+    for shard_path, _, _ in changed_shards:
+        shard_df = load_profile_records('', record_type, shard_paths=[shard_path])
+        shard_dfs.append(shard_df[shard_df['profile_id_dummy'].map(latest_shards) == os.path.basename(shard_path)])
 
+    if len(shard_dfs) == 0:
+        return load_profile_records('', record_type, shard_paths=[])
 
-education_df[['degree_name', 'start_year_degree', 'end_year_degree']] = education_df.apply(
-    clean_degree_list, result_type='expand', axis=1
-)
+    return pd.concat(shard_dfs).reset_index(drop=True)
 
-education_df = education_df.sort_values('profile_id_dummy')
-education_df.drop('degree_list', axis=1).to_csv(
-    CLEANED_FILES_PATH+'education_info.csv',
-    index = False
-)
 
+def changed_profile_shards(changed_shards):
+    '''
+    helper function for the latest changed shard (path and content hash) of every profile.
+    Every profile has exactly one skills record, so only the ids in the skills shards are read
+    '''
+    profile_shards = {}
+    for shard_path, _, content_hash in changed_shards['skills']:
+        for single_profile_id in load_profile_records('', 'skills', shard_paths=[shard_path])['profile_id_dummy']:
+            profile_shards[int(single_profile_id)] = (shard_path, content_hash)
 
-############## Clean Experience DF ##############
+    return profile_shards
 
-print("................. Cleaning Experience .................")
 
-def extract_time_period_experience(item):
+def merge_cleaned_output(existing_df, new_df, updated_profile_ids):
     '''
-    helper function for cleaning duration
+    helper function for replacing the rows of the updated profiles in an existing cleaned output
     '''
-    temp_list = ast.literal_eval(item)
-    new_list = []
+    existing_df = existing_df[~existing_df['profile_id_dummy'].isin(updated_profile_ids)]
+    return pd.concat([existing_df, new_df]).sort_values('profile_id_dummy', kind='stable').reset_index(drop=True)
 
-    for single_item in temp_list:
-        regex_match = re.match(
-            '(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec|Present|20\d{2}|19\d{2})',
-            single_item
-        )
 
-        if regex_match is not None:
-            new_list.append(single_item.split('·')[0].strip())
+############## Clean a Profile Category ##############
+
+def has_scraped_profiles(scraped_profiles_path):
+    '''
+    helper function for checking if a scraper output folder has any shards or per profile csv files
+    '''
+    if os.path.exists(shards_folder(scraped_profiles_path, 'skills')):
+        return True
 
-    return new_list
+    return os.path.exists(scraped_profiles_path) and any(
+        i.endswith('_skills.csv') for i in os.listdir(scraped_profiles_path)
+    )
 
 
-def experience_duration_splitter(df_temp):
+def clean_profile_category(category_name, incremental=False):
     '''
-    helper function for splitting duration to start and end
+    helper function for cleaning the scraped profiles of a profile category.
+    With `incremental` only the profiles of new or changed shards are cleaned and merged into the existing outputs.
+    Mainly created for use in multiprocessing, returns the row counts and the time taken
     '''
-    single_date = df_temp['durations_cleaned']
+    start = time.time()
+    category_config = PROFILE_CATEGORIES[category_name]
+    scraped_profiles_path = category_config['scraped_profiles_path']
+    cleaned_files_path = category_config['cleaned_files_path']
 
-    split_list = single_date.split('-')
+    print("................. Cleaning ", category_name, " .................")
 
-    today_end_date = 'Nov 2022'
+    main_df = pd.read_csv(category_config['profile_links_csv'])
 
-    if len(split_list)==2:
-        start = split_list[0].strip()
-        end = split_list[1].strip()
+    ### shards not cleaned yet, a full run marks them cleaned as well so the next incremental run starts from there
+    cleaning_manifest = CleaningManifest(cleaned_files_path)
+    changed_shards = cleaning_manifest.changed_shards(scraped_profiles_path)
+    profile_shards = changed_profile_shards(changed_shards)
 
-        if end.lower() == 'present':
-            end = today_end_date
+    incremental = incremental and os.path.exists(cleaned_files_path+EDUCATION_INFO_FILENAME)
+
+    if incremental:
+        education_df, experience_df, skills_df = [
+            load_changed_records(changed_shards[i], i, profile_shards) for i in ['education', 'experience', 'skills']
+        ]
     else:
-        start = split_list[0].strip()
-        end = start = split_list[0].strip()
-
-    try:
-        start = dateutil.parser.parse(start)
-        end = dateutil.parser.parse(end)
-    except:
-        start = ''
-        end = ''
-
-    return start, end
-
-
-experience_df['durations_cleaned'] = experience_df['durations'].apply(
-    extract_time_period_experience
-)
-experience_df['positions'] = experience_df['positions'].apply(ast.literal_eval)
-
-for i,j in experience_df.iterrows():
-    if len(j.positions) < len(j.durations_cleaned):
-        experience_df.loc[i, 'durations_cleaned'] = j['durations_cleaned'][0:len(j['positions'])]
-        print(j)
-    elif len(j.positions) > len(j.durations_cleaned):
-        experience_df.loc[i, 'durations_cleaned'] = experience_df.loc[i, 'durations_cleaned'] + (
-            [''] * (len(j['positions']) - len(j['durations_cleaned']))
+        ### every profile is read from its latest shard, same as the incremental path
+        education_df = load_profile_records(scraped_profiles_path, 'education')
+        experience_df = load_profile_records(scraped_profiles_path, 'experience')
+
+        if SKILLS_DF_COMBINED_FILE != '':
+            skills_df = pd.read_parquet(scraped_profiles_path + SKILLS_DF_COMBINED_FILE)
+        else:
+            skills_df = load_profile_records(scraped_profiles_path, 'skills')
+
+    print(category_name, education_df.shape, experience_df.shape, skills_df.shape)
+
+    if incremental and skills_df.shape[0] == 0:
+        cleaning_manifest.mark_cleaned(changed_shards, profile_shards)
+        cleaning_manifest.close()
+        return {'category': category_name, 'updated_profiles': 0, 'seconds': round(time.time() - start, 1)}
+
+    education_info_df = clean_education(education_df)
+    name_and_experience_df = clean_experience(experience_df, main_df)
+
+    ### aliases, variants and parents of the skills, see data/skill_taxonomy.json
+    skill_taxonomy = load_skill_taxonomy(SKILL_TAXONOMY_FILENAME)
+
+    skill_normalizer = SkillNormalizer()
+    skills_long_df = clean_skills(skills_df, skill_normalizer, skill_taxonomy)
+    skill_normalizer.close()
+
+    if incremental:
+        updated_profile_ids = list(profile_shards.keys())
+
+        education_info_df = merge_cleaned_output(
+            pd.read_csv(
+                cleaned_files_path+EDUCATION_INFO_FILENAME,
+                dtype = {'start_year_degree': 'Int64', 'end_year_degree': 'Int64'}
+            ),
+            education_info_df,
+            updated_profile_ids
+        )
+        name_and_experience_df = merge_cleaned_output(
+            pd.read_csv(cleaned_files_path+EXPERIENCE_INFO_FILENAME, parse_dates=['start_date', 'end_date']),
+            name_and_experience_df,
+            updated_profile_ids
         )
-        print(j)
+        skills_long_df = merge_cleaned_output(load_skills_long_df(cleaned_files_path), skills_long_df, updated_profile_ids)
+        skills_long_df['skill'] = skills_long_df['skill'].astype('category')
 
-long_experience_df = experience_df.explode(
-    ['positions', 'durations_cleaned']
-).reset_index(drop=True)
+    education_info_df.to_csv(
+        cleaned_files_path+EDUCATION_INFO_FILENAME,
+        index = False
+    )
 
-long_experience_df[['start_date', 'end_date']] = long_experience_df.apply(
-    experience_duration_splitter,
-    axis=1,
-    result_type='expand'
-)
+    name_and_experience_df.to_csv(
+        cleaned_files_path+EXPERIENCE_INFO_FILENAME,
+        index = False
+    )
 
-name_and_experience_df = pd.merge(
-    long_experience_df,
-    main_df,
-    on = 'profile_id_dummy',
-    how = 'left'
-)
+    ### long profile/skill table and sparse profile x skill matrix instead of a dense one-hot pivot
+    save_skills_matrix(skills_long_df, cleaned_files_path)
 
-name_and_experience_df = name_and_experience_df.drop('durations', axis=1, errors='ignore')
-name_and_experience_df.sort_values('profile_id_dummy', inplace=True)
+    ### only marked once all the outputs are written, an interrupted run cleans the same shards again
+    cleaning_manifest.mark_cleaned(changed_shards, profile_shards)
+    cleaning_manifest.close()
 
-name_and_experience_df.to_csv(
-    CLEANED_FILES_PATH+'name_and_experience_info.csv',
-    index = False
-)
+    return {
+        'category': category_name,
+        'updated_profiles': skills_df['profile_id_dummy'].nunique(),
+        'education_rows': education_info_df.shape[0],
+        'experience_rows': name_and_experience_df.shape[0],
+        'skill_rows': skills_long_df.shape[0],
+        'skill_taxonomy_version': skill_taxonomy.version,
+        'seconds': round(time.time() - start, 1)
+    }
 
-############## Clean Skills DF ##############
 
-print("................. Cleaning Skills .................")
-
-lemmatizer = WordNetLemmatizer()
-
-skills_df['skills_list_cleaned'] = skills_df['skills_list'].apply(
-    lambda x: [lemmatizer.lemmatize(i.lower()) for i in ast.literal_eval(x)]
-)
-
-# skills_df.to_csv(
-#     CLEANED_FILES_PATH+'skills_info.csv',
-#     index=False
-# )
-
-skills_remapping_dict = {
-    'artificial intelligence (ai)':'artificial intelligence',
-    'ai':'artificial intelligence',
-    'agile methodologies':'agile',
-    'agile project management':'agile',
-    'amazon ebs' : 'amazon web services (aws)',
-    'amazon ec2' : 'amazon web services (aws)',
-    'amazon s3' : 'amazon web services (aws)',
-    'aws' : 'amazon web services (aws)',
-    'aws command line interface (cli)' : 'amazon web services (aws)',
-    'aws s3' : 'amazon web services (aws)',
-    'c' : 'c (programming language)',
-    'c language' : 'c (programming language)',
-    'c programming' : 'c (programming language)',
-    'c++ language' : 'c++',
-    'c++11' : 'c++',
-    'c/c++ stl' : 'c++',
-    'c\\c++' : 'c++',
-    'data manipulation' : 'data cleaning',
-    'data warehouse architecture' : 'data warehousing',
-    'data wrangling' : 'data cleaning',
-    'data structures' : 'data structures and algorithms',
-    'data warehousing' : 'data warehouse architecture',
-    'database design' : 'database development',
-    'datawarehousing' : 'data warehousing',
-    'dbms' : 'database management system (dbms)',
-    'etl' : 'extract, transform, load (etl)',
-    'eda' : 'exploratory data analysis',
-    'java enterprise edition' : 'java',
-    'jquery ui' : 'jquery',
-    'high performance computing' : 'high performance computing (hpc)',
-    'advanced excel' : 'microsoft excel',
-    'excel' : 'microsoft excel',
-    'powerbi' : 'power bi',
-    'machine learning algorithms' : 'machine learning',
-    'oracle pl/sql development' : 'oracle sql',
-    'oracle sql developer' : 'oracle sql',
-    'python' : 'python (programming language)',
-    'python programming' : 'python (programming language)',
-    'presentation' : 'presentation skills',
-    'r' : 'r (programming language)',
-    'r programing' : 'r (programming language)',
-    'r programming' : 'r (programming language)',
-    'r shiny application development' : 'r shiny',
-    'sas certified base programmer' : 'sas (programming language)',
-    'sas programming' : 'sas (programming language)',
-    'sci-kit learn' : 'scikit-learn'
-}
-
-def remap_skills_basic(skills_list):
+############## Streaming Cleaning ##############
+
+def clean_profile_category_in_batches(category_name, batch_size, memory_limit_mb=MEMORY_LIMIT_MB):
     '''
-    helper function for remapping skills
+    helper function for cleaning the scraped profiles of a profile category a batch of profiles at a time,
+    every cleaned batch is appended to the outputs so memory does not grow with the number of profiles.
+    Batches are sized to stay under `memory_limit_mb` (estimated from the records of the previous batch)
+    and never go over `batch_size` profiles. Returns the row counts and the time taken
     '''
-    new_list = sorted(list(set(
-        [
-            skills_remapping_dict[i] if i in skills_remapping_dict.keys() else i 
-            for i in skills_list
-        ]
-    )))
-    return new_list
-
-skills_df['skills_list_cleaned'] = skills_df['skills_list_cleaned'].apply(remap_skills_basic)
-
-exploded_skills_df = skills_df.explode('skills_list_cleaned').reset_index(drop=True)
-exploded_skills_df['skills_list'] = exploded_skills_df['skills_list'].astype(str)
-exploded_skills_df['val'] = 1
-skills_wide_df = pd.pivot(
-    exploded_skills_df,
-    index=['profile_id_dummy', 'all_skills_link', 'skills_list'],
-    columns='skills_list_cleaned',
-    values='val'
-).reset_index()
-pd.set_option('display.max_columns', 1000)
-skills_wide_df.fillna(0, inplace=True)
-
-print(skills_wide_df.head())
-skills_wide_df.to_csv(CLEANED_FILES_PATH+'skills_info.csv', index=False)
+    start = time.time()
+    category_config = PROFILE_CATEGORIES[category_name]
+    scraped_profiles_path = category_config['scraped_profiles_path']
+    cleaned_files_path = category_config['cleaned_files_path']
+
+    print("................. Cleaning ", category_name, " in batches .................")
+
+    main_df = pd.read_csv(category_config['profile_links_csv'])
+
+    cleaning_manifest = CleaningManifest(cleaned_files_path)
+    changed_shards = cleaning_manifest.changed_shards(scraped_profiles_path)
+    profile_shards = changed_profile_shards(changed_shards)
+
+    skill_taxonomy = load_skill_taxonomy(SKILL_TAXONOMY_FILENAME)
+    skill_normalizer = SkillNormalizer()
+
+    batch_reader = ProfileBatchReader(scraped_profiles_path)
+    skills_matrix_writer = SkillsMatrixWriter(cleaned_files_path)
+
+    ### the first batch is a single shard, it gives the memory per profile for sizing the rest
+    next_batch_size = min(batch_size, SHARD_BATCH_SIZE)
+    batch_stats = {'batches': 0, 'education_rows': 0, 'experience_rows': 0, 'skill_rows': 0}
+
+    batch_records = batch_reader.read_batch(next_batch_size)
+    while batch_records is not None:
+        is_first_batch = batch_stats['batches'] == 0
+
+        education_info_df = clean_education(batch_records['education'])
+        education_info_df.to_csv(
+            cleaned_files_path+EDUCATION_INFO_FILENAME,
+            index = False,
+            mode = 'w' if is_first_batch else 'a',
+            header = is_first_batch
+        )
+
+        name_and_experience_df = clean_experience(batch_records['experience'], main_df)
+        name_and_experience_df.to_csv(
+            cleaned_files_path+EXPERIENCE_INFO_FILENAME,
+            index = False,
+            mode = 'w' if is_first_batch else 'a',
+            header = is_first_batch
+        )
+
+        skills_long_df = clean_skills(batch_records['skills'], skill_normalizer, skill_taxonomy)
+        skills_matrix_writer.add(skills_long_df)
+
+        batch_stats['batches'] += 1
+        batch_stats['education_rows'] += education_info_df.shape[0]
+        batch_stats['experience_rows'] += name_and_experience_df.shape[0]
+        batch_stats['skill_rows'] += skills_long_df.shape[0]
+
+        ### python objects and the copies made while cleaning take a multiple of the arrow size of the records
+        num_batch_profiles = max(batch_records['skills'].shape[0], 1)
+        bytes_per_profile = max(batch_reader.last_batch_bytes * BATCH_MEMORY_FACTOR / num_batch_profiles, 1)
+        next_batch_size = int(min(batch_size, max(memory_limit_mb * 1024 * 1024 / bytes_per_profile, 1)))
+
+        print(category_name, ' Batch: ', batch_stats['batches'], ' Profiles: ', batch_reader.next_row, '/', batch_reader.num_profiles)
+
+        del batch_records, education_info_df, name_and_experience_df, skills_long_df
+        batch_records = batch_reader.read_batch(next_batch_size)
+
+    skill_normalizer.close()
+    skills_matrix_writer.close()
+
+    cleaning_manifest.mark_cleaned(changed_shards, profile_shards)
+    cleaning_manifest.close()
+
+    return {
+        'category': category_name,
+        'updated_profiles': batch_reader.num_profiles,
+        **batch_stats,
+        'skill_taxonomy_version': skill_taxonomy.version,
+        'seconds': round(time.time() - start, 1)
+    }
+
+
+############## Main block for cleaning all categories in parallel ##############
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Clean the scraped profiles of every profile category')
+    parser.add_argument('--categories', nargs='+', default=list(PROFILE_CATEGORIES.keys()), choices=list(PROFILE_CATEGORIES.keys()))
+    parser.add_argument('--processes', type=int, default=len(PROFILE_CATEGORIES))
+    parser.add_argument('--incremental', action='store_true', help='only clean profiles that are new or changed since the last run')
+    parser.add_argument('--batch-size', type=int, default=None, help='clean at most this many profiles at a time and append them to the outputs')
+    parser.add_argument('--memory-limit-mb', type=int, default=MEMORY_LIMIT_MB, help='memory ceiling per category process when cleaning in batches')
+    args = parser.parse_args()
+
+    if args.incremental and args.batch_size is not None:
+        parser.error('--incremental already only cleans the new profiles, it can not be combined with --batch-size')
+
+    categories_to_clean = []
+    for category_name in args.categories:
+        category_config = PROFILE_CATEGORIES[category_name]
+
+        if not has_scraped_profiles(category_config['scraped_profiles_path']):
+            print('No scraped profiles for ', category_name, ', skipping')
+        elif not os.path.exists(category_config['profile_links_csv']):
+            print('No cleaned profile links for ', category_name, ', run clean_scraped_data_part0.py first, skipping')
+        else:
+            ### only the shards are cleaned, per profile csv files of older runs have to be converted once first
+            check_legacy_csvs_migrated(category_config['scraped_profiles_path'])
+            categories_to_clean.append(category_name)
+
+    start = time.time()
+
+    ### one process per category, the lemma cache is a sqlite file so the processes can share it
+    if len(categories_to_clean) > 0:
+        with ProcessPoolExecutor(max_workers = min(args.processes, len(categories_to_clean))) as executor:
+            if args.batch_size is not None:
+                result = list(executor.map(
+                    clean_profile_category_in_batches,
+                    categories_to_clean,
+                    [args.batch_size] * len(categories_to_clean),
+                    [args.memory_limit_mb] * len(categories_to_clean)
+                ))
+            else:
+                result = list(executor.map(
+                    clean_profile_category, categories_to_clean, [args.incremental] * len(categories_to_clean)
+                ))
+
+        print(pd.DataFrame(result))
+
+    print('Total Seconds: ', round(time.time() - start, 1))
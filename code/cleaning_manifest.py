@@ -0,0 +1,154 @@
+'''
+Code for keeping track of the scraped profile records that were already cleaned
+
+Note:
+- The scraper writes profiles in append-only parquet shards, a re-scraped profile shows up again in a newer shard
+- The manifest stores every cleaned shard (mtime and content hash) and every cleaned profile (id and the shard it came from)
+  in a sqlite file next to the cleaned outputs of a profile category
+- A shard counts as changed if it is not in the manifest or its mtime differs and its content hash does too
+  (the hash is only computed when the mtime changed)
+- Shards are only marked cleaned once the merged outputs are written, an interrupted run simply cleans them again
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import hashlib
+import sqlite3
+import pandas as pd
+
+### batched parquet output of the scraper
+from profile_shards import RECORD_TYPES, shards_folder
+
+
+######### Initializations #########
+CLEANING_MANIFEST_FILENAME = 'cleaning_manifest.sqlite'
+
+CLEANING_MANIFEST_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cleaned_shards (
+    shard_path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    cleaned_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cleaned_profiles (
+    profile_id_dummy INTEGER PRIMARY KEY,
+    shard_path TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    cleaned_at TEXT NOT NULL
+);
+'''
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+######### Define Helper Functions #########
+
+def file_content_hash(filename):
+    '''
+    Helper function for the sha256 of a file, read in chunks
+
+    Inputs:
+    - filename: string
+    '''
+    content_hash = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+class CleaningManifest:
+    '''
+    Sqlite backed record of the shards and profiles that are already in the cleaned outputs
+
+    Inputs:
+    - cleaned_files_path: string, folder with the cleaned outputs of a profile category, the manifest is stored there
+    '''
+
+    def __init__(self, cleaned_files_path):
+        self.connection = sqlite3.connect(
+            os.path.join(cleaned_files_path, CLEANING_MANIFEST_FILENAME), timeout=60, isolation_level=None
+        )
+        self.connection.executescript(CLEANING_MANIFEST_SCHEMA)
+
+        self.cleaned_shards = {
+            shard_path: (mtime, content_hash) for shard_path, mtime, content_hash in
+            self.connection.execute('SELECT shard_path, mtime, content_hash FROM cleaned_shards')
+        }
+
+
+    def changed_shards(self, scraped_profiles_path):
+        '''
+        New or changed shards of every record type, returns a dict of record type to
+        a list of (shard path, mtime, content hash)
+
+        Inputs:
+        - scraped_profiles_path: string, output folder of the scraper
+        '''
+        changed = {}
+
+        for record_type in RECORD_TYPES:
+            changed[record_type] = []
+            record_folder = shards_folder(scraped_profiles_path, record_type)
+            if not os.path.exists(record_folder):
+                continue
+
+            ### files starting with '.' are shards that are still being written
+            for shard_filename in sorted(os.listdir(record_folder)):
+                if shard_filename.startswith('.') or not shard_filename.endswith('.parquet'):
+                    continue
+
+                shard_path = os.path.join(record_folder, shard_filename)
+                mtime = os.path.getmtime(shard_path)
+                cleaned_mtime, cleaned_hash = self.cleaned_shards.get(shard_path, (None, None))
+
+                if cleaned_mtime == mtime:
+                    continue
+
+                content_hash = file_content_hash(shard_path)
+                if content_hash == cleaned_hash:
+                    ### touched but not changed, only the mtime is updated
+                    self.connection.execute(
+                        'UPDATE cleaned_shards SET mtime = ? WHERE shard_path = ?', (mtime, shard_path)
+                    )
+                    self.cleaned_shards[shard_path] = (mtime, content_hash)
+                    continue
+
+                changed[record_type].append((shard_path, mtime, content_hash))
+
+        return changed
+
+
+    def mark_cleaned(self, changed_shards, profile_shards):
+        '''
+        Record shards and profiles as cleaned, to be called once the merged outputs are written
+
+        Inputs:
+        - changed_shards: dict, as returned by `changed_shards`
+        - profile_shards: dict of profile id to the (shard path, content hash) it was cleaned from
+        '''
+        cleaned_at = str(pd.Timestamp.now())
+        shard_rows = [
+            (shard_path, mtime, content_hash, cleaned_at)
+            for record_type in changed_shards for shard_path, mtime, content_hash in changed_shards[record_type]
+        ]
+
+        self.connection.execute('BEGIN')
+        self.connection.executemany('INSERT OR REPLACE INTO cleaned_shards VALUES (?, ?, ?, ?)', shard_rows)
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO cleaned_profiles VALUES (?, ?, ?, ?)',
+            [(int(i), shard_path, content_hash, cleaned_at) for i, (shard_path, content_hash) in profile_shards.items()]
+        )
+        self.connection.execute('COMMIT')
+
+        for shard_path, mtime, content_hash, _ in shard_rows:
+            self.cleaned_shards[shard_path] = (mtime, content_hash)
+
+
+    def close(self):
+        '''
+        Close the sqlite connection
+        '''
+        self.connection.close()
@@ -1,84 +1,120 @@
 '''
 merging and concatenating_files
+
+Note:
+- the cleaned files of every profile category in `pipeline_config.PROFILE_CATEGORIES` are merged,
+  categories that have not been cleaned yet are skipped
+- every table is written as one parquet dataset partitioned by profile category (see `final_tables.py`)
+  with an int32 profile key, the category code and the id of the profile within its category
 '''
 
+import os
 import pandas as pd
+from pipeline_config import PROFILE_CATEGORIES
+from skills_matrix import build_skills_matrix, load_skills_long_df, write_skills_matrix_file
+from clean_scraped_data_part1 import EDUCATION_INFO_FILENAME, EXPERIENCE_INFO_FILENAME
+from final_tables import FINAL_FILES_PATH, PROFILE_KEYS_FILENAME, build_profile_keys, write_final_table
+
+#### Load the Cleaned Files of every Category
+exp_dfs, edu_dfs, skills_dfs = [], [], []
+
+for category_name, category_config in PROFILE_CATEGORIES.items():
+    cleaned_files_path = category_config['cleaned_files_path']
+    if not os.path.exists(cleaned_files_path + EDUCATION_INFO_FILENAME):
+        print('No cleaned files for ', category_name, ', skipping')
+        continue
+
+    exp = pd.read_csv(cleaned_files_path + EXPERIENCE_INFO_FILENAME, parse_dates=['start_date', 'end_date'])
+    edu = pd.read_csv(
+        cleaned_files_path + EDUCATION_INFO_FILENAME,
+        dtype = {'start_year_degree': 'Int64', 'end_year_degree': 'Int64'}
+    )
+    skills = load_skills_long_df(cleaned_files_path)
+
+    for df, all_dfs in [(exp, exp_dfs), (edu, edu_dfs), (skills, skills_dfs)]:
+        df['profile_category'] = category_config['category_label']
+        all_dfs.append(df.rename(columns={'profile_id_dummy': 'source_profile_id'}))
+
+    print(category_name, exp.shape, edu.shape, skills.shape)
+
+exp_df = pd.concat(exp_dfs).reset_index(drop=True)
+edu_df = pd.concat(edu_dfs).reset_index(drop=True)
+skills_df = pd.concat(skills_dfs).reset_index(drop=True)
+
+
+#### Profile Keys
+### one int32 key per profile instead of string keys like 'CTO_12'
+profile_keys_df = build_profile_keys(pd.concat([
+    exp_df[['profile_category', 'source_profile_id']],
+    edu_df[['profile_category', 'source_profile_id']],
+    skills_df[['profile_category', 'source_profile_id']]
+]))
+print(profile_keys_df.groupby('profile_category').size())
+
+profile_keys_df.to_parquet(os.path.join(FINAL_FILES_PATH, PROFILE_KEYS_FILENAME), index=False)
+
+def add_profile_keys(df):
+    '''
+    helper function for adding the profile key and category code in front of the columns of a table
+    '''
+    df = pd.merge(
+        profile_keys_df,
+        df.astype({'source_profile_id': 'int32'}),
+        on = ['profile_category', 'source_profile_id'],
+        how = 'inner'
+    )
+    return df
+
+
+def column_dtypes(df, dtypes):
+    '''
+    helper function for the dtypes of the columns a table has, files cleaned by older runs have fewer columns
+    '''
+    return {k: v for k, v in dtypes.items() if k in df.columns}
 
-#### Experience Table
-ds = pd.read_csv('data/cleaned_data_science_files/name_and_experience_info.csv')
-ds['profile_category'] = 'DataScience'
-print(ds.head())
-
-cto = pd.read_csv('data/cleaned_cto_files/name_and_experience_info.csv')
-cto['profile_category'] = 'CTO'
-print(cto.head())
-
-consultant = pd.read_csv('data/cleaned_consultant_files/name_and_experience_info.csv')
-consultant['profile_category'] = 'Consultant'
-print(consultant.head())
 
-exp_df = pd.concat(
-    [ds, cto, consultant]
-).reset_index(drop=True)
-
-exp_df['profile_id_dummy'] = exp_df['profile_category'].astype(str) +  '_' + exp_df['profile_id_dummy'].astype(str)
+#### Experience Table
+exp_df = add_profile_keys(exp_df)
+exp_df = exp_df.astype(column_dtypes(exp_df, {
+    'company': 'category',
+    'positions': 'string',
+    'durations_cleaned': 'string',
+    'names': 'string',
+    'profile_url': 'string',
+    'profile_heading': 'string'
+}))
 
 print(exp_df.head())
 print(exp_df.shape)
-print(exp_df.columns)
-exp_df.to_csv('data/final_cleaned_files/all_name_and_experience_info.csv', index=False)
+print(exp_df.dtypes)
+write_final_table(exp_df, 'experience')
 
 #### Education Table
-ds = pd.read_csv('data/cleaned_data_science_files/education_info.csv')
-ds['profile_category'] = 'DataScience'
-print(ds.head())
-
-cto = pd.read_csv('data/cleaned_cto_files/education_info.csv')
-cto['profile_category'] = 'CTO'
-print(cto.head())
-
-consultant = pd.read_csv('data/cleaned_consultant_files/education_info.csv')
-consultant['profile_category'] = 'Consultant'
-print(consultant.head())
-
-edu_df = pd.concat(
-    [ds, cto, consultant]
-).reset_index(drop=True)
-
-edu_df['profile_id_dummy'] = edu_df['profile_category'].astype(str) +  '_' + edu_df['profile_id_dummy'].astype(str)
+edu_df = add_profile_keys(edu_df)
+edu_df = edu_df.astype(column_dtypes(edu_df, {
+    'education_institute': 'category',
+    'degree_name': 'string',
+    'start_year_degree': 'Int16',
+    'end_year_degree': 'Int16',
+    'parse_status': 'category'
+}))
 
 print(edu_df.head())
 print(edu_df.shape)
-print(edu_df.columns)
-edu_df.to_csv('data/final_cleaned_files/all_education_info.csv', index=False)
-
-
-#### Education Table
-ds = pd.read_csv('data/cleaned_data_science_files/skills_info.csv')
-ds['profile_category'] = 'DataScience'
-print(ds.head())
-print(ds.shape)
-
-cto = pd.read_csv('data/cleaned_cto_files/skills_info.csv')
-cto['profile_category'] = 'CTO'
-print(cto.head())
-print(cto.shape)
+print(edu_df.dtypes)
+write_final_table(edu_df, 'education')
 
-consultant = pd.read_csv('data/cleaned_consultant_files/skills_info.csv')
-consultant['profile_category'] = 'Consultant'
-print(consultant.head())
-print(consultant.shape)
 
-skills_df = pd.concat(
-    [ds, cto, consultant]
-).reset_index(drop=True)
-
-skills_df['profile_id_dummy'] = skills_df['profile_category'].astype(str) +  '_' + skills_df['profile_id_dummy'].astype(str)
+#### Skills Table
+skills_df = add_profile_keys(skills_df)
+skills_df['skill'] = skills_df['skill'].astype('category')
 
 print(skills_df.head())
 print(skills_df.shape)
-print(skills_df.columns)
-print(skills_df.isna().sum())
-skills_df.fillna(0, inplace=True)
+print(skills_df['skill'].nunique())
+
+write_final_table(skills_df, 'skills')
 
-skills_df.to_csv('data/final_cleaned_files/all_skills_info.csv', index=False)
+### sparse profile x skill matrix, rows are the profile keys
+skills_matrix, profile_ids, skill_vocabulary = build_skills_matrix(skills_df)
+write_skills_matrix_file(skills_matrix, profile_ids, skill_vocabulary, FINAL_FILES_PATH)
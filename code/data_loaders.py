@@ -0,0 +1,112 @@
+'''
+Code for loading the final cleaned tables with explicit dtypes
+
+Note:
+- Every column of the final tables has a fixed dtype (`FINAL_TABLE_DTYPES`): int32/int8 keys, categoricals for
+  repeated strings, pyarrow backed strings for free text, nullable small ints for years and datetime64 for dates.
+  Tables written by an older merge are converted on load, so the analysis code always sees the same dtypes
+- The skills flags are not a table of 0/1 columns anymore, `skills_matrix.load_skills_matrix` gives them as a sparse int8 matrix
+- `load_tables` reads several tables (only the given columns and profile categories) and returns a report with the
+  number of rows, the memory used and the time taken to load every table
+'''
+
+######### Imports #########
+
+### generic imports
+import time
+import pandas as pd
+
+### partitioned final tables
+from final_tables import load_final_table
+
+
+######### Initializations #########
+PROFILE_KEY_DTYPES = {
+    'profile_id_dummy': 'int32',
+    'category_code': 'int8',
+    'source_profile_id': 'int32',
+    'profile_category': 'category'
+}
+
+FINAL_TABLE_DTYPES = {
+    'experience': {
+        **PROFILE_KEY_DTYPES,
+        'company': 'category',
+        'positions': 'string[pyarrow]',
+        'durations_cleaned': 'string[pyarrow]',
+        'start_date': 'datetime64[ns]',
+        'end_date': 'datetime64[ns]',
+        'names': 'string[pyarrow]',
+        'profile_url': 'string[pyarrow]',
+        'profile_heading': 'string[pyarrow]'
+    },
+    'education': {
+        **PROFILE_KEY_DTYPES,
+        'education_institute': 'category',
+        'degree_name': 'string[pyarrow]',
+        'start_year_degree': 'Int16',
+        'end_year_degree': 'Int16',
+        'parse_status': 'category'
+    },
+    'skills': {
+        **PROFILE_KEY_DTYPES,
+        'skill': 'category'
+    }
+}
+
+
+######### Define Helper Functions #########
+
+def load_table(table_name, columns=None, profile_categories=None):
+    '''
+    Helper function for reading a final table with the dtypes of `FINAL_TABLE_DTYPES`
+
+    Inputs:
+    - table_name: string, one of the keys of `FINAL_TABLE_DTYPES`
+    - columns: list of strings, columns to read (all if None)
+    - profile_categories: list of strings, category labels to read (all if None)
+    '''
+    table_df = load_final_table(table_name, columns=columns, profile_categories=profile_categories)
+
+    table_dtypes = FINAL_TABLE_DTYPES[table_name]
+    return table_df.astype({i: table_dtypes[i] for i in table_df.columns if i in table_dtypes})
+
+
+def memory_report(table_dfs):
+    '''
+    Helper function for the number of rows and columns and the memory used (deep) by every table
+
+    Inputs:
+    - table_dfs: dict of table name to dataframe
+    '''
+    return pd.DataFrame([
+        {
+            'table': table_name,
+            'rows': table_df.shape[0],
+            'columns': table_df.shape[1],
+            'memory_mb': round(table_df.memory_usage(deep=True).sum() / 1024 / 1024, 2)
+        } for table_name, table_df in table_dfs.items()
+    ])
+
+
+def load_tables(table_columns, profile_categories=None):
+    '''
+    Helper function for reading several final tables, returns a dict of table name to dataframe
+    and the memory report of the tables with the seconds taken to load each of them
+
+    Inputs:
+    - table_columns: dict of table name to the list of columns to read (all columns if None)
+    - profile_categories: list of strings, category labels to read (all if None)
+    '''
+    table_dfs = {}
+    load_seconds = {}
+
+    for table_name, columns in table_columns.items():
+        start = time.time()
+        table_dfs[table_name] = load_table(table_name, columns=columns, profile_categories=profile_categories)
+        load_seconds[table_name] = round(time.time() - start, 3)
+
+    load_report = memory_report(table_dfs)
+    load_report['load_seconds'] = load_report['table'].map(load_seconds)
+
+    return table_dfs, load_report
@@ -10,23 +10,55 @@ import re
 from datetime import datetime
 import pandas as pd
 import numpy as np
+from data_loaders import load_tables
 
 ######################################################################
 #################### Load the Created Final Files ####################
 
-skills_df = pd.read_csv('data/final_cleaned_files/all_skills_info.csv')
-edu_df = pd.read_csv('data/final_cleaned_files/all_education_info.csv')
-exp_df = pd.read_csv('data/final_cleaned_files/all_name_and_experience_info.csv')
-
 profile_category_mapping = {
     'DataScience' : 'Principal Data Scientists',
     'CTO': 'Chief Technology Officers',
     'Consultant' : 'Senior Consultants'
 }
 
-skills_df['profile_category'] = skills_df['profile_category'].map(profile_category_mapping)
-edu_df['profile_category'] = edu_df['profile_category'].map(profile_category_mapping)
-exp_df['profile_category'] = exp_df['profile_category'].map(profile_category_mapping)
+### only the columns and profile categories used below are read, with fixed dtypes (see data_loaders.py)
+### skills are one row per (profile, skill)
+final_tables, load_report = load_tables(
+    {
+        'skills': ['profile_id_dummy', 'skill', 'profile_category'],
+        'education': ['profile_id_dummy', 'degree_name', 'profile_category'],
+        'experience': ['profile_id_dummy', 'company', 'positions', 'start_date', 'end_date', 'profile_category']
+    },
+    profile_categories = list(profile_category_mapping.keys())
+)
+print(load_report)
+
+skills_df = final_tables['skills']
+edu_df = final_tables['education']
+exp_df = final_tables['experience']
+
+skills_df['profile_category'] = skills_df['profile_category'].astype(str).map(profile_category_mapping)
+edu_df['profile_category'] = edu_df['profile_category'].astype(str).map(profile_category_mapping)
+exp_df['profile_category'] = exp_df['profile_category'].astype(str).map(profile_category_mapping)
+
+
+###############################################################
+#################### Top Skills Analysis ######################
+TOP_SKILLS_PER_CATEGORY = 30
+
+num_people_per_category = skills_df.groupby('profile_category')['profile_id_dummy'].nunique()
+
+top_skills_df = skills_df.dropna(subset=['skill']).astype({'skill': str}).groupby(
+    ['profile_category', 'skill']
+)['profile_id_dummy'].size().reset_index(name='count_people').rename(columns={'skill': 'skill_name'})
+
+top_skills_df['percent_people'] = round(
+    (top_skills_df['count_people']/top_skills_df['profile_category'].map(num_people_per_category))*100, 0
+)
+top_skills_df = top_skills_df.sort_values(
+    ['profile_category', 'count_people'], ascending = [True, False], kind = 'stable'
+).groupby('profile_category').head(TOP_SKILLS_PER_CATEGORY).reset_index(drop=True)
+print(top_skills_df.head())
 
 
 ##################################################################
@@ -75,8 +107,8 @@ edu_df['degree_mba'] = edu_df['degree_name'].apply(
 print(edu_df.head())
 
 ### Extract the Highest Level of Education for each Candidate
-edu_df['education_degree_all'] = edu_df['degree_bachelor'].astype(str) + '#' + edu_df['degree_master'].astype(str) + '#' +\
-        edu_df['degree_mba'].astype(str) + '#' + edu_df['degree_doctorate'].astype(str)
+edu_df['education_degree_all'] = edu_df['degree_bachelor'].fillna('') + '#' + edu_df['degree_master'].fillna('') + '#' +\
+        edu_df['degree_mba'].fillna('') + '#' + edu_df['degree_doctorate'].fillna('')
 
 profile_level_education = edu_df.groupby(['profile_category', 'profile_id_dummy'])['education_degree_all'].agg(
     lambda x: list(dict.fromkeys(('#'.join(x)).split('#')))
@@ -140,7 +172,7 @@ def engineering_business_degree(x):
     
     return major_type
 
-edu_df['major_type'] = edu_df['degree_name'].astype(str).apply(engineering_business_degree)
+edu_df['major_type'] = edu_df['degree_name'].fillna('').astype(str).apply(engineering_business_degree)
 
 major_type_df = edu_df.groupby(
     ['profile_category', 'profile_id_dummy']
@@ -174,8 +206,7 @@ print(popular_major_type_df.head())
 #################################################################################
 #################### Total Years of Experience Analysis #########################
 
-exp_df['positions'] = exp_df['positions'].str.lower()
-exp_df['positions'].fillna('', inplace=True)
+exp_df['positions'] = exp_df['positions'].str.lower().fillna('')
 
 single_prof_exp = exp_df.copy()
 single_prof_exp.sort_values(['profile_category', 'profile_id_dummy', 'start_date'], inplace=True)
@@ -230,7 +261,7 @@ def previous_role_type_analysis(profile_type, exp_df,
     '''
 
     single_prof_exp = exp_df[exp_df['profile_category'] == profile_type].copy()
-    single_prof_exp['positions'].fillna('', inplace = True)
+    single_prof_exp['positions'] = single_prof_exp['positions'].fillna('')
 
     single_prof_exp[role_title1_name] = single_prof_exp['positions'].str.contains(role_title1)
     single_prof_exp[role_title2_name] = single_prof_exp['positions'].str.contains(role_title2)
@@ -291,8 +322,7 @@ consultant_roles_df = previous_role_type_analysis(
 ##########################################################################################
 #################### Length of Relationship With Current Company #########################
 
-exp_df['positions'] = exp_df['positions'].str.lower()
-exp_df['positions'].fillna('', inplace=True)
+exp_df['positions'] = exp_df['positions'].str.lower().fillna('')
 exp_df['start_date'] = pd.to_datetime(exp_df['start_date'])
 exp_df['end_date'] = pd.to_datetime(exp_df['end_date'])
 
@@ -0,0 +1,115 @@
+'''
+Code for writing and reading the final cleaned tables as partitioned parquet datasets
+
+Note:
+- Every table (experience, education, skills) is one parquet dataset partitioned by `profile_category`:
+  `data/final_cleaned_files/{table_name}/profile_category={label}/part-0.parquet`
+- Profiles are identified by `profile_id_dummy`, an int32 key that is unique over all categories, next to
+  `category_code` (int8, order of `pipeline_config.PROFILE_CATEGORIES`) and `source_profile_id` (the id within the category).
+  The key is assigned when the tables are merged, only `(profile_category, source_profile_id)` stays the same between merges
+- Repeated strings (company, institute, skill, ...) are stored as dictionary columns and come back as categoricals
+- `load_final_table` only reads the requested columns and partitions
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+
+### paths of every profile category
+from pipeline_config import PROFILE_CATEGORIES
+
+
+######### Initializations #########
+FINAL_FILES_PATH = 'data/final_cleaned_files/'
+
+FINAL_TABLES = ['experience', 'education', 'skills']
+
+PROFILE_KEYS_FILENAME = 'profile_keys.parquet'
+
+CATEGORY_CODES = {
+    category_config['category_label']: category_code
+    for category_code, category_config in enumerate(PROFILE_CATEGORIES.values())
+}
+
+### the partition column is read back as a categorical
+PARTITIONING = ds.HivePartitioning.discover(infer_dictionary=True)
+
+
+######### Define Helper Functions #########
+
+def build_profile_keys(profile_ids_df):
+    '''
+    Helper function for assigning the int32 profile key and the category code of every profile,
+    profiles are numbered in the order of their category code and id within the category
+
+    Inputs:
+    - profile_ids_df: dataframe with the columns profile_category (category label) and source_profile_id
+    '''
+    profile_keys_df = profile_ids_df[['profile_category', 'source_profile_id']].drop_duplicates().copy()
+
+    profile_keys_df['category_code'] = profile_keys_df['profile_category'].map(CATEGORY_CODES).astype('int8')
+    profile_keys_df['source_profile_id'] = profile_keys_df['source_profile_id'].astype('int32')
+
+    profile_keys_df = profile_keys_df.sort_values(['category_code', 'source_profile_id']).reset_index(drop=True)
+    profile_keys_df['profile_id_dummy'] = np.arange(profile_keys_df.shape[0], dtype=np.int32)
+
+    return profile_keys_df[['profile_id_dummy', 'category_code', 'source_profile_id', 'profile_category']]
+
+
+def write_final_table(table_df, table_name, folder_path=FINAL_FILES_PATH):
+    '''
+    Helper function for writing a final table as a parquet dataset partitioned by profile category,
+    an earlier version of the table is replaced completely
+
+    Inputs:
+    - table_df: dataframe with a profile_category column
+    - table_name: string, one of `FINAL_TABLES`
+    - folder_path: string, folder with the final tables
+    '''
+    table_path = os.path.join(folder_path, table_name)
+    if os.path.exists(table_path):
+        shutil.rmtree(table_path)
+
+    table_df = table_df.astype({'profile_category': str})
+    pq.write_to_dataset(
+        pa.Table.from_pandas(table_df, preserve_index=False),
+        root_path = table_path,
+        partition_cols = ['profile_category'],
+        basename_template = 'part-{i}.parquet'
+    )
+
+
+def load_final_table(table_name, columns=None, profile_categories=None, folder_path=FINAL_FILES_PATH):
+    '''
+    Helper function for reading a final table, only the given columns and profile categories are read
+
+    Inputs:
+    - table_name: string, one of `FINAL_TABLES`
+    - columns: list of strings, columns to read (all if None)
+    - profile_categories: list of strings, category labels to read (all if None)
+    - folder_path: string, folder with the final tables
+    '''
+    table_dataset = ds.dataset(os.path.join(folder_path, table_name), format='parquet', partitioning=PARTITIONING)
+
+    table_filter = None
+    if profile_categories is not None:
+        table_filter = ds.field('profile_category').isin(profile_categories)
+
+    return table_dataset.to_table(columns=columns, filter=table_filter).to_pandas()
+
+
+def load_profile_keys(folder_path=FINAL_FILES_PATH):
+    '''
+    Helper function for reading the profile key, category code and id within the category of every profile
+
+    Inputs:
+    - folder_path: string, folder with the final tables
+    '''
+    return pd.read_parquet(os.path.join(folder_path, PROFILE_KEYS_FILENAME))
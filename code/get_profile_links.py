@@ -2,34 +2,56 @@
 Code for fetching profile links based on the Profile Title
 
 Note:
-- This code runs sequentially
-- Change the variable `SEARCH_TERM` to search profiles for a different profile title
-- List of Terms:
+- Harvests several search terms in parallel, one logged in browser session per term
+- Search result pages are opened directly by url (`&page=N`) instead of clicking "Next"
+- Profiles already in the link index (`link_index.py`) are skipped, a search term stops at the first page without
+  new profiles (disable with `--no-early-stop`). Only the newly found links are appended to the csv files,
+  the rows harvested before are never rewritten
+- The links of every page are appended to the csv before they go into the link index, so an interrupted run
+  keeps everything harvested up to its last page
+- The search terms and their output csv files are listed in `pipeline_config.SEARCH_TERMS`:
     - Data Science: Principal Data Scientist
     - Management Consultant, Partner McKinsey, Principal BCG
     - Chief Technology Officer
     - Chief Executive Officer
+- Usage (from the repository root):
+    - all terms: `python code/get_profile_links.py`
+    - some terms: `python code/get_profile_links.py --terms "Chief Executive Officer" "Principal BCG" --sessions 2`
+- Set the `SCRAPE_MODE` environment variable to 'lite' for headless chrome without images/fonts/trackers
 '''
 
 ### generic imports
 import logging
-import time
 import traceback
 import os
+import argparse
+import multiprocessing as mp
+from urllib.parse import quote
 import pandas as pd
 from dotenv import load_dotenv
 
 ### selenium imports
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+
+### logged in browser sessions
+from browser_sessions import BrowserSession, install_chromedriver
+
+### global rate limiter shared with the profile scraper
+from rate_limiter import RateLimiter, page_request_ok
+
+### condition based page waits
+from page_waits import SEARCH_RESULTS_READY, wait_and_measure_page, write_page_timings
+
+### index of the already harvested profile links
+from link_index import LinkIndex, append_links_csv, profile_slug
+
+### search terms and their output files
+from pipeline_config import NUM_PAGES_TO_FETCH_FOR_PROFILES, SEARCH_TERMS
 
 
 ############# Initializations #############
-SEARCH_TERM = "Chief Executive Officer"
-PROFILE_CSV_FILENAME = 'data/CEOProfiles.csv'
-NUM_PAGES_TO_FETCH_FOR_PROFILES = 20
+SEARCH_URL_FORMAT = 'https://www.linkedin.com/search/results/people/?keywords={keywords}&origin=GLOBAL_SEARCH_HEADER&page={page_num}'
+PAGE_TIMINGS_FILENAME = 'assets/page_ready_timings_search.csv'
 
 ERROR_LOG_STRING_FORMAT = '''
     {section_title}
@@ -69,180 +91,236 @@ def error_logging_helper(log_filename:str = 'all_logs.log', logger_name:str = 'e
 logger = error_logging_helper('assets/all_logs.log')
 
 
-############### Selenium Code Block ###############
-
-### Open Chrome Driver
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()))
+def search_page_url(search_term, page_num):
+    '''
+    Helper function for building the url of one page of people search results
 
-### Go to linkedin URL
-driver.get("https://linkedin.com")
+    Inputs:
+    - search_term: string, text searched for
+    - page_num: int, page of the search results (starts at 1)
+    '''
+    return SEARCH_URL_FORMAT.format(keywords=quote(search_term), page_num=page_num)
 
-### Enter Username and Password and Click on Login
-input_elements = driver.find_elements(
-    By.XPATH,
-    "//input[contains(@class, 'input__input' )][1]"
-)
-input_elements[0].send_keys(email)
-input_elements[1].send_keys(password)
 
-submit_button = driver.find_elements(
-    By.XPATH,
-    "//button[contains(@class, 'sign-in-form__submit-button')]"
-)
-submit_button[0].click()
+def extract_profiles_from_page(driver, page_num):
+    '''
+    Helper function for reading the name, profile url and heading of every person on a search results page
 
-time.sleep(7)
+    Inputs:
+    - driver: selenium webdriver with a search results page loaded
+    - page_num: int, page number, only used for logging
+    '''
+    profile_urls = []
+    profile_names = []
+    profile_headings = []
 
-### Focus on Search Button, Enter Search Term, and Press Enter
-try:
-    ### find search button
-    search_button = driver.find_elements(
+    single_page_profiles = driver.find_elements(
         By.XPATH,
-        "//button[contains(@class, 'search-global-typeahead__collapsed-search-button')]"
+        "//div[contains(@class, 'entity-result__item')]"
     )
-    search_button[0].click()
-    
-except:
-    ### input search term in the search field
-    input_search_field_xpath = "//input[contains(@class, 'search-global-typeahead__input always-show-placeholder')]"
-    search_input_field = driver.find_elements(
-        By.XPATH, 
-        input_search_field_xpath
-    )
-
-    search_input_field[0].clear()
-    search_input_field[0].send_keys(SEARCH_TERM + "\n")
-    
-time.sleep(7)
-
-
-### Get All Single User Profile Links and Names - click "Next" to move to further pages
-
-all_profile_urls = []
-all_profile_names = []
-all_profile_headings = []
+    print(len(single_page_profiles))
 
-for page_num in range(1, NUM_PAGES_TO_FETCH_FOR_PROFILES+1):    
-    try:
-        print("###"*10, " Page Num: ", page_num, "###"*10, end="\n\n")
-        single_page_profiles = driver.find_elements(
-            By.XPATH,
-            "//div[contains(@class, 'entity-result__item')]"
-        )
-        print(len(single_page_profiles))
+    for idx, single_person in enumerate(single_page_profiles):
+        try:
+            single_person_block = single_person.find_element(
+                By.XPATH, 
+                ".//span[contains(@class, 'entity-result__title-text')]"   
+            )
 
-        for idx, single_person in enumerate(single_page_profiles):
             try:
-                single_person_block = single_person.find_element(
-                    By.XPATH, 
-                    ".//span[contains(@class, 'entity-result__title-text')]"   
-                )
-
-                try:
-                    single_person_profile_url = single_person_block.find_element(
-                        By.TAG_NAME, 
-                        'a'
-                    ).get_attribute('href')
-                except Exception as e:
-                    single_person_profile_url = ''
-                    logger.error(
-                        ERROR_LOG_STRING_FORMAT.format(
-                            section_title = 'Fetching Single User Profile URL',
-                            description = 'Error for Person Num: ' + str(idx+1) + " in Page Num: " + str(page_num),
-                            error_message = str(e)
-                        )
-                    )
-
-                try:
-                    single_person_name = single_person_block.find_element(
-                        By.XPATH,
-                        './/a/span/span'
-                    ).text
-                except Exception as e:
-                    single_person_name = ''
-                    logger.error(
-                        ERROR_LOG_STRING_FORMAT.format(
-                            section_title = 'Fetching Single User Profile Name',
-                            description = 'Error for Person Num: ' + str(idx+1) + " in Page Num: " + str(page_num),
-                            error_message = str(e)
-                        )
+                single_person_profile_url = single_person_block.find_element(
+                    By.TAG_NAME, 
+                    'a'
+                ).get_attribute('href')
+            except Exception as e:
+                single_person_profile_url = ''
+                logger.error(
+                    ERROR_LOG_STRING_FORMAT.format(
+                        section_title = 'Fetching Single User Profile URL',
+                        description = 'Error for Person Num: ' + str(idx+1) + " in Page Num: " + str(page_num),
+                        error_message = str(e)
                     )
+                )
 
-                try:
-                    single_person_heading = single_person.find_element(
-                        By.XPATH,
-                        ".//div[contains(@class, 'entity-result__primary-subtitle')]"
-                    ).text
-                except Exception as e:
-                    single_person_heading = ''
-                    logger.error(
-                        ERROR_LOG_STRING_FORMAT.format(
-                            section_title = 'Fetching Single User Profile Heading',
-                            description = 'Error for Person Num: ' + str(idx+1) + " in Page Num: " + str(page_num),
-                            error_message = str(e)
-                        )
+            try:
+                single_person_name = single_person_block.find_element(
+                    By.XPATH,
+                    './/a/span/span'
+                ).text
+            except Exception as e:
+                single_person_name = ''
+                logger.error(
+                    ERROR_LOG_STRING_FORMAT.format(
+                        section_title = 'Fetching Single User Profile Name',
+                        description = 'Error for Person Num: ' + str(idx+1) + " in Page Num: " + str(page_num),
+                        error_message = str(e)
                     )
+                )
 
+            try:
+                single_person_heading = single_person.find_element(
+                    By.XPATH,
+                    ".//div[contains(@class, 'entity-result__primary-subtitle')]"
+                ).text
             except Exception as e:
+                single_person_heading = ''
                 logger.error(
                     ERROR_LOG_STRING_FORMAT.format(
-                        section_title = 'Fetching Single User Overall Item',
+                        section_title = 'Fetching Single User Profile Heading',
                         description = 'Error for Person Num: ' + str(idx+1) + " in Page Num: " + str(page_num),
                         error_message = str(e)
                     )
                 )
 
-                single_person_profile_url = ''
-                single_person_name = ''
-                single_person_heading = ''
+        except Exception as e:
+            logger.error(
+                ERROR_LOG_STRING_FORMAT.format(
+                    section_title = 'Fetching Single User Overall Item',
+                    description = 'Error for Person Num: ' + str(idx+1) + " in Page Num: " + str(page_num),
+                    error_message = str(e)
+                )
+            )
 
-            all_profile_urls.append(single_person_profile_url)
-            all_profile_names.append(single_person_name)
-            all_profile_headings.append(single_person_heading)
-    
-        ### click next button
-        time.sleep(5)
-        
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        
-        time.sleep(5)
-        
-        next_button = driver.find_elements(
-            By.XPATH,
-            "//button[contains(@class, 'artdeco-pagination__button--next')]"
-        )[0]
-        next_button.click()
-        
-        time.sleep(7)
-
-    except Exception as e:
-        logger.error(
-            ERROR_LOG_STRING_FORMAT.format(
-                section_title = 'Error in Fetching Entire Page Profiles or Clicking Next Page',
-                description = 'Error for  Page Num: ' + str(page_num),
-                error_message = str(e) + "\n" + str(traceback.format_exc())
+            single_person_profile_url = ''
+            single_person_name = ''
+            single_person_heading = ''
+
+        profile_urls.append(single_person_profile_url)
+        profile_names.append(single_person_name)
+        profile_headings.append(single_person_heading)
+
+    return profile_urls, profile_names, profile_headings
+
+
+def harvest_search_term(search_term, profile_csv_filename, num_pages, driver_path, early_stop=True):
+    '''
+    Helper function for fetching the profile links of all result pages of one search term.
+    Mainly created for use in multiprocessing, every search term gets its own browser session.
+    Profiles already in the link index are skipped, and with `early_stop` the search term is finished
+    as soon as a page only has known profiles (the results further down were harvested before)
+
+    Inputs:
+    - search_term: string, text searched for
+    - profile_csv_filename: string, csv file the profile links of the search term are exported to
+    - num_pages: int, maximum number of search result pages to fetch
+    - driver_path: string, path of the chromedriver installed once for the run
+    - early_stop: bool, stop at the first page without new profiles
+    '''
+    browser_session = BrowserSession(driver_path, email, password)
+    browser_session.start()
+    rate_limiter = RateLimiter()
+    link_index = LinkIndex()
+
+    page_timings = []
+    links_appended = 0
+    new_profiles = 0
+    known_profiles = 0
+
+    for page_num in range(1, num_pages+1):
+        try:
+            print("###"*10, search_term, " Page Num: ", page_num, "###"*10, end="\n\n")
+
+            page_url = search_page_url(search_term, page_num)
+            rate_limiter.acquire('search_page')
+            driver = browser_session.get(page_url)
+
+            page_timings.append(
+                wait_and_measure_page(driver, SEARCH_RESULTS_READY, 'search', page_url)
+            )
+            rate_limiter.record_result(
+                'search_page', page_request_ok(page_timings[-1]['ready'], driver.current_url)
+            )
+
+            profile_urls, profile_names, profile_headings = extract_profiles_from_page(driver, page_num)
+
+            ### an empty page means the search has no more results
+            if len(profile_urls) == 0:
+                break
+
+            page_profiles = [i for i in zip(profile_urls, profile_names, profile_headings) if profile_slug(i[0]) != '']
+            page_new_links = link_index.unknown_links(page_profiles)
+            page_new_profiles = len(page_new_links)
+
+            ### the csv is written first, a profile only counts as known once its link is saved
+            page_links_df = pd.DataFrame(page_new_links, columns=['profile_url', 'names', 'profile_heading'])
+            links_appended += append_links_csv(
+                page_links_df[['names', 'profile_url', 'profile_heading']], profile_csv_filename
+            ).shape[0]
+            link_index.add_links(page_new_links, search_term)
+
+            new_profiles += page_new_profiles
+            known_profiles += len(page_profiles) - page_new_profiles
+            print('New Profiles: ', page_new_profiles, ' Known Profiles: ', len(page_profiles) - page_new_profiles)
+
+            if early_stop and len(page_profiles) > 0 and page_new_profiles == 0:
+                print('Only known profiles on page ', page_num, ', stopping search term: ', search_term)
+                break
+
+        except Exception as e:
+            logger.error(
+                ERROR_LOG_STRING_FORMAT.format(
+                    section_title = 'Error in Fetching Entire Page Profiles',
+                    description = 'Error for Search Term: ' + search_term + ' Page Num: ' + str(page_num),
+                    error_message = str(e) + "\n" + str(traceback.format_exc())
+                )
             )
-        )
 
-################### Save Profile Links into CSV Files ###################
+    write_page_timings(page_timings, PAGE_TIMINGS_FILENAME, search_term, browser_session.scrape_mode)
+    browser_session.quit()
+    rate_limiter.close()
+    link_index.close()
 
-APPEND = False
+    print(search_term, ' links appended to ', profile_csv_filename, ': ', links_appended)
 
-if APPEND:
-    old_df = pd.read_csv(PROFILE_CSV_FILENAME)
+    return {
+        'search_term': search_term,
+        'profile_csv_filename': profile_csv_filename,
+        'pages_fetched': len(page_timings),
+        'new_profiles': new_profiles,
+        'known_profiles_skipped': known_profiles,
+        'links_appended': links_appended
+    }
 
-final_user_info_df = pd.DataFrame({
-    'names': all_profile_names,
-    'profile_url': all_profile_urls,
-    'profile_heading': all_profile_headings
-})
 
-if APPEND:
-    final_user_info_df = pd.concat([old_df, final_user_info_df]).reset_index(drop=True)
+############### Main block for harvesting all search terms in parallel ###############
 
-print(final_user_info_df['profile_url'].nunique())
-final_user_info_df = final_user_info_df.drop_duplicates()
-print(final_user_info_df.shape)
-print(final_user_info_df.head())
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch LinkedIn profile links for a list of search terms')
+    parser.add_argument(
+        '--terms', nargs='+', default=list(SEARCH_TERMS.keys()),
+        help='search terms to harvest, the output csv of each term is taken from pipeline_config.SEARCH_TERMS'
+    )
+    parser.add_argument('--pages', type=int, default=NUM_PAGES_TO_FETCH_FOR_PROFILES)
+    parser.add_argument('--sessions', type=int, default=2, help='number of parallel browser sessions')
+    parser.add_argument(
+        '--no-early-stop', action='store_true',
+        help='keep fetching pages after a page with only already known profiles'
+    )
+    args = parser.parse_args()
+
+    unknown_terms = [i for i in args.terms if i not in SEARCH_TERMS]
+    if len(unknown_terms) > 0:
+        raise ValueError('Add an output csv to pipeline_config.SEARCH_TERMS for: ' + ', '.join(unknown_terms))
+
+    ### links harvested before the index existed are added first, so they are skipped instead of appended again
+    link_index = LinkIndex()
+    for search_term in args.terms:
+        print(search_term, ' links added from existing csv: ', link_index.add_from_csv(SEARCH_TERMS[search_term], search_term))
+    link_index.close()
+
+    ### install chromedriver once and log in once, the sessions reuse the saved session cookies
+    driver_path = install_chromedriver()
+    first_session = BrowserSession(driver_path, email, password)
+    first_session.start()
+    first_session.quit()
+
+    with mp.Pool(processes = min(args.sessions, len(args.terms))) as pool:
+        result = pool.starmap(
+            harvest_search_term,
+            iterable = [
+                (search_term, SEARCH_TERMS[search_term], args.pages, driver_path, not args.no_early_stop)
+                for search_term in args.terms
+            ]
+        )
 
-final_user_info_df.to_csv(PROFILE_CSV_FILENAME, index=False)
+    print(pd.DataFrame(result))
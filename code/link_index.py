@@ -0,0 +1,217 @@
+'''
+Code for a persistent index of all harvested profile links
+
+Note:
+- Search results link to profiles as `/in/<slug>?miniProfileUrn=...`, the query string changes between
+  searches so the same person shows up under different urls. Links are stored under the canonical
+  `https://www.linkedin.com/in/<slug>` url, keyed by the slug
+- The known slugs are also kept in a python set, checking if a profile was already harvested does not hit the disk
+- A profile is stored once, under the first search term it was found for
+- The index is only used for skipping known profiles, the per search term csv files are never rewritten from it.
+  Links found in a run are appended to the csv (`append_links_csv`), the existing rows (with their order, urls,
+  duplicates across search terms and `profile_id_dummy` column) stay as they are, so the ids built from them do not change
+- New links are appended to the csv before they are added to the index, a run that dies in between
+  does not lose them: the next run adds the csv links to the index first (`add_from_csv`)
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import sqlite3
+import pandas as pd
+from urllib.parse import urlsplit, unquote
+
+
+######### Initializations #########
+LINK_INDEX_FILENAME = 'data/profile_link_index.sqlite'
+
+PROFILE_URL_PREFIX = 'https://www.linkedin.com/in/'
+
+LINK_INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS links (
+    slug TEXT PRIMARY KEY,
+    profile_url TEXT NOT NULL,
+    names TEXT,
+    profile_heading TEXT,
+    search_term TEXT NOT NULL,
+    first_seen_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS links_search_term_idx ON links (search_term);
+'''
+
+
+######### Define Helper Functions #########
+
+def profile_slug(profile_url):
+    '''
+    Helper function for getting the profile slug (`/in/<slug>`) of a linkedin profile url.
+    Returns an empty string for urls that do not point to a profile (e.g. "LinkedIn Member" results)
+
+    Inputs:
+    - profile_url: string, profile url as found on the search results page
+    '''
+    if type(profile_url) != str:
+        return ''
+
+    path_parts = [i for i in urlsplit(profile_url.strip()).path.split('/') if i != '']
+
+    if len(path_parts) < 2 or path_parts[0] != 'in':
+        return ''
+
+    return unquote(path_parts[1]).lower()
+
+
+def canonical_profile_url(profile_url):
+    '''
+    Helper function for turning any linkedin profile url into its canonical form, empty string if not a profile url
+
+    Inputs:
+    - profile_url: string, profile url as found on the search results page
+    '''
+    slug = profile_slug(profile_url)
+    return PROFILE_URL_PREFIX + slug if slug != '' else ''
+
+
+class LinkIndex:
+    '''
+    Sqlite backed index of harvested profile links with an in memory set of the known slugs
+
+    Inputs:
+    - db_filename: string, sqlite file shared by all the harvesting processes
+    '''
+
+    def __init__(self, db_filename=LINK_INDEX_FILENAME):
+        self.connection = sqlite3.connect(db_filename, timeout=60, isolation_level=None)
+        self.connection.executescript(LINK_INDEX_SCHEMA)
+
+        self.known_slugs = set(i[0] for i in self.connection.execute('SELECT slug FROM links'))
+
+
+    def is_known(self, profile_url):
+        '''
+        Check if a profile was already harvested
+
+        Inputs:
+        - profile_url: string, any url of the profile
+        '''
+        return profile_slug(profile_url) in self.known_slugs
+
+
+    def add(self, profile_url, names, profile_heading, search_term):
+        '''
+        Add a profile link, returns True if the profile was not known before.
+        Urls that are not profile urls are ignored
+
+        Inputs:
+        - profile_url: string, any url of the profile
+        - names: string, name shown on the search results page
+        - profile_heading: string, heading shown on the search results page
+        - search_term: string, search term the profile was found for
+        '''
+        slug = profile_slug(profile_url)
+        if slug == '' or slug in self.known_slugs:
+            return False
+
+        self.known_slugs.add(slug)
+
+        ### another harvesting process might have added it since the set was loaded
+        cursor = self.connection.execute(
+            'INSERT OR IGNORE INTO links VALUES (?, ?, ?, ?, ?, ?)',
+            (slug, PROFILE_URL_PREFIX + slug, names, profile_heading, search_term, pd.Timestamp.now().isoformat())
+        )
+        return cursor.rowcount == 1
+
+
+    def unknown_links(self, links):
+        '''
+        Get the links of profiles that are not in the index yet, without adding them.
+        Urls that are not profile urls and repeats of the same profile are dropped
+
+        Inputs:
+        - links: list of (profile_url, names, profile_heading) tuples
+        '''
+        unknown_links = []
+        seen_slugs = set()
+        for link in links:
+            slug = profile_slug(link[0])
+            if slug == '' or slug in self.known_slugs or slug in seen_slugs:
+                continue
+            seen_slugs.add(slug)
+            unknown_links.append(link)
+
+        return unknown_links
+
+
+    def add_links(self, links, search_term):
+        '''
+        Add several profile links in one transaction, returns the number of new profiles
+
+        Inputs:
+        - links: list of (profile_url, names, profile_heading) tuples
+        - search_term: string, search term the profiles were found for
+        '''
+        self.connection.execute('BEGIN')
+        new_profiles = sum(self.add(i[0], i[1], i[2], search_term) for i in links)
+        self.connection.execute('COMMIT')
+
+        return new_profiles
+
+
+    def add_from_csv(self, profile_csv_filename, search_term):
+        '''
+        Add the links of a csv written before the index existed, returns the number of new profiles
+
+        Inputs:
+        - profile_csv_filename: string, csv with the columns names, profile_url and profile_heading
+        - search_term: string, search term the csv was harvested for
+        '''
+        if not os.path.exists(profile_csv_filename):
+            return 0
+
+        old_df = pd.read_csv(profile_csv_filename)
+
+        self.connection.execute('BEGIN')
+        new_profiles = sum(
+            self.add(row.profile_url, row.names, row.profile_heading, search_term)
+            for row in old_df.itertuples()
+        )
+        self.connection.execute('COMMIT')
+
+        return new_profiles
+
+
+    def close(self):
+        '''
+        Close the sqlite connection
+        '''
+        self.connection.close()
+
+
+def append_links_csv(new_links_df, profile_csv_filename):
+    '''
+    Helper function for appending newly found links to the csv of a search term, the existing rows are not touched.
+    If the csv already has a `profile_id_dummy` column, the new rows continue its numbering
+
+    Inputs:
+    - new_links_df: dataframe with the columns names, profile_url and profile_heading, in the order the links were found
+    - profile_csv_filename: string, csv file of the search term
+    '''
+    if new_links_df.shape[0] == 0:
+        return new_links_df
+
+    if not os.path.exists(profile_csv_filename):
+        new_links_df.to_csv(profile_csv_filename, index=False)
+        return new_links_df
+
+    old_df = pd.read_csv(profile_csv_filename)
+
+    new_links_df = new_links_df.copy()
+    if 'profile_id_dummy' in old_df.columns:
+        first_new_id = int(old_df['profile_id_dummy'].max()) + 1 if old_df.shape[0] > 0 else 0
+        new_links_df['profile_id_dummy'] = range(first_new_id, first_new_id + new_links_df.shape[0])
+
+    new_links_df = new_links_df.reindex(columns=old_df.columns)
+    new_links_df.to_csv(profile_csv_filename, mode='a', header=False, index=False)
+
+    return new_links_df
@@ -0,0 +1,291 @@
+'''
+Code for archiving raw scraped pages
+
+Note:
+- Every fetched page is stored once, keyed by the sha256 of its html (content addressed),
+  so re-fetching an unchanged page does not store it again
+- Pages are compressed (zstd when `zstandard` is installed, gzip otherwise) and appended to
+  one pack file per run, the sqlite index keeps profile id, profile url, fetch time and
+  the position of the page inside the pack file
+- Safe to use from multiple worker processes, writes are serialized by the sqlite index
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import gzip
+import sqlite3
+import hashlib
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+######### Initializations #########
+ARCHIVE_FOLDER = 'data/page_archive/'
+
+ARCHIVE_INDEX_FILENAME = 'index.sqlite'
+
+DEFAULT_CODEC = 'zstd' if zstandard is not None else 'gzip'
+
+ARCHIVE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    pack_file TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_length INTEGER NOT NULL,
+    codec TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    page_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    profile_id_dummy INTEGER,
+    profile_url TEXT,
+    page_type TEXT NOT NULL,
+    page_url TEXT,
+    fetched_at TEXT NOT NULL,
+    run_name TEXT NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256)
+);
+CREATE INDEX IF NOT EXISTS pages_profile_id_idx ON pages (profile_id_dummy, page_type, fetched_at);
+CREATE INDEX IF NOT EXISTS pages_profile_url_idx ON pages (profile_url, fetched_at);
+'''
+
+
+######### Define Helper Functions #########
+
+def new_run_name():
+    '''
+    Helper function for generating the name of a scraping run (also the pack file name)
+    '''
+    return 'run_' + datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+def compress_page(raw_bytes, codec):
+    '''
+    Helper function for compressing a page with the given codec
+
+    Inputs:
+    - raw_bytes: bytes, utf-8 encoded page source
+    - codec: string, 'zstd' or 'gzip'
+    '''
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(raw_bytes)
+    return gzip.compress(raw_bytes, compresslevel=6)
+
+
+def decompress_page(compressed_bytes, codec):
+    '''
+    Helper function for decompressing a page stored with the given codec
+
+    Inputs:
+    - compressed_bytes: bytes, page as stored in the pack file
+    - codec: string, 'zstd' or 'gzip'
+    '''
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError('zstandard is required to read zstd compressed pages')
+        return zstandard.ZstdDecompressor().decompress(compressed_bytes)
+    return gzip.decompress(compressed_bytes)
+
+
+class PageArchive:
+    '''
+    Content addressed, compressed archive of raw profile pages
+
+    Inputs:
+    - archive_folder: string, folder holding the pack files and the index
+    - run_name: string, name of the current run, pages written by this object go
+      into `{run_name}.pack`. Only needed for writing
+    - codec: string, compression used for new pages
+    '''
+
+    def __init__(self, archive_folder=ARCHIVE_FOLDER, run_name=None, codec=DEFAULT_CODEC):
+        os.makedirs(archive_folder, exist_ok=True)
+
+        self.archive_folder = archive_folder
+        self.run_name = run_name
+        self.codec = codec
+
+        self.connection = sqlite3.connect(
+            os.path.join(archive_folder, ARCHIVE_INDEX_FILENAME),
+            timeout = 60,
+            isolation_level = None
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(ARCHIVE_SCHEMA)
+
+        self._pack_readers = {}
+
+
+    def put_page(self, profile_id, profile_url, page_type, html, page_url='', fetched_at=None):
+        '''
+        Store a fetched page, returns the sha256 of the page
+
+        Inputs:
+        - profile_id: int, profile_id_dummy of the profile
+        - profile_url: string, url of the profile the page belongs to
+        - page_type: string, 'profile' or 'skills'
+        - html: string, raw page source
+        - page_url: string, url the page was fetched from
+        - fetched_at: datetime, defaults to now
+        '''
+        if self.run_name is None:
+            raise ValueError('PageArchive needs a run_name for writing pages')
+
+        if fetched_at is None:
+            fetched_at = datetime.now()
+
+        raw_bytes = html.encode('utf-8')
+        sha256 = hashlib.sha256(raw_bytes).hexdigest()
+        pack_file = self.run_name + '.pack'
+
+        ### the immediate transaction locks the index, so only one process appends at a time
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            already_stored = self.connection.execute(
+                'SELECT 1 FROM blobs WHERE sha256 = ?', (sha256,)
+            ).fetchone()
+
+            if already_stored is None:
+                compressed_bytes = compress_page(raw_bytes, self.codec)
+
+                with open(os.path.join(self.archive_folder, pack_file), 'ab') as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(compressed_bytes)
+
+                self.connection.execute(
+                    'INSERT INTO blobs VALUES (?, ?, ?, ?, ?, ?)',
+                    (sha256, pack_file, offset, len(compressed_bytes), len(raw_bytes), self.codec)
+                )
+
+            self.connection.execute(
+                '''INSERT INTO pages (profile_id_dummy, profile_url, page_type, page_url, fetched_at, run_name, sha256)
+                VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                (profile_id, profile_url, page_type, page_url, fetched_at.isoformat(), self.run_name, sha256)
+            )
+            self.connection.execute('COMMIT')
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+
+        return sha256
+
+
+    def read_blob(self, sha256):
+        '''
+        Read a page by its sha256
+
+        Inputs:
+        - sha256: string, content hash of the page
+        '''
+        blob_row = self.connection.execute(
+            'SELECT * FROM blobs WHERE sha256 = ?', (sha256,)
+        ).fetchone()
+
+        if blob_row is None:
+            raise KeyError(sha256)
+
+        return self._read_blob_row(blob_row)
+
+
+    def _read_blob_row(self, blob_row):
+        '''
+        Read the bytes of a blob from its pack file, pack files are kept open for streaming
+        '''
+        pack_file = blob_row['pack_file']
+        if pack_file not in self._pack_readers:
+            self._pack_readers[pack_file] = open(os.path.join(self.archive_folder, pack_file), 'rb')
+
+        reader = self._pack_readers[pack_file]
+        reader.seek(blob_row['offset'])
+        compressed_bytes = reader.read(blob_row['length'])
+
+        return decompress_page(compressed_bytes, blob_row['codec']).decode('utf-8')
+
+
+    def get_page(self, profile_id, page_type='profile'):
+        '''
+        Random access to the latest fetch of a page by profile_id_dummy, returns the
+        row of the index (as a dict) and the html, or None if the page was never archived
+
+        Inputs:
+        - profile_id: int, profile_id_dummy of the profile
+        - page_type: string, 'profile' or 'skills'
+        '''
+        page_row = self.connection.execute(
+            '''SELECT pages.*, blobs.pack_file, blobs.offset, blobs.length, blobs.codec
+            FROM pages JOIN blobs ON pages.sha256 = blobs.sha256
+            WHERE profile_id_dummy = ? AND page_type = ?
+            ORDER BY fetched_at DESC LIMIT 1''',
+            (int(profile_id), page_type)
+        ).fetchone()
+
+        if page_row is None:
+            return None
+
+        return dict(page_row), self._read_blob_row(page_row)
+
+
+    def iter_pages(self, page_type=None, run_name=None):
+        '''
+        Stream all archived pages in pack file order, yields (index row as a dict, html)
+
+        Inputs:
+        - page_type: string, optional, only yield pages of this type
+        - run_name: string, optional, only yield pages fetched in this run
+        '''
+        query = '''SELECT pages.*, blobs.pack_file, blobs.offset, blobs.length, blobs.codec
+            FROM pages JOIN blobs ON pages.sha256 = blobs.sha256 WHERE 1 = 1'''
+        params = []
+
+        if page_type is not None:
+            query += ' AND page_type = ?'
+            params.append(page_type)
+        if run_name is not None:
+            query += ' AND run_name = ?'
+            params.append(run_name)
+
+        query += ' ORDER BY blobs.pack_file, blobs.offset'
+
+        for page_row in self.connection.execute(query, params):
+            yield dict(page_row), self._read_blob_row(page_row)
+
+
+    def iter_profile_page_tuples(self):
+        '''
+        Stream the latest profile and skills page of every archived profile as
+        (profile_id, profile_html, skills_html, all_skills_link) tuples,
+        the input format of `profile_parser.parse_profiles_batch`
+        '''
+        latest_pages_query = '''SELECT profile_id_dummy, page_type, page_url, sha256, MAX(fetched_at)
+            FROM pages WHERE page_type = ? GROUP BY profile_id_dummy'''
+
+        skills_pages = {
+            i['profile_id_dummy']: (i['sha256'], i['page_url'])
+            for i in self.connection.execute(latest_pages_query, ('skills',)).fetchall()
+        }
+
+        for page_row in self.connection.execute(latest_pages_query, ('profile',)).fetchall():
+            profile_id = page_row['profile_id_dummy']
+            skills_html, all_skills_link = '', ''
+
+            if profile_id in skills_pages:
+                skills_html = self.read_blob(skills_pages[profile_id][0])
+                all_skills_link = skills_pages[profile_id][1]
+
+            yield profile_id, self.read_blob(page_row['sha256']), skills_html, all_skills_link
+
+
+    def close(self):
+        '''
+        Close the index connection and all open pack files
+        '''
+        for reader in self._pack_readers.values():
+            reader.close()
+        self._pack_readers = {}
+        self.connection.close()
@@ -0,0 +1,175 @@
+'''
+Code for waiting until LinkedIn pages are ready instead of sleeping for a fixed time
+
+Note:
+- Polls the page for the elements the scrapers actually need (explicit selenium waits)
+- `PAGE_READY_TIMEOUT` is only a ceiling, most pages are ready well before it
+- Every wait returns a timing record (time-to-ready per page) that can be appended to a csv,
+  `page_transfer_stats` adds the bytes transferred so scrape modes can be compared (`compare_scrape_modes`)
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import time
+import pandas as pd
+
+### selenium imports
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+
+######### Initializations #########
+PAGE_READY_TIMEOUT = 20
+
+POLL_FREQUENCY = 0.25
+
+PAGE_TIMINGS_FILENAME = 'assets/page_ready_timings.csv'
+
+### elements that have to be present before a page is considered ready
+LOGGED_IN_READY = [
+    (By.XPATH, "//*[contains(@class, 'search-global-typeahead')]")
+]
+LOGIN_FORM_READY = [
+    (By.XPATH, "//input[contains(@class, 'input__input' )]")
+]
+SEARCH_RESULTS_READY = [
+    (By.XPATH, "//div[contains(@class, 'entity-result__item')]")
+]
+PROFILE_PAGE_READY = [
+    (By.ID, 'experience'),
+    (By.ID, 'education'),
+    (By.XPATH, "//span[contains(@class, 'pvs-navigation__text')]")
+]
+SKILLS_PAGE_READY = [
+    (By.CSS_SELECTOR, 'span.mr1.t-bold > span.visually-hidden')
+]
+
+
+######### Define Helper Functions #########
+
+def wait_for_page_ready(driver, ready_conditions, page_type, page_url='', timeout=PAGE_READY_TIMEOUT,
+                        poll_frequency=POLL_FREQUENCY):
+    '''
+    Helper function for waiting until all the given elements are present on the page.
+    Does not raise when the timeout is hit, the caller decides what to do with a page
+    that never became ready (the `ready` flag of the returned record is False)
+
+    Inputs:
+    - driver: selenium webdriver
+    - ready_conditions: list of (By, locator) tuples, all of them have to be present
+    - page_type: string, name of the page used in the timing record (e.g. 'profile', 'skills')
+    - page_url: string, url of the page used in the timing record
+    - timeout: int, maximum number of seconds to wait
+    - poll_frequency: float, seconds between two checks of the page
+    '''
+    start = time.time()
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(
+            EC.all_of(*[EC.presence_of_element_located(i) for i in ready_conditions])
+        )
+        ready = True
+    except TimeoutException:
+        ready = False
+
+    return {
+        'page_type': page_type,
+        'page_url': page_url,
+        'seconds_to_ready': round(time.time() - start, 3),
+        'ready': ready,
+        'fetched_at': pd.Timestamp.now()
+    }
+
+
+def page_transfer_stats(driver):
+    '''
+    Helper function for measuring what the currently loaded page transferred, from the
+    browser performance timeline. Cross origin resources without a Timing-Allow-Origin
+    header report 0 bytes, so the numbers are a lower bound (the same for every scrape mode)
+
+    Inputs:
+    - driver: selenium webdriver
+    '''
+    return driver.execute_script('''
+        const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+        return {
+            'bytes_transferred': entries.reduce((total, entry) => total + (entry.transferSize || 0), 0),
+            'num_requests': entries.length,
+            'js_heap_bytes': performance.memory ? performance.memory.usedJSHeapSize : null
+        };
+    ''')
+
+
+def wait_and_measure_page(driver, ready_conditions, page_type, page_url=''):
+    '''
+    Helper function for waiting until a page is ready and adding its transfer stats to the timing record
+
+    Inputs:
+    - driver: selenium webdriver
+    - ready_conditions: list of (By, locator) tuples, all of them have to be present
+    - page_type: string, name of the page used in the timing record (e.g. 'profile', 'skills')
+    - page_url: string, url of the page used in the timing record
+    '''
+    page_timing = wait_for_page_ready(driver, ready_conditions, page_type, page_url)
+    page_timing.update(page_transfer_stats(driver))
+
+    return page_timing
+
+
+def write_page_timings(page_timings, filename=PAGE_TIMINGS_FILENAME, run_name='', scrape_mode=''):
+    '''
+    Helper function for appending timing records to a csv file
+
+    Inputs:
+    - page_timings: list of dicts returned by `wait_for_page_ready` or `wait_and_measure_page`
+    - filename: string, csv file the timings are appended to
+    - run_name: string, added as a column to tell runs apart
+    - scrape_mode: string, added as a column to compare scrape modes
+    '''
+    if len(page_timings) == 0:
+        return
+
+    page_timings_df = pd.DataFrame(page_timings)
+    page_timings_df['run_name'] = run_name
+    page_timings_df['scrape_mode'] = scrape_mode
+
+    page_timings_df.to_csv(
+        filename,
+        mode = 'a',
+        header = not os.path.exists(filename),
+        index = False
+    )
+
+    print(page_timings_df.groupby('page_type')['seconds_to_ready'].describe())
+
+
+def compare_scrape_modes(filename=PAGE_TIMINGS_FILENAME):
+    '''
+    Helper function for comparing page-ready times and transferred bytes of the scrape modes
+    found in a timings csv
+
+    Inputs:
+    - filename: string, csv file written by `write_page_timings`
+    '''
+    page_timings_df = pd.read_csv(filename)
+
+    mode_comparison_df = page_timings_df.groupby(['page_type', 'scrape_mode']).agg(
+        num_pages = ('seconds_to_ready', 'size'),
+        median_seconds_to_ready = ('seconds_to_ready', 'median'),
+        mean_seconds_to_ready = ('seconds_to_ready', 'mean'),
+        mean_kb_transferred = ('bytes_transferred', lambda x: x.mean()/1024),
+        mean_num_requests = ('num_requests', 'mean'),
+        mean_js_heap_mb = ('js_heap_bytes', lambda x: x.mean()/1024**2)
+    ).reset_index()
+
+    print(mode_comparison_df)
+    return mode_comparison_df
+
+
+if __name__ == '__main__':
+    import sys
+    compare_scrape_modes(sys.argv[1] if len(sys.argv) > 1 else PAGE_TIMINGS_FILENAME)
@@ -0,0 +1,80 @@
+'''
+Configuration shared by the scraping and cleaning scripts
+
+Note:
+- `SEARCH_TERMS` maps every LinkedIn search term to the csv its profile links are written to.
+  Adding a profile category only needs a new entry here
+- `PROFILE_CATEGORIES` holds the paths of every profile category for the cleaning scripts:
+    - link_csvs: profile link csvs of the category with the number of rows to keep (None keeps all)
+    - profile_links_csv: cleaned profile links with the `profile_id_dummy` of every profile
+    - scraped_profiles_path: output folder of the profile scraper
+    - cleaned_files_path: folder the cleaned files are written to
+- `SCRAPE_CATEGORY` is the profile category both profile scrapers (selenium and asyncio) work on,
+  with the paths of its queue, page archive and error log
+'''
+
+############# Search Terms #############
+SEARCH_TERMS = {
+    'Principal Data Scientist': 'data/DataScienceProfiles.csv',
+    'Management Consultant': 'data/ConsultantProfiles-V1.csv',
+    'Partner McKinsey': 'data/ConsultantProfiles-V2.csv',
+    'Principal BCG': 'data/ConsultantProfiles-V3.csv',
+    'Chief Technology Officer': 'data/CTOProfiles.csv',
+    'Chief Executive Officer': 'data/CEOProfiles.csv'
+}
+
+NUM_PAGES_TO_FETCH_FOR_PROFILES = 20
+
+
+############# Profile Categories #############
+PROFILE_CATEGORIES = {
+    'consultant': {
+        'category_label': 'Consultant',
+        'link_csvs': [
+            ('data/ConsultantProfiles-V1.csv', 60),
+            ('data/ConsultantProfiles-V2.csv', 70),
+            ('data/ConsultantProfiles-V3.csv', 70)
+        ],
+        'profile_links_csv': 'data/cleaned_consultant_files/consultant_profile_links.csv',
+        'scraped_profiles_path': 'data/individual_consultant_profiles/',
+        'cleaned_files_path': 'data/cleaned_consultant_files/'
+    },
+    'cto': {
+        'category_label': 'CTO',
+        'link_csvs': [('data/CTOProfiles.csv', None)],
+        'profile_links_csv': 'data/cleaned_cto_files/cto_profile_links.csv',
+        'scraped_profiles_path': 'data/individual_cto_profiles/',
+        'cleaned_files_path': 'data/cleaned_cto_files/'
+    },
+    'data_science': {
+        'category_label': 'DataScience',
+        'link_csvs': [('data/DataScienceProfiles.csv', None)],
+        'profile_links_csv': 'data/cleaned_data_science_files/data_science_profile_links.csv',
+        'scraped_profiles_path': 'data/individual_data_science_profiles/',
+        'cleaned_files_path': 'data/cleaned_data_science_files/'
+    },
+    'ceo': {
+        'category_label': 'CEO',
+        'link_csvs': [('data/CEOProfiles.csv', None)],
+        'profile_links_csv': 'data/cleaned_ceo_files/ceo_profile_links.csv',
+        'scraped_profiles_path': 'data/individual_ceo_profiles/',
+        'cleaned_files_path': 'data/cleaned_ceo_files/'
+    }
+}
+
+
+############# Profile Scraping #############
+SCRAPE_CATEGORY = 'consultant'
+
+### only the first profiles of the cleaned profile links are queued
+SCRAPE_PROFILE_LIMIT = 160
+
+SCRAPE_PROFILES_CSV = PROFILE_CATEGORIES[SCRAPE_CATEGORY]['profile_links_csv']
+
+SCRAPED_PROFILES_PATH = PROFILE_CATEGORIES[SCRAPE_CATEGORY]['scraped_profiles_path']
+
+PAGE_ARCHIVE_FOLDER = 'data/page_archive/' + SCRAPE_CATEGORY + '/'
+
+SCRAPE_QUEUE_FILENAME = 'data/scrape_queue_' + SCRAPE_CATEGORY + '.sqlite'
+
+SCRAPE_LOG_FILENAME = 'assets/all_logs_individual_profiles_' + SCRAPE_CATEGORY + '.log'
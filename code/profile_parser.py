@@ -0,0 +1,333 @@
+'''
+Code for parsing saved LinkedIn profile pages offline
+
+Note:
+- Works purely on raw html strings, no selenium session is needed
+- A profile is made of two pages: the main profile page and the "Show all N skills" page
+- Uses the `lxml` parser when it is installed (much faster), falls back to `html.parser`
+- `parse_profiles_batch` parses many archived pages across a process pool, which lets us
+  re-parse everything already fetched whenever the LinkedIn markup changes
+'''
+
+######### Imports #########
+
+### generic imports
+import re
+import os
+import traceback
+import multiprocessing as mp
+from typing import NamedTuple, List
+import pandas as pd
+
+### beautiful soup
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+
+######### Initializations #########
+ALL_SKILLS_LINK_PATTERN = re.compile(r'(Show all \d+ skills)')
+
+SKILLS_PAGE_STRAINER = SoupStrainer('span')
+
+
+######### Parsed Record Types #########
+
+class ExperienceRecord(NamedTuple):
+    '''
+    One company block from the experience section
+    '''
+    company: str
+    positions: List[str]
+    durations: List[str]
+
+
+class EducationRecord(NamedTuple):
+    '''
+    One institute block from the education section
+    '''
+    education_institute: str
+    degree_list: List[str]
+
+
+class ParsedProfile(NamedTuple):
+    '''
+    Everything extracted from the pages of a single profile.
+    `error` is empty when parsing succeeded
+    '''
+    profile_id_dummy: int
+    experience: List[ExperienceRecord]
+    education: List[EducationRecord]
+    all_skills_link: str
+    skills_list: List[str]
+    error: str = ''
+
+
+######### Define Helper Functions #########
+
+def make_soup(html, parse_only=None):
+    '''
+    Helper function for building a BeautifulSoup object with the fastest available parser
+
+    Inputs:
+    - html: string, raw page source
+    - parse_only: SoupStrainer, optional, restricts the tags that get built into the tree
+    '''
+    return BeautifulSoup(html, HTML_PARSER, parse_only=parse_only)
+
+
+def parse_experience(soup_html):
+    '''
+    Helper function for extracting the experience section of the main profile page
+
+    Inputs:
+    - soup_html: BeautifulSoup object of the main profile page
+    '''
+    work_ex_section = soup_html.find(name='div', attrs={'id':'experience'}).parent
+    exp_list = work_ex_section.find_all(name='li', attrs={'class':'artdeco-list__item'})
+
+    experience_records = []
+
+    for single_exp in exp_list:
+        company_titles = [i.find('span').text.strip() for i in single_exp.find_all(name='span', attrs={'class':'mr1'})]
+        company_name = company_titles[0]
+
+        titles = company_titles[1:]
+        if len(titles) == 0:
+            company_name = [i.find('span').text.strip() for i in single_exp.find_all(
+                name='span', attrs={'class':['t-14 t-normal']})][0]
+            titles = company_titles
+
+        durations = [i.select('span')[0].text.strip() for i in single_exp.select('span.t-14.t-normal.t-black--light')]
+
+        experience_records.append(ExperienceRecord(company_name, titles, durations))
+
+    return experience_records
+
+
+def parse_education(soup_html):
+    '''
+    Helper function for extracting the education section of the main profile page
+
+    Inputs:
+    - soup_html: BeautifulSoup object of the main profile page
+    '''
+    education_section = soup_html.find(name='div', attrs={'id':'education'}).parent
+    education_list = education_section.find_all(
+        name='li', attrs={'class':'artdeco-list__item'}
+    )
+
+    education_records = []
+
+    for single_edu in education_list:
+        single_institute = [
+            i.find('span').text.strip() for i in single_edu.find_all(
+                name='span', attrs={'class':'mr1'}
+            )
+        ][0]
+
+        education_degrees = [
+            i.find('span').text.strip() for i in single_edu.select('span.t-14.t-normal')
+        ]
+
+        education_records.append(EducationRecord(single_institute, education_degrees))
+
+    return education_records
+
+
+def find_all_skills_link(soup_html):
+    '''
+    Helper function for getting the "Show all N skills" link from the main profile page
+
+    Inputs:
+    - soup_html: BeautifulSoup object of the main profile page
+    '''
+    all_skills_link = [
+        i for i in
+        soup_html.find_all("span", attrs={'class':'pvs-navigation__text'})
+        if ALL_SKILLS_LINK_PATTERN.search(i.text) is not None
+    ]
+    return all_skills_link[0].parent.parent.find('a')['href']
+
+
+def parse_skills_page(skills_html):
+    '''
+    Helper function for extracting the list of skills from the "Show all N skills" page
+
+    Inputs:
+    - skills_html: string, raw page source of the skills page
+    '''
+    soup_html_skills_page = make_soup(skills_html, parse_only=SKILLS_PAGE_STRAINER)
+    return [
+        i.text.strip() for i in soup_html_skills_page.select('span.mr1.t-bold > span.visually-hidden')
+    ]
+
+
+def parse_profile_html(profile_id, profile_html, skills_html, all_skills_link=''):
+    '''
+    Helper function for parsing both pages of a single profile
+
+    Inputs:
+    - profile_id: int, profile_id_dummy of the profile
+    - profile_html: string, raw page source of the main profile page
+    - skills_html: string, raw page source of the skills page
+    - all_skills_link: string, optional, link the skills page was fetched from.
+      Read from the main profile page when not passed
+    '''
+    soup_html = make_soup(profile_html)
+
+    if all_skills_link == '':
+        all_skills_link = find_all_skills_link(soup_html)
+
+    return ParsedProfile(
+        profile_id_dummy = profile_id,
+        experience = parse_experience(soup_html),
+        education = parse_education(soup_html),
+        all_skills_link = all_skills_link,
+        skills_list = parse_skills_page(skills_html)
+    )
+
+
+def parsed_profile_to_dfs(parsed_profile):
+    '''
+    Helper function for converting a parsed profile into the experience, education
+    and skills dataframes written by the scraper
+
+    Inputs:
+    - parsed_profile: ParsedProfile
+    '''
+    profile_id = parsed_profile.profile_id_dummy
+
+    single_user_all_experience_df = pd.DataFrame({
+        'profile_id_dummy': profile_id,
+        'company' : [i.company for i in parsed_profile.experience],
+        'positions' : [i.positions for i in parsed_profile.experience],
+        'durations' : [i.durations for i in parsed_profile.experience]
+    })
+
+    single_user_all_education_df = pd.DataFrame({
+        'profile_id_dummy': profile_id,
+        'education_institute' : [i.education_institute for i in parsed_profile.education],
+        'degree_list' : [i.degree_list for i in parsed_profile.education]
+    })
+
+    single_user_all_skills_df = pd.DataFrame({
+        'profile_id_dummy': profile_id,
+        'all_skills_link' : parsed_profile.all_skills_link,
+        'skills_list' : [parsed_profile.skills_list]
+    })
+
+    return single_user_all_experience_df, single_user_all_education_df, single_user_all_skills_df
+
+
+def _parse_profile_safe(page_tuple):
+    '''
+    Helper function used by the process pool, never raises so one broken page
+    does not stop the whole batch
+
+    Inputs:
+    - page_tuple: tuple, (profile_id, profile_html, skills_html, all_skills_link)
+    '''
+    profile_id = page_tuple[0]
+    try:
+        return parse_profile_html(*page_tuple)
+    except Exception as err_str:
+        return ParsedProfile(
+            profile_id_dummy = profile_id,
+            experience = [],
+            education = [],
+            all_skills_link = '',
+            skills_list = [],
+            error = str(err_str) + "\n" + str(traceback.format_exc())
+        )
+
+
+def parse_profiles_batch(page_tuples, processes=None, chunksize=8):
+    '''
+    Helper function for parsing a large number of saved profiles in parallel.
+    Yields ParsedProfile objects as soon as they are ready (not in input order)
+
+    Inputs:
+    - page_tuples: iterable of tuples, (profile_id, profile_html, skills_html, all_skills_link)
+    - processes: int, number of parser processes, defaults to the number of cpus
+    - chunksize: int, number of profiles sent to a process at a time
+    '''
+    if processes is None:
+        processes = mp.cpu_count()
+
+    if processes <= 1:
+        for page_tuple in page_tuples:
+            yield _parse_profile_safe(page_tuple)
+        return
+
+    with mp.Pool(processes = processes) as pool:
+        for parsed_profile in pool.imap_unordered(_parse_profile_safe, page_tuples, chunksize=chunksize):
+            yield parsed_profile
+
+
+def iter_saved_pages(folder_path):
+    '''
+    Helper function for streaming saved pages from a folder containing
+    `{id}_profile.html` and `{id}_skills.html` files
+
+    Inputs:
+    - folder_path: string, folder with the saved html files
+    '''
+    profile_files = sorted(i for i in os.listdir(folder_path) if i.endswith('_profile.html'))
+
+    for file in profile_files:
+        profile_id = int(file.split('_')[0])
+        skills_file = os.path.join(folder_path, str(profile_id) + '_skills.html')
+
+        with open(os.path.join(folder_path, file), encoding='utf-8') as f:
+            profile_html = f.read()
+
+        skills_html = ''
+        if os.path.exists(skills_file):
+            with open(skills_file, encoding='utf-8') as f:
+                skills_html = f.read()
+
+        yield profile_id, profile_html, skills_html, ''
+
+
+######### Main block for re-parsing a page archive or a folder of saved pages #########
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from page_archive import ARCHIVE_INDEX_FILENAME, PageArchive, new_run_name
+    from profile_shards import ProfileShardWriter
+
+    ### input can either be a page archive or a folder of saved html files
+    saved_pages_folder = sys.argv[1]
+    output_folder = sys.argv[2]
+
+    if os.path.exists(os.path.join(saved_pages_folder, ARCHIVE_INDEX_FILENAME)):
+        page_tuples = PageArchive(saved_pages_folder).iter_profile_page_tuples()
+    else:
+        page_tuples = iter_saved_pages(saved_pages_folder)
+
+    shard_writer = ProfileShardWriter(output_folder, 'reparse', new_run_name())
+
+    start = time.time()
+    num_parsed, num_failed = 0, 0
+
+    for parsed_profile in parse_profiles_batch(page_tuples):
+        if parsed_profile.error != '':
+            num_failed += 1
+            print(parsed_profile.profile_id_dummy, parsed_profile.error)
+            continue
+
+        shard_writer.add(parsed_profile)
+        num_parsed += 1
+
+    shard_writer.close()
+
+    print(num_parsed, num_failed)
+    end = time.time()
+    print(end-start)
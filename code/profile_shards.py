@@ -0,0 +1,410 @@
+'''
+Code for writing and reading the scraped profile records as batched parquet shards
+
+Note:
+- Replaces the three tiny csv files per profile (`{id}_experience.csv`, `{id}_education.csv`, `{id}_skills.csv`)
+- Every worker buffers `SHARD_BATCH_SIZE` parsed profiles and writes them as one parquet file per record type:
+  `{sub_folder_path}shards/{record_type}/{run_name}_{worker_name}_{batch_num}.parquet`
+- Shards are append-only, a file is written to a temporary name and renamed when complete, so a crashed
+  worker never leaves a half written shard behind. Profiles should only be marked done once their shard is written
+- `positions`, `durations`, `degree_list` and `skills_list` are stored as list<string> columns
+- `load_profile_records` reads the records of a record type into one dataframe, the list columns come back as python lists.
+  A profile scraped more than once is read from its latest shard only
+- `ProfileBatchReader` reads the same records a fixed number of profiles at a time, for corpora that do not fit in memory
+- The per profile csv files of older runs (stringified python lists) are converted once with `migrate_legacy_csvs`
+  (`python code/profile_shards.py data/individual_consultant_profiles/`), later stages never parse python literals.
+  This is a one-off command, the scrapers and the cleaning refuse to run on a folder that still has such csv files
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import ast
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+
+### parsed profile records
+from profile_parser import parsed_profile_to_dfs
+
+
+######### Initializations #########
+SHARDS_SUB_FOLDER = 'shards/'
+
+LEGACY_CSV_SUB_FOLDER = 'migrated_csv/'
+
+SHARD_BATCH_SIZE = 50
+
+RECORD_TYPES = ['experience', 'education', 'skills']
+
+RECORD_SCHEMAS = {
+    'experience': pa.schema([
+        ('profile_id_dummy', pa.int64()),
+        ('company', pa.string()),
+        ('positions', pa.list_(pa.string())),
+        ('durations', pa.list_(pa.string()))
+    ]),
+    'education': pa.schema([
+        ('profile_id_dummy', pa.int64()),
+        ('education_institute', pa.string()),
+        ('degree_list', pa.list_(pa.string()))
+    ]),
+    'skills': pa.schema([
+        ('profile_id_dummy', pa.int64()),
+        ('all_skills_link', pa.string()),
+        ('skills_list', pa.list_(pa.string()))
+    ])
+}
+
+
+######### Define Helper Functions #########
+
+def shards_folder(sub_folder_path, record_type):
+    '''
+    Helper function for the folder holding the shards of a record type
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    - record_type: string, one of `RECORD_TYPES`
+    '''
+    return os.path.join(sub_folder_path, SHARDS_SUB_FOLDER, record_type)
+
+
+class ProfileShardWriter:
+    '''
+    Buffers parsed profiles of one worker and writes them as parquet shards
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    - worker_name: string, name of the worker, part of the shard filenames
+    - run_name: string, name of the run, part of the shard filenames
+    - batch_size: int, number of profiles per shard
+    '''
+
+    def __init__(self, sub_folder_path, worker_name, run_name, batch_size=SHARD_BATCH_SIZE):
+        self.sub_folder_path = sub_folder_path
+        self.worker_name = worker_name
+        self.run_name = run_name
+        self.batch_size = batch_size
+
+        self.batch_num = 0
+        self.buffered_profiles = []
+
+        for record_type in RECORD_TYPES:
+            os.makedirs(shards_folder(sub_folder_path, record_type), exist_ok=True)
+
+
+    def add(self, parsed_profile):
+        '''
+        Buffer a parsed profile, writes the shards once the batch is full.
+        Returns the profile ids written to disk by this call (empty list if nothing was written)
+
+        Inputs:
+        - parsed_profile: ParsedProfile
+        '''
+        self.buffered_profiles.append(parsed_profile)
+
+        if len(self.buffered_profiles) >= self.batch_size:
+            return self.flush()
+        return []
+
+
+    def flush(self):
+        '''
+        Write the buffered profiles as one shard per record type, returns the profile ids written
+        '''
+        if len(self.buffered_profiles) == 0:
+            return []
+
+        record_dfs = [parsed_profile_to_dfs(i) for i in self.buffered_profiles]
+        shard_filename = '{}_{}_{:05d}.parquet'.format(self.run_name, self.worker_name, self.batch_num)
+
+        for idx, record_type in enumerate(RECORD_TYPES):
+            record_df = pd.concat([i[idx] for i in record_dfs]).reset_index(drop=True)
+            record_table = pa.Table.from_pandas(record_df, schema=RECORD_SCHEMAS[record_type], preserve_index=False)
+
+            ### files starting with '.' are skipped when reading, the shard only shows up once complete
+            record_folder = shards_folder(self.sub_folder_path, record_type)
+            temp_path = os.path.join(record_folder, '.' + shard_filename + '.tmp')
+            pq.write_table(record_table, temp_path)
+            os.replace(temp_path, os.path.join(record_folder, shard_filename))
+
+        written_ids = [i.profile_id_dummy for i in self.buffered_profiles]
+        self.buffered_profiles = []
+        self.batch_num += 1
+
+        return written_ids
+
+
+    def close(self):
+        '''
+        Write the profiles left in the buffer, returns their profile ids
+        '''
+        return self.flush()
+
+
+def legacy_csv_ids(sub_folder_path):
+    '''
+    Helper function for the profile ids that still have per profile csv files (all three record types) in a scraper folder
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    '''
+    if not os.path.exists(sub_folder_path):
+        return []
+
+    all_files = set(os.listdir(sub_folder_path))
+    return sorted(
+        int(i.split('_')[0]) for i in all_files
+        if i.endswith('_experience.csv') and
+        i.replace('_experience', '_education') in all_files and
+        i.replace('_experience', '_skills') in all_files
+    )
+
+
+def check_legacy_csvs_migrated(sub_folder_path):
+    '''
+    Helper function for making sure a scraper folder has no per profile csv files left,
+    they would be ignored (and scraped again) since only the shards are read
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    '''
+    num_legacy_profiles = len(legacy_csv_ids(sub_folder_path))
+    if num_legacy_profiles > 0:
+        raise RuntimeError(
+            sub_folder_path + ' still has per profile csv files of ' + str(num_legacy_profiles) + ' profiles, ' +
+            'convert them once with: python code/profile_shards.py ' + sub_folder_path
+        )
+
+
+def migrate_legacy_csvs(sub_folder_path):
+    '''
+    Helper function for converting the per profile csv files written before the shards existed.
+    The stringified lists are parsed once, written as a shard per record type, and the csv files
+    are moved to `LEGACY_CSV_SUB_FOLDER` so they are not read again. Returns the number of migrated profiles
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    '''
+    legacy_ids = legacy_csv_ids(sub_folder_path)
+    if len(legacy_ids) == 0:
+        return 0
+
+    legacy_folder = os.path.join(sub_folder_path, LEGACY_CSV_SUB_FOLDER)
+    os.makedirs(legacy_folder, exist_ok=True)
+    shard_filename = 'legacy_csv_{:%Y%m%d_%H%M%S}.parquet'.format(pd.Timestamp.now())
+
+    for record_type in RECORD_TYPES:
+        record_schema = RECORD_SCHEMAS[record_type]
+        legacy_filenames = [os.path.join(sub_folder_path, str(i) + '_' + record_type + '.csv') for i in legacy_ids]
+
+        record_df = pd.concat([pd.read_csv(i) for i in legacy_filenames]).reset_index(drop=True)
+        for field in record_schema:
+            if pa.types.is_list(field.type):
+                record_df[field.name] = record_df[field.name].apply(ast.literal_eval)
+            elif pa.types.is_string(field.type):
+                record_df[field.name] = record_df[field.name].fillna('').astype(str)
+
+        record_folder = shards_folder(sub_folder_path, record_type)
+        os.makedirs(record_folder, exist_ok=True)
+        temp_path = os.path.join(record_folder, '.' + shard_filename + '.tmp')
+        pq.write_table(
+            pa.Table.from_pandas(record_df[record_schema.names], schema=record_schema, preserve_index=False),
+            temp_path
+        )
+        os.replace(temp_path, os.path.join(record_folder, shard_filename))
+
+    ### the csv files are only moved once every shard is written, an interrupted migration simply runs again
+    for single_profile_id in legacy_ids:
+        for record_type in RECORD_TYPES:
+            legacy_filename = str(single_profile_id) + '_' + record_type + '.csv'
+            shutil.move(os.path.join(sub_folder_path, legacy_filename), os.path.join(legacy_folder, legacy_filename))
+
+    return len(legacy_ids)
+
+
+def record_table_to_df(record_table, record_schema):
+    '''
+    Helper function for converting a table of records to a dataframe, the list columns are returned as python lists
+
+    Inputs:
+    - record_table: pyarrow table read from the shards
+    - record_schema: pyarrow schema of the record type
+    '''
+    record_df = record_table.drop([i.name for i in record_schema if pa.types.is_list(i.type)]).to_pandas()
+    for field in record_schema:
+        if pa.types.is_list(field.type):
+            record_df[field.name] = record_table[field.name].to_pylist()
+
+    return record_df[record_schema.names]
+
+
+def profile_shard_ids(sub_folder_path):
+    '''
+    Helper function for the shard filename of every profile, in the order of the shards.
+    Every profile has exactly one skills record, so only the id column of every skills shard is read.
+    A profile scraped more than once has a row per shard
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    '''
+    skills_folder = shards_folder(sub_folder_path, 'skills')
+    shard_filenames = sorted(
+        i for i in os.listdir(skills_folder) if not i.startswith('.') and i.endswith('.parquet')
+    ) if os.path.exists(skills_folder) else []
+
+    if len(shard_filenames) == 0:
+        return pd.DataFrame({
+            'profile_id_dummy': pd.Series([], dtype='int64'),
+            'shard_filename': pd.Series([], dtype=object)
+        })
+
+    return pd.concat([
+        pd.DataFrame({
+            'profile_id_dummy': pq.read_table(
+                os.path.join(skills_folder, i), columns=['profile_id_dummy']
+            )['profile_id_dummy'].to_numpy(),
+            'shard_filename': i
+        }) for i in shard_filenames
+    ]).drop_duplicates().reset_index(drop=True)
+
+
+def latest_profile_shards(sub_folder_path):
+    '''
+    Helper function for the latest shard of every profile, a profile scraped again is only read from its newest shard.
+    Shard filenames start with the run name (`legacy_csv_{time}`, `run_{time}`), so the last one in sorted order is the newest
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    '''
+    return profile_shard_ids(sub_folder_path).drop_duplicates('profile_id_dummy', keep='last').reset_index(drop=True)
+
+
+def read_profile_shards(sub_folder_path, record_type, profile_shard_df):
+    '''
+    Helper function for reading the records of the given profiles, each from the shard it is listed with.
+    Returns a pyarrow table
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    - record_type: string, one of `RECORD_TYPES`
+    - profile_shard_df: dataframe with the columns profile_id_dummy and shard_filename
+    '''
+    record_schema = RECORD_SCHEMAS[record_type]
+    record_folder = shards_folder(sub_folder_path, record_type)
+
+    if profile_shard_df.shape[0] == 0:
+        return record_schema.empty_table()
+
+    ### every shard is filtered on its own profiles, a profile scraped twice is in two shards
+    return pa.concat_tables([
+        ds.dataset(
+            os.path.join(record_folder, shard_filename), schema=record_schema, format='parquet'
+        ).to_table(filter=ds.field('profile_id_dummy').isin(shard_df['profile_id_dummy'].unique()))
+        for shard_filename, shard_df in profile_shard_df.groupby('shard_filename', sort=False)
+    ])
+
+
+def load_profile_records(sub_folder_path, record_type, shard_paths=None):
+    '''
+    Helper function for reading all the records of a record type into a single dataframe,
+    the list columns are returned as python lists.
+    Without `shard_paths` every profile is read from its latest shard only (see `latest_profile_shards`),
+    so a profile scraped again is not cleaned twice
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    - record_type: string, one of `RECORD_TYPES`
+    - shard_paths: list of strings, only read these shards of the record type, all their records are kept
+    '''
+    record_schema = RECORD_SCHEMAS[record_type]
+
+    if shard_paths is None:
+        record_table = read_profile_shards(sub_folder_path, record_type, latest_profile_shards(sub_folder_path))
+        return record_table_to_df(record_table, record_schema)
+
+    if len(shard_paths) == 0:
+        return pd.DataFrame(columns=record_schema.names)
+
+    record_table = ds.dataset(shard_paths, schema=record_schema, format='parquet').to_table()
+
+    return record_table_to_df(record_table, record_schema)
+
+
+def load_written_profile_ids(sub_folder_path):
+    '''
+    Helper function for the ids of all profiles that were written to shards.
+    Every profile has exactly one skills record, so only that column of the skills shards is read
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    '''
+    record_folder = shards_folder(sub_folder_path, 'skills')
+    if not os.path.exists(record_folder):
+        return []
+
+    return ds.dataset(
+        record_folder, schema=RECORD_SCHEMAS['skills'], format='parquet'
+    ).to_table(columns=['profile_id_dummy'])['profile_id_dummy'].to_pylist()
+
+
+class ProfileBatchReader:
+    '''
+    Reads the records of all profiles in batches of profiles instead of all at once.
+    Batches follow the order of the shards, so every batch only reads a few shards;
+    a shard with more profiles than a batch (e.g. migrated csv files) is read once per batch with a filter on the profile ids.
+    Every profile is read once, from its latest shard like `load_profile_records`
+
+    Inputs:
+    - sub_folder_path: string, output folder of the scraper
+    '''
+
+    def __init__(self, sub_folder_path):
+        self.sub_folder_path = sub_folder_path
+
+        ### a profile scraped again is only read from its latest shard, so it lands in exactly one batch
+        self.profile_shard_df = latest_profile_shards(sub_folder_path)
+
+        self.num_profiles = self.profile_shard_df.shape[0]
+        self.next_row = 0
+
+        ### arrow size of the records of the last batch, used to size the next batches
+        self.last_batch_bytes = 0
+
+
+    def read_batch(self, num_profiles):
+        '''
+        Records of the next `num_profiles` profiles, returns a dict of record type to dataframe
+        (same columns as `load_profile_records`), None once all profiles were read
+
+        Inputs:
+        - num_profiles: int, number of profiles in the batch
+        '''
+        if self.next_row >= self.num_profiles:
+            return None
+
+        batch_df = self.profile_shard_df.iloc[self.next_row:self.next_row+max(num_profiles, 1)]
+        self.next_row += batch_df.shape[0]
+
+        batch_records = {}
+        self.last_batch_bytes = 0
+        for record_type in RECORD_TYPES:
+            record_schema = RECORD_SCHEMAS[record_type]
+            record_table = read_profile_shards(self.sub_folder_path, record_type, batch_df)
+            self.last_batch_bytes += record_table.nbytes
+            batch_records[record_type] = record_table_to_df(record_table, record_schema)
+
+        return batch_records
+
+
+######### Main block for migrating the csv files of older runs #########
+
+if __name__ == '__main__':
+    import sys
+
+    for sub_folder_path in sys.argv[1:]:
+        print(sub_folder_path, migrate_legacy_csvs(sub_folder_path), ' profiles migrated')
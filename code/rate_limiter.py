@@ -0,0 +1,218 @@
+'''
+Code for a global rate limiter shared by all scraper workers
+
+Note:
+- Token bucket per endpoint (search page, profile page, skills page), the buckets live in a sqlite file
+  so every process (selenium workers, async pipeline workers, the link scraper) draws from the same budget
+- Adaptive: when the share of failed requests of an endpoint goes above `ERROR_RATE_SLOWDOWN_THRESHOLD`
+  the rate of that endpoint is cut, it slowly recovers back to the budget once requests succeed again
+- Change `ENDPOINT_BUDGETS` to tune the speed of the whole scraping setup in one place
+'''
+
+######### Imports #########
+
+### generic imports
+import time
+import sqlite3
+
+
+######### Initializations #########
+RATE_LIMITER_FILENAME = 'data/rate_limiter.sqlite'
+
+### requests per minute and burst size (max number of requests that can go out back to back)
+ENDPOINT_BUDGETS = {
+    'search_page': {'requests_per_minute': 10, 'burst': 2},
+    'profile_page': {'requests_per_minute': 20, 'burst': 4},
+    'skills_page': {'requests_per_minute': 20, 'burst': 4}
+}
+
+### linkedin sends throttled sessions to these pages instead of the requested one
+THROTTLED_URL_MARKERS = ['/checkpoint/', '/authwall', '/uas/login']
+
+ERROR_WINDOW_SECONDS = 300
+ERROR_WINDOW_MIN_REQUESTS = 10
+ERROR_RATE_SLOWDOWN_THRESHOLD = 0.2
+
+SLOWDOWN_FACTOR = 0.5
+RECOVERY_FACTOR = 1.25
+MIN_RATE_FRACTION = 0.05
+ADJUST_INTERVAL_SECONDS = 60
+
+RATE_LIMITER_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS buckets (
+    endpoint TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    last_refill REAL NOT NULL,
+    rate_per_second REAL NOT NULL,
+    last_adjusted REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    endpoint TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    ok INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outcomes_endpoint_idx ON outcomes (endpoint, recorded_at);
+'''
+
+
+######### Define Helper Functions #########
+
+def page_request_ok(page_ready, current_url):
+    '''
+    Helper function for deciding if a page request counts as successful for the rate limiter
+
+    Inputs:
+    - page_ready: bool, whether the page became ready before the timeout
+    - current_url: string, url the browser ended up on
+    '''
+    return page_ready and not any(i in current_url for i in THROTTLED_URL_MARKERS)
+
+
+class RateLimiter:
+    '''
+    Cross process token bucket rate limiter with adaptive slowdown
+
+    Inputs:
+    - db_filename: string, sqlite file shared by all the processes
+    - endpoint_budgets: dict, requests per minute and burst size of every endpoint
+    '''
+
+    def __init__(self, db_filename=RATE_LIMITER_FILENAME, endpoint_budgets=ENDPOINT_BUDGETS):
+        self.endpoint_budgets = endpoint_budgets
+
+        self.connection = sqlite3.connect(db_filename, timeout=60, isolation_level=None)
+        self.connection.executescript(RATE_LIMITER_SCHEMA)
+
+        now = time.time()
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?, ?)',
+            [
+                (endpoint, budget['burst'], now, budget['requests_per_minute']/60, now)
+                for endpoint, budget in endpoint_budgets.items()
+            ]
+        )
+        ### a lowered budget applies right away, a raised one is reached through the normal recovery
+        for endpoint, budget in endpoint_budgets.items():
+            self.connection.execute(
+                'UPDATE buckets SET rate_per_second = MIN(rate_per_second, ?) WHERE endpoint = ?',
+                (budget['requests_per_minute']/60, endpoint)
+            )
+
+
+    def try_acquire(self, endpoint):
+        '''
+        Take one token of an endpoint if available. Returns 0 when the request can go out,
+        otherwise the number of seconds to wait before trying again
+
+        Inputs:
+        - endpoint: string, key of `endpoint_budgets`
+        '''
+        burst = self.endpoint_budgets[endpoint]['burst']
+
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            tokens, last_refill, rate_per_second = self.connection.execute(
+                'SELECT tokens, last_refill, rate_per_second FROM buckets WHERE endpoint = ?', (endpoint,)
+            ).fetchone()
+
+            now = time.time()
+            tokens = min(burst, tokens + (now - last_refill)*rate_per_second)
+
+            if tokens >= 1:
+                tokens -= 1
+                seconds_to_wait = 0
+            else:
+                seconds_to_wait = (1 - tokens)/rate_per_second
+
+            self.connection.execute(
+                'UPDATE buckets SET tokens = ?, last_refill = ? WHERE endpoint = ?',
+                (tokens, now, endpoint)
+            )
+            self.connection.execute('COMMIT')
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+
+        return seconds_to_wait
+
+
+    def acquire(self, endpoint):
+        '''
+        Block until a request to the endpoint is allowed, returns the number of seconds waited
+
+        Inputs:
+        - endpoint: string, key of `endpoint_budgets`
+        '''
+        total_wait = 0
+        seconds_to_wait = self.try_acquire(endpoint)
+
+        while seconds_to_wait > 0:
+            time.sleep(seconds_to_wait)
+            total_wait += seconds_to_wait
+            seconds_to_wait = self.try_acquire(endpoint)
+
+        return total_wait
+
+
+    def record_result(self, endpoint, ok):
+        '''
+        Record whether a request succeeded and adapt the rate of the endpoint to the recent error rate
+
+        Inputs:
+        - endpoint: string, key of `endpoint_budgets`
+        - ok: bool, False for failed requests (errors, timeouts, login/captcha walls)
+        '''
+        base_rate = self.endpoint_budgets[endpoint]['requests_per_minute']/60
+        now = time.time()
+
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection.execute('INSERT INTO outcomes VALUES (?, ?, ?)', (endpoint, now, int(ok)))
+            self.connection.execute(
+                'DELETE FROM outcomes WHERE endpoint = ? AND recorded_at < ?',
+                (endpoint, now - ERROR_WINDOW_SECONDS)
+            )
+
+            num_requests, num_errors = self.connection.execute(
+                'SELECT COUNT(*), COUNT(*) - SUM(ok) FROM outcomes WHERE endpoint = ?', (endpoint,)
+            ).fetchone()
+            rate_per_second, last_adjusted = self.connection.execute(
+                'SELECT rate_per_second, last_adjusted FROM buckets WHERE endpoint = ?', (endpoint,)
+            ).fetchone()
+
+            ### adjust at most once per interval, so a burst of errors does not collapse the rate at once
+            if now - last_adjusted >= ADJUST_INTERVAL_SECONDS:
+                new_rate = rate_per_second
+
+                if num_requests >= ERROR_WINDOW_MIN_REQUESTS and num_errors/num_requests > ERROR_RATE_SLOWDOWN_THRESHOLD:
+                    new_rate = max(rate_per_second*SLOWDOWN_FACTOR, base_rate*MIN_RATE_FRACTION)
+                elif rate_per_second < base_rate:
+                    new_rate = min(rate_per_second*RECOVERY_FACTOR, base_rate)
+
+                if new_rate != rate_per_second:
+                    self.connection.execute(
+                        'UPDATE buckets SET rate_per_second = ?, last_adjusted = ? WHERE endpoint = ?',
+                        (new_rate, now, endpoint)
+                    )
+
+            self.connection.execute('COMMIT')
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+
+
+    def current_rates(self):
+        '''
+        Current requests per minute of every endpoint, as a dict
+        '''
+        return {
+            endpoint: round(rate_per_second*60, 2) for endpoint, rate_per_second in
+            self.connection.execute('SELECT endpoint, rate_per_second FROM buckets').fetchall()
+        }
+
+
+    def close(self):
+        '''
+        Close the sqlite connection
+        '''
+        self.connection.close()
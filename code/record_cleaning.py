@@ -0,0 +1,198 @@
+'''
+Code for vectorized cleaning of the scraped experience and education records
+
+Note:
+- Works on whole columns with pandas string and datetime operations instead of row by row `apply`
+- Experience: positions and durations of a company are matched up on the exploded long tables
+  (position number within the company) instead of truncating/padding the lists row by row
+- Education: `parse_degrees` splits the degree lists into degree name, start and end year with `str.extract`,
+  rows that can not be parsed are flagged in `parse_status` (years left missing, no 1900 placeholder)
+- Durations: `Mon YYYY` and `YYYY` take the fixed format `pd.to_datetime` path, anything else goes through a
+  cached `dateutil` fallback. "Present" is replaced with the `present_date` of the run, so re-running the
+  cleaning on the same data always gives the same dates
+'''
+
+######### Imports #########
+
+### generic imports
+import re
+import functools
+from datetime import datetime
+import dateutil.parser
+import pandas as pd
+
+
+######### Initializations #########
+### durations start with a month, a year or "Present", anything else in the list is e.g. a location
+DURATION_START_PATTERN = re.compile(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec|Present|20\d{2}|19\d{2})')
+
+DURATION_SEPARATOR_PATTERN = r'\s*[-–]\s*'
+
+### a single degree entry starting like this is the time period (degree name missing)
+DEGREE_TIME_PERIOD_PATTERN = re.compile(r'[0-9\-]')
+
+YEAR_NUMBER_PATTERN = re.compile(r'(\d+)')
+
+MONTH_YEAR_FORMAT = '%b %Y'
+
+YEAR_PATTERN = r'\d{4}'
+
+### missing day/month of a fallback date are taken from here instead of today's date
+FALLBACK_DEFAULT_DATE = datetime(2000, 1, 1)
+
+
+######### Define Helper Functions #########
+
+def explode_experience(experience_df):
+    '''
+    Helper function for turning the experience records (one row per company with lists of positions and
+    durations) into a long table with one row per position and its cleaned duration.
+    Positions without a duration get an empty string, durations without a position are dropped,
+    companies without any position keep a single row with missing position and duration
+
+    Inputs:
+    - experience_df: dataframe with the columns of the experience shards
+    '''
+    experience_df = experience_df.reset_index(drop=True)
+
+    ### one row per position, numbered within its company
+    positions_df = experience_df.drop(columns=['durations']).explode('positions')
+    positions_df['position_num'] = positions_df.groupby(level=0).cumcount()
+
+    ### one row per cleaned duration, numbered within its company
+    durations = experience_df['durations'].explode().dropna().astype(str)
+    durations = durations[durations.str.match(DURATION_START_PATTERN)]
+    durations_df = durations.str.split('·').str[0].str.strip().to_frame('durations_cleaned')
+    durations_df['position_num'] = durations_df.groupby(level=0).cumcount()
+
+    long_experience_df = pd.merge(
+        positions_df.reset_index(),
+        durations_df.reset_index(),
+        on = ['index', 'position_num'],
+        how = 'left'
+    )
+    long_experience_df['durations_cleaned'] = long_experience_df['durations_cleaned'].fillna('').where(
+        long_experience_df['positions'].notna()
+    )
+
+    return long_experience_df.drop(columns=['index', 'position_num'])
+
+
+def parse_degrees(degree_lists):
+    '''
+    Helper function for splitting the degree lists of the education records (`[degree name, time period]`,
+    either can be missing) into degree name, start year and end year.
+    `parse_status` is 'ok', 'no_dates' (no time period), 'unparsed_dates' (time period without years)
+    or 'empty' (empty degree list)
+
+    Inputs:
+    - degree_lists: pandas series of lists of strings
+    '''
+    num_entries = degree_lists.str.len().fillna(0)
+    first_entry = degree_lists.str[0].fillna('').astype(str)
+    second_entry = degree_lists.str[1].fillna('').astype(str)
+
+    only_time_period = (num_entries == 1) & first_entry.str.match(DEGREE_TIME_PERIOD_PATTERN)
+
+    degree_name = first_entry.str.strip().mask(only_time_period, '')
+    time_period = second_entry.where(num_entries >= 2, first_entry.where(only_time_period, '')).str.strip()
+
+    ### a time period with a single year starts and ends in it.
+    ### columns that are missing in a batch come back as float, so both are kept as object
+    time_period_split = time_period.str.split(
+        DURATION_SEPARATOR_PATTERN, n=1, expand=True, regex=True
+    ).reindex(columns=[0, 1]).astype(object)
+    start_year = time_period_split[0].str.extract(YEAR_NUMBER_PATTERN, expand=False)
+    end_year = time_period_split[1].str.extract(YEAR_NUMBER_PATTERN, expand=False).where(
+        time_period_split[1].notna(), start_year
+    )
+
+    parse_status = pd.Series('ok', index=degree_lists.index)
+    parse_status[start_year.isna() | end_year.isna()] = 'unparsed_dates'
+    parse_status[time_period == ''] = 'no_dates'
+    parse_status[num_entries == 0] = 'empty'
+
+    years_parsed = parse_status == 'ok'
+
+    return pd.DataFrame({
+        'degree_name': degree_name,
+        'start_year_degree': pd.to_numeric(start_year.where(years_parsed)).astype('Int64'),
+        'end_year_degree': pd.to_numeric(end_year.where(years_parsed)).astype('Int64'),
+        'parse_status': parse_status
+    }, index=degree_lists.index)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_date_fallback(date_string):
+    '''
+    Helper function for the date formats the fixed format path does not cover (e.g. "September 2020")
+
+    Inputs:
+    - date_string: string, single date
+    '''
+    try:
+        return pd.Timestamp(dateutil.parser.parse(date_string, default=FALLBACK_DEFAULT_DATE))
+    except (ValueError, OverflowError):
+        return pd.NaT
+
+
+def parse_duration_dates(date_strings, present_date):
+    '''
+    Helper function for parsing a column of single dates as written in linkedin durations
+
+    Inputs:
+    - date_strings: pandas series of strings, e.g. "Jan 2020", "2019" or "Present"
+    - present_date: anything `pd.Timestamp` accepts, used for "Present"
+    '''
+    date_strings = date_strings.fillna('').astype(str).str.strip()
+
+    parsed_dates = pd.to_datetime(date_strings, format=MONTH_YEAR_FORMAT, errors='coerce')
+
+    year_only = parsed_dates.isna() & date_strings.str.fullmatch(YEAR_PATTERN)
+    parsed_dates[year_only] = pd.to_datetime(date_strings[year_only], format='%Y')
+
+    is_present = date_strings.str.lower() == 'present'
+    parsed_dates[is_present] = pd.Timestamp(present_date)
+
+    needs_fallback = parsed_dates.isna() & (date_strings != '')
+    if needs_fallback.any():
+        parsed_dates[needs_fallback] = pd.to_datetime(date_strings[needs_fallback].map(_parse_date_fallback))
+
+    return parsed_dates
+
+
+def split_durations(durations, present_date):
+    '''
+    Helper function for splitting durations like "Jan 2020 - Present" into typed start and end dates.
+    A duration with a single date starts and ends on it, if either date can not be parsed both are NaT
+
+    Inputs:
+    - durations: pandas series of strings, the cleaned durations (without the "· 2 yrs 3 mos" part)
+    - present_date: anything `pd.Timestamp` accepts, used for "Present"
+    '''
+    split_df = durations.fillna('').astype(str).str.split(
+        DURATION_SEPARATOR_PATTERN, n=1, expand=True, regex=True
+    ).reindex(columns=[0, 1])
+
+    start_dates = parse_duration_dates(split_df[0], present_date)
+    end_dates = parse_duration_dates(split_df[1].fillna(split_df[0]), present_date)
+
+    unparsed = start_dates.isna() | end_dates.isna()
+    start_dates[unparsed] = pd.NaT
+    end_dates[unparsed] = pd.NaT
+
+    return pd.DataFrame({'start_date': start_dates, 'end_date': end_dates}, index=durations.index)
+
+
+if __name__ == '__main__':
+    ### quick check of the degree parsing, including a batch where no time period has a separator
+    parsed_degrees = parse_degrees(pd.Series([['BSc', '2010'], ['MSc'], ['2012 - 2014'], [], ['MBA', 'n/a']]))
+    print(parsed_degrees)
+
+    assert parsed_degrees['parse_status'].tolist() == ['ok', 'no_dates', 'ok', 'empty', 'unparsed_dates']
+    assert parsed_degrees['start_year_degree'].tolist()[:3] == [2010, pd.NA, 2012]
+    assert parsed_degrees['end_year_degree'].tolist()[:3] == [2010, pd.NA, 2014]
+
+    single_year_degrees = parse_degrees(pd.Series([['BSc', '2010'], ['MSc']]))
+    assert single_year_degrees['parse_status'].tolist() == ['ok', 'no_dates']
+    assert single_year_degrees['end_year_degree'].tolist() == [2010, pd.NA]
@@ -2,31 +2,56 @@
 Code for Scraping Individual Profiles
 
 Note:
-- Uses multiprocessing to speed things up. Will create multiple instances of selenium
+- Uses multiprocessing to speed things up. Will create `NUM_WORKERS` instances of selenium that
+  each pull one profile at a time from the shared queue
+- Set the `SCRAPE_MODE` environment variable to 'lite' for headless chrome that skips images, fonts,
+  media and tracking scripts (see browser_sessions.py), page timings record the mode for comparison
+- Requests go through the global rate limiter (rate_limiter.py), tune `ENDPOINT_BUDGETS` there instead of adding sleeps
+- Progress is tracked in a sqlite work queue, re-running the script only fetches the profiles
+  that are not done yet and retries failed ones with backoff
 - Change the multiprocessing section into a for loop to not use multiprocessing and run sequentially
 '''
 
 ######### Imports #########
 
 ### generic imports
-import logging
-import re
 import time
 import traceback
 import os
 import multiprocessing as mp
-import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
-### beautiful soup
-from bs4 import BeautifulSoup
+### raw page archive and profile page parsing
+from page_archive import PageArchive, new_run_name
+from profile_parser import ALL_SKILLS_LINK_PATTERN, parse_profile_html
+
+### batched parquet output
+from profile_shards import ProfileShardWriter
+
+### persistent work queue
+from scrape_queue import ScrapeQueue
+
+### scraped profile category and its paths, error logging and queue set up shared with the async pipeline
+from pipeline_config import PAGE_ARCHIVE_FOLDER, SCRAPE_LOG_FILENAME, SCRAPE_QUEUE_FILENAME, SCRAPED_PROFILES_PATH
+from scraper_common import ERROR_LOG_STRING_FORMAT, error_logging_helper, setup_scrape_queue
+
+### global rate limiter shared by all the workers
+from rate_limiter import RATE_LIMITER_FILENAME, RateLimiter, page_request_ok
+
+### condition based page waits
+from page_waits import (
+    PROFILE_PAGE_READY,
+    SKILLS_PAGE_READY,
+    wait_and_measure_page,
+    write_page_timings
+)
 
 ### selenium imports
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+
+### logged in browser sessions
+from browser_sessions import SCRAPE_MODE, BrowserSession, combine_session_stats, install_chromedriver
 
 
 ######### Initializations #########
@@ -36,248 +61,216 @@ load_dotenv()
 email = os.environ['USERNAME']
 password = os.environ['PASS']
 
-#profiles_df = pd.read_csv('data/ConsultantProfiles-V1.csv')
+PAGE_TIMINGS_FILENAME = 'assets/page_ready_timings_consultant.csv'
 
-profiles_df = pd.read_csv('data/cleaned_consultant_files/consultant_profile_links.csv')
+### number of browser workers, independent of the number of cpus (browsers mostly wait on the network)
+NUM_WORKERS = int(os.environ.get('NUM_SCRAPE_WORKERS', 4))
 
-# profiles_df = profiles_df.reset_index()
-# profiles_df.rename(columns={'index':'profile_id_dummy'}, inplace=True)
-# print(profiles_df.head())
-
-LOG_FILENAME = 'assets/all_logs_individual_profiles_consultant.log'
-
-SUB_FOLDER_PATH = 'data/individual_consultant_profiles/'
-
-ERROR_LOG_STRING_FORMAT = '''
-    {section_title}
-    ---
-    {description}
-    ---
-    {error_message}
-''' + '='*60 + '\n\n'
+logger = error_logging_helper(SCRAPE_LOG_FILENAME)
 
 
 ######### Define Helper Functions #########
 
-def error_logging_helper(log_filename:str = 'all_logs.log', logger_name:str = 'error_logger'):
+def get_all_skills_link(driver):
     '''
-    Helper function for logging errors
+    Helper function for reading the "Show all N skills" link from the loaded profile page
 
     Inputs:
-    - log_filename: string, filename where to log the errors
-    - logger_name: string, name of the logger initialized
+    - driver: selenium webdriver with the main profile page loaded
     '''
-    logger = logging.getLogger(logger_name)
-    handler = logging.FileHandler(
-        filename=log_filename,
-        mode='a+'
-    )
-    log_format = logging.Formatter('%(asctime)s - %(message)s')
-    handler.setLevel(logging.INFO)
-    handler.setFormatter(log_format)
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
-    print(logger.getEffectiveLevel())
-
-    return logger
-
-
-logger = error_logging_helper(LOG_FILENAME)
+    all_skills_link = [
+        i for i in
+        driver.find_elements(By.XPATH, "//span[contains(@class, 'pvs-navigation__text')]")
+        if ALL_SKILLS_LINK_PATTERN.search(i.text) is not None
+    ]
+    return all_skills_link[0].find_element(By.XPATH, './../..//a').get_attribute('href')
 
 
-def scrape_single_profile_helper(single_profile_batch_df, email_linkedin, password_linkedin):
+def scrape_single_profile_helper(worker_name, email_linkedin, password_linkedin, run_name, driver_path):
     '''
     Helper function for scraping individual profiles.
-    Mainly created for use in multiprocessing
+    Mainly created for use in multiprocessing, every worker is a long lived browser that keeps
+    pulling one profile at a time from the shared queue until nothing is left.
+    Returns the utilization stats of the worker
 
     Inputs:
-    - single_profile_batch_df: pandas dataframe, one batch of dataframes with profile links
+    - worker_name: string, name of the worker, stored in the queue next to the claimed profiles
     - email: string, linkedin email
     - password: string, linkedin password
+    - run_name: string, name of the run, raw pages are archived into `{run_name}.pack`
+    - driver_path: string, path of the chromedriver installed once for the run
     '''
+    worker_start = time.time()
+    busy_seconds, idle_seconds = 0, 0
+    num_done, num_failed = 0, 0
 
-    ######## login ########
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()))
-    driver.get("https://linkedin.com")
+    page_archive = PageArchive(PAGE_ARCHIVE_FOLDER, run_name=run_name)
+    shard_writer = ProfileShardWriter(SCRAPED_PROFILES_PATH, worker_name, run_name)
+    rate_limiter = RateLimiter(RATE_LIMITER_FILENAME)
 
-    time.sleep(5)
+    ######## logged in browser, reuses the saved session cookies ########
+    browser_session = BrowserSession(driver_path, email_linkedin, password_linkedin)
+    browser_session.start()
 
-    input_elements = driver.find_elements(
-        By.XPATH,
-        "//input[contains(@class, 'input__input' )][1]"
-    )
-    input_elements[0].send_keys(email_linkedin)
-    input_elements[1].send_keys(password_linkedin)
+    page_timings = []
 
-    submit_button = driver.find_elements(
-        By.XPATH,
-        "//button[contains(@class, 'sign-in-form__submit-button')]"
-    )
-    submit_button[0].click()
+    ######## loop through profiles claimed from the queue ########
+    scrape_queue = ScrapeQueue(SCRAPE_QUEUE_FILENAME)
+    login_seconds = time.time() - worker_start
 
-    time.sleep(10)
+    while True:
+        job = scrape_queue.claim_next(worker_name)
 
-    ######## loop through profiles ########
+        if job is None:
+            ### nothing due right now, either everything is finished or waiting for a retry backoff
+            seconds_to_wait = scrape_queue.seconds_until_next_retry()
+            if seconds_to_wait is None:
+                break
+            time.sleep(seconds_to_wait)
+            idle_seconds += seconds_to_wait
+            continue
 
-    for profile_idx in single_profile_batch_df.profile_id_dummy:
-        try:
-            single_profile_id = single_profile_batch_df['profile_id_dummy'][profile_idx]
-            single_profile_url = single_profile_batch_df['profile_url'][profile_idx]
+        single_profile_id, single_profile_url = job
+        profile_start = time.time()
+
+        ### endpoint whose request is in flight, its result is not recorded yet
+        current_endpoint = None
 
+        try:
             ######## get single user page ########
-            driver.get(single_profile_url)
+            rate_limiter.acquire('profile_page')
+            current_endpoint = 'profile_page'
+            driver = browser_session.get(single_profile_url)
 
+            ### scrolling makes linkedin load the lazy sections, then wait for them to show up
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
             driver.execute_script("window.scrollTo(0, 50);")
-            time.sleep(1)
             driver.execute_script("window.scrollTo(0, 700);")
 
-            time.sleep(5)
-            soup_html = BeautifulSoup(driver.page_source)
-
-
-            work_ex_section = soup_html.find(name='div', attrs={'id':'experience'}).parent
-            exp_list = work_ex_section.find_all(name='li', attrs={'class':'artdeco-list__item'})
-
-            companies_list_single_user = []
-            companies_titles_single_user = []
-            companies_durations_single_user = []
-
-            ######## Experience Section ########
-            for single_exp in exp_list:
-                company_titles = [i.find('span').text.strip() for i in single_exp.find_all(name='span', attrs={'class':'mr1'})]
-                company_name = company_titles[0]
-
-                titles = company_titles[1:]
-                if len(titles) == 0:
-                    company_name = [i.find('span').text.strip() for i in single_exp.find_all(
-                        name='span', attrs={'class':['t-14 t-normal']})][0]
-                    titles = company_titles
-
-                durations = [i.select('span')[0].text.strip() for i in single_exp.select('span.t-14.t-normal.t-black--light')]
-
-                companies_titles_single_user.append(titles)
-                companies_list_single_user.append(company_name)
-                companies_durations_single_user.append(durations)
-
-                print(company_name)
-                print(titles)
-                print(durations)
-
-            single_user_all_experience_df = pd.DataFrame({
-                'profile_id_dummy': single_profile_id,
-                'company' : companies_list_single_user,
-                'positions' : companies_titles_single_user,
-                'durations' : companies_durations_single_user
-            })
-
-            print(single_user_all_experience_df)
-
-
-            ######## Education Section ########
-            education_section = soup_html.find(name='div', attrs={'id':'education'}).parent
-            education_list = education_section.find_all(
-                name='li', attrs={'class':'artdeco-list__item'}
+            page_timings.append(
+                wait_and_measure_page(driver, PROFILE_PAGE_READY, 'profile', single_profile_url)
+            )
+            rate_limiter.record_result(
+                'profile_page', page_request_ok(page_timings[-1]['ready'], driver.current_url)
+            )
+            current_endpoint = None
+            profile_html = driver.page_source
+            page_archive.put_page(
+                single_profile_id, single_profile_url, 'profile', profile_html, page_url=single_profile_url
             )
 
-            education_institution_list = []
-            education_degrees_list = []
-
-            for single_edu in education_list:
-                single_institute = [
-                    i.find('span').text.strip() for i in single_edu.find_all(
-                        name='span', attrs={'class':'mr1'}
-                    )
-                ]
-                single_institute = single_institute[0]
-                print(single_institute)
-                education_institution_list.append(single_institute)
-
-                education_degrees = [
-                    i.find('span').text.strip() for i in single_edu.select('span.t-14.t-normal')
-                ]
-                print(education_degrees)
-                education_degrees_list.append(education_degrees)
-
-
-            single_user_all_education_df = pd.DataFrame({
-                'profile_id_dummy': single_profile_id,
-                'education_institute' : education_institution_list,
-                'degree_list' : education_degrees_list
-            })
-
-            print(single_user_all_education_df)
-
-            ######## all skills section ########
-            all_skills_link = [
-                i for i in
-                soup_html.find_all("span", attrs={'class':'pvs-navigation__text'})
-                if re.search(r'(Show all \d+ skills)', i.text) != None
-            ]
-            all_skills_link = all_skills_link[0].parent.parent.find('a')['href']
-            #print(all_skills_link)
+            ######## all skills page ########
+            all_skills_link = get_all_skills_link(driver)
 
-            driver.get(all_skills_link)
+            rate_limiter.acquire('skills_page')
+            current_endpoint = 'skills_page'
+            driver = browser_session.get(all_skills_link)
 
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
             driver.execute_script("window.scrollTo(0, 500);")
 
-            time.sleep(7)
-            soup_html_skills_page = BeautifulSoup(driver.page_source)
-            all_skills_list = [
-                i.text.strip() for i in soup_html_skills_page.select('span.mr1.t-bold > span.visually-hidden')
-            ]
-
-            single_user_all_skills_df = pd.DataFrame({
-                'profile_id_dummy': single_profile_id,
-                'all_skills_link' : all_skills_link,
-                'skills_list' : [all_skills_list]
-            })
-
-            #single_user_all_skills_df
-
-            single_user_all_experience_df.to_csv(
-                SUB_FOLDER_PATH+str(profile_idx)+'_experience.csv', index=False
+            page_timings.append(
+                wait_and_measure_page(driver, SKILLS_PAGE_READY, 'skills', all_skills_link)
             )
-            single_user_all_education_df.to_csv(
-                SUB_FOLDER_PATH+str(profile_idx)+'_education.csv', index=False
+            rate_limiter.record_result(
+                'skills_page', page_request_ok(page_timings[-1]['ready'], driver.current_url)
             )
-            single_user_all_skills_df.to_csv(
-                SUB_FOLDER_PATH+str(profile_idx)+'_skills.csv', index=False
+            current_endpoint = None
+            skills_html = driver.page_source
+            page_archive.put_page(
+                single_profile_id, single_profile_url, 'skills', skills_html, page_url=all_skills_link
             )
 
+            ######## parse both pages and save ########
+            parsed_profile = parse_profile_html(
+                single_profile_id, profile_html, skills_html, all_skills_link
+            )
+            ### profiles are only marked done once their shard is on disk
+            for written_profile_id in shard_writer.add(parsed_profile):
+                scrape_queue.mark_done(written_profile_id)
+            num_done += 1
+
         except Exception as err_str:
+            scrape_queue.mark_failed(single_profile_id, str(err_str))
+            num_failed += 1
+
+            ### a request that crashed or timed out counts against its endpoint budget like a throttled one
+            if current_endpoint is not None:
+                rate_limiter.record_result(current_endpoint, False)
+
+            browser_session.restart_if_crashed()
+
             logger.error(
                 ERROR_LOG_STRING_FORMAT.format(
                     section_title = 'Error in Fetching Profile',
-                    description = 'Error for  Profile Dummy ID: ' + str(profile_idx),
+                    description = 'Error for  Profile Dummy ID: ' + str(single_profile_id),
                     error_message = str(err_str) + "\n" + str(traceback.format_exc())
                 )
             )
 
-    return ['Done']
+        busy_seconds += time.time() - profile_start
+
+    for written_profile_id in shard_writer.close():
+        scrape_queue.mark_done(written_profile_id)
+
+    scrape_queue.close()
+    page_archive.close()
+    rate_limiter.close()
+    browser_session.quit()
+    write_page_timings(page_timings, PAGE_TIMINGS_FILENAME, run_name, browser_session.scrape_mode)
+
+    wall_seconds = time.time() - worker_start
+
+    return {
+        'worker_name': worker_name,
+        'profiles_done': num_done,
+        'profiles_failed': num_failed,
+        'login_seconds': round(login_seconds, 1),
+        'busy_seconds': round(busy_seconds, 1),
+        'idle_seconds': round(idle_seconds, 1),
+        'wall_seconds': round(wall_seconds, 1),
+        'utilization': round(busy_seconds/wall_seconds, 3),
+        **browser_session.stats()
+    }
 
 
 
 ######### Main block for combining everything together #########
 
 if __name__ == '__main__':
-    list_of_profile_dfs = np.array_split(profiles_df[0:160], 4)
-    print(list_of_profile_dfs[3])
-    print(mp.cpu_count())
+    ### only profiles that are not done yet are scraped, a restarted run picks up where the last one died
+    scrape_queue = setup_scrape_queue()
+
+    print('Number of Workers: ', NUM_WORKERS, ' CPUs: ', mp.cpu_count(), ' Scrape Mode: ', SCRAPE_MODE)
 
+    run_name = new_run_name()
     start = time.time()
 
-    with mp.Pool(processes = mp.cpu_count()) as pool:
+    ### install chromedriver once and log in once, the workers reuse the saved session cookies
+    driver_path = install_chromedriver()
+    first_session = BrowserSession(driver_path, email, password)
+    first_session.start()
+    first_session.quit()
+
+    ### every worker pulls profiles from the queue, so a slow profile never leaves the others idle
+    with mp.Pool(processes = NUM_WORKERS) as pool:
         result = pool.starmap(
             scrape_single_profile_helper,
             iterable = [
-                (single_batch_df, email, password) for single_batch_df in list_of_profile_dfs
+                ('worker_' + str(worker_num), email, password, run_name, driver_path) for worker_num in range(NUM_WORKERS)
             ]
         )
 
-    print(result)
+    worker_utilization_df = pd.DataFrame(result)
+    print(worker_utilization_df)
+
+    ### browser pool stats, the first session only did the initial login
+    session_stats_columns = list(first_session.stats().keys())
+    print(combine_session_stats(
+        [first_session.stats()] + worker_utilization_df[session_stats_columns].to_dict('records')
+    ))
+    print(scrape_queue.status_counts())
+    scrape_queue.close()
 
     end = time.time()
     print(end-start)
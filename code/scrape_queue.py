@@ -0,0 +1,222 @@
+'''
+Code for a persistent (sqlite backed) work queue of profiles to scrape
+
+Note:
+- Every profile_id_dummy is tracked as pending / in_flight / done / failed with its attempt count
+- A restarted run only fetches what is still missing, profiles left in_flight by a run that
+  died are put back to pending
+- Failed profiles are retried with exponential backoff until `MAX_ATTEMPTS` is reached
+- Safe to use from multiple worker processes, every claim happens inside an immediate transaction
+'''
+
+######### Imports #########
+
+### generic imports
+import time
+import sqlite3
+
+### profiles written to the parquet shards
+from profile_shards import load_written_profile_ids
+
+
+######### Initializations #########
+MAX_ATTEMPTS = 4
+
+RETRY_BACKOFF_SECONDS = 60
+
+MAX_RETRY_BACKOFF_SECONDS = 30*60
+
+QUEUE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    profile_id_dummy INTEGER PRIMARY KEY,
+    profile_url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    worker_name TEXT,
+    last_error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, next_attempt_at);
+'''
+
+
+######### Define Helper Functions #########
+
+class ScrapeQueue:
+    '''
+    Durable queue of profiles to scrape
+
+    Inputs:
+    - db_filename: string, sqlite file holding the queue
+    - max_attempts: int, number of attempts after which a failed profile is not retried anymore
+    - retry_backoff_seconds: int, wait before the first retry, doubled for every further attempt
+    '''
+
+    def __init__(self, db_filename, max_attempts=MAX_ATTEMPTS, retry_backoff_seconds=RETRY_BACKOFF_SECONDS):
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self.connection = sqlite3.connect(db_filename, timeout=60, isolation_level=None)
+        self.connection.executescript(QUEUE_SCHEMA)
+
+
+    def add_profiles(self, profiles_df):
+        '''
+        Add profiles to the queue, profiles that are already queued keep their state
+
+        Inputs:
+        - profiles_df: pandas dataframe with `profile_id_dummy` and `profile_url` columns
+        '''
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO jobs (profile_id_dummy, profile_url, updated_at) VALUES (?, ?, ?)',
+            [
+                (int(i), str(j), time.time())
+                for i, j in zip(profiles_df['profile_id_dummy'], profiles_df['profile_url'])
+            ]
+        )
+
+
+    def mark_existing_done(self, sub_folder_path):
+        '''
+        Mark profiles that were already written to the parquet shards (e.g. by a run from
+        before the queue existed, or csv files converted by `migrate_legacy_csvs`) as done
+
+        Inputs:
+        - sub_folder_path: string, output folder of the scraper
+        '''
+        done_ids = [(time.time(), int(i)) for i in load_written_profile_ids(sub_folder_path)]
+
+        self.connection.executemany(
+            "UPDATE jobs SET status = 'done', updated_at = ? WHERE profile_id_dummy = ? AND status != 'done'",
+            done_ids
+        )
+
+
+    def reset_in_flight(self):
+        '''
+        Put profiles left in_flight by a run that died back to pending, call at the start of a run
+        '''
+        self.connection.execute(
+            "UPDATE jobs SET status = 'pending', worker_name = NULL, updated_at = ? WHERE status = 'in_flight'",
+            (time.time(),)
+        )
+
+
+    def _claimable_filter(self, profile_ids):
+        '''
+        Build the where clause selecting profiles that can still be worked on
+        '''
+        query = "(status = 'pending' OR (status = 'failed' AND attempts < ?))"
+        params = [self.max_attempts]
+
+        if profile_ids is not None:
+            query += ' AND profile_id_dummy IN (' + ','.join('?'*len(profile_ids)) + ')'
+            params += [int(i) for i in profile_ids]
+
+        return query, params
+
+
+    def claim_next(self, worker_name, profile_ids=None):
+        '''
+        Claim the next profile that is due, returns (profile_id_dummy, profile_url)
+        or None if no profile is due right now
+
+        Inputs:
+        - worker_name: string, name of the worker claiming the profile
+        - profile_ids: list of ints, optional, only claim from these profiles
+        '''
+        claimable_query, params = self._claimable_filter(profile_ids)
+
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            job = self.connection.execute(
+                'SELECT profile_id_dummy, profile_url FROM jobs WHERE ' + claimable_query +
+                ' AND next_attempt_at <= ? ORDER BY next_attempt_at, profile_id_dummy LIMIT 1',
+                params + [time.time()]
+            ).fetchone()
+
+            if job is not None:
+                self.connection.execute(
+                    """UPDATE jobs SET status = 'in_flight', attempts = attempts + 1,
+                    worker_name = ?, updated_at = ? WHERE profile_id_dummy = ?""",
+                    (worker_name, time.time(), job[0])
+                )
+            self.connection.execute('COMMIT')
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+
+        return job
+
+
+    def seconds_until_next_retry(self, profile_ids=None):
+        '''
+        Seconds until the next claimable profile is due, None when nothing is left to do
+
+        Inputs:
+        - profile_ids: list of ints, optional, only look at these profiles
+        '''
+        claimable_query, params = self._claimable_filter(profile_ids)
+
+        next_attempt_at = self.connection.execute(
+            'SELECT MIN(next_attempt_at) FROM jobs WHERE ' + claimable_query, params
+        ).fetchone()[0]
+
+        if next_attempt_at is None:
+            return None
+
+        return max(next_attempt_at - time.time(), 0)
+
+
+    def mark_done(self, profile_id):
+        '''
+        Mark a profile as successfully scraped
+
+        Inputs:
+        - profile_id: int, profile_id_dummy of the profile
+        '''
+        self.connection.execute(
+            "UPDATE jobs SET status = 'done', last_error = NULL, updated_at = ? WHERE profile_id_dummy = ?",
+            (time.time(), int(profile_id))
+        )
+
+
+    def mark_failed(self, profile_id, error_message=''):
+        '''
+        Mark a profile as failed and schedule its retry with exponential backoff
+
+        Inputs:
+        - profile_id: int, profile_id_dummy of the profile
+        - error_message: string, error stored for debugging
+        '''
+        attempts = self.connection.execute(
+            'SELECT attempts FROM jobs WHERE profile_id_dummy = ?', (int(profile_id),)
+        ).fetchone()[0]
+
+        backoff_seconds = min(
+            self.retry_backoff_seconds * 2**max(attempts-1, 0),
+            MAX_RETRY_BACKOFF_SECONDS
+        )
+
+        self.connection.execute(
+            """UPDATE jobs SET status = 'failed', last_error = ?, next_attempt_at = ?,
+            updated_at = ? WHERE profile_id_dummy = ?""",
+            (error_message, time.time() + backoff_seconds, time.time(), int(profile_id))
+        )
+
+
+    def status_counts(self):
+        '''
+        Number of profiles in each status, as a dict
+        '''
+        return dict(self.connection.execute(
+            'SELECT status, COUNT(*) FROM jobs GROUP BY status'
+        ).fetchall())
+
+
+    def close(self):
+        '''
+        Close the sqlite connection
+        '''
+        self.connection.close()
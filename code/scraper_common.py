@@ -0,0 +1,82 @@
+'''
+Code shared by the two profile scrapers (scrape_individual_profiles.py and async_profile_pipeline.py)
+
+Note:
+- Only the error logging and the work queue set up, no browser driver is imported here,
+  so each scraper only pulls in its own driver (selenium or playwright)
+- The profile category, paths and number of profiles come from `pipeline_config.py`
+'''
+
+######### Imports #########
+
+### generic imports
+import logging
+import pandas as pd
+
+### persistent work queue
+from scrape_queue import ScrapeQueue
+
+### scraped profile category and its paths
+from pipeline_config import SCRAPE_PROFILES_CSV, SCRAPE_PROFILE_LIMIT, SCRAPE_QUEUE_FILENAME, SCRAPED_PROFILES_PATH
+
+### batched parquet output
+from profile_shards import check_legacy_csvs_migrated
+
+
+######### Initializations #########
+ERROR_LOG_STRING_FORMAT = '''
+    {section_title}
+    ---
+    {description}
+    ---
+    {error_message}
+''' + '='*60 + '\n\n'
+
+
+######### Define Helper Functions #########
+
+def error_logging_helper(log_filename:str = 'all_logs.log', logger_name:str = 'error_logger'):
+    '''
+    Helper function for logging errors
+
+    Inputs:
+    - log_filename: string, filename where to log the errors
+    - logger_name: string, name of the logger initialized
+    '''
+    logger = logging.getLogger(logger_name)
+    handler = logging.FileHandler(
+        filename=log_filename,
+        mode='a+'
+    )
+    log_format = logging.Formatter('%(asctime)s - %(message)s')
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(log_format)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    print(logger.getEffectiveLevel())
+
+    return logger
+
+
+def setup_scrape_queue(profiles_csv=SCRAPE_PROFILES_CSV, max_profiles=SCRAPE_PROFILE_LIMIT,
+                       queue_filename=SCRAPE_QUEUE_FILENAME, sub_folder_path=SCRAPED_PROFILES_PATH):
+    '''
+    Helper function for preparing the work queue at the start of a run, returns the queue.
+    Profiles that were already written are marked done and profiles left in_flight by a run that died are reset
+
+    Inputs:
+    - profiles_csv: string, cleaned profile links with the `profile_id_dummy` of every profile
+    - max_profiles: int, number of profiles (from the top of the csv) to queue
+    - queue_filename: string, sqlite file of the work queue
+    - sub_folder_path: string, output folder of the scraper
+    '''
+    profiles_df = pd.read_csv(profiles_csv)
+
+    scrape_queue = ScrapeQueue(queue_filename)
+    scrape_queue.add_profiles(profiles_df[0:max_profiles])
+    check_legacy_csvs_migrated(sub_folder_path)
+    scrape_queue.mark_existing_done(sub_folder_path)
+    scrape_queue.reset_in_flight()
+    print(scrape_queue.status_counts())
+
+    return scrape_queue
@@ -0,0 +1,108 @@
+'''
+Code for normalizing the raw skill strings scraped from the profiles
+
+Note:
+- The same few thousand skills are listed over and over, so the raw strings are deduplicated first
+  (`pd.factorize`) and every unique string is lemmatized and mapped through the skill taxonomy once,
+  then mapped back with the codes
+- Lemmas are cached in a sqlite file across runs, WordNet is only loaded when a run finds skills it has not seen before
+- The normalized skills are returned as a categorical column
+'''
+
+######### Imports #########
+
+### generic imports
+import sqlite3
+import numpy as np
+import pandas as pd
+
+
+######### Initializations #########
+SKILL_CACHE_FILENAME = 'data/skill_lemma_cache.sqlite'
+
+SKILL_CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS lemmas (
+    raw_skill TEXT PRIMARY KEY,
+    lemma TEXT NOT NULL
+);
+'''
+
+
+######### Define Helper Functions #########
+
+class SkillNormalizer:
+    '''
+    Lemmatizes and remaps skills, one lemmatization per distinct raw skill, persisted across runs
+
+    Inputs:
+    - cache_filename: string, sqlite file with the lemmas of all the skills seen so far
+    '''
+
+    def __init__(self, cache_filename=SKILL_CACHE_FILENAME):
+        self.connection = sqlite3.connect(cache_filename, timeout=60, isolation_level=None)
+        self.connection.executescript(SKILL_CACHE_SCHEMA)
+
+        self.lemmas = dict(self.connection.execute('SELECT raw_skill, lemma FROM lemmas'))
+        self.lemmatizer = None
+
+        self.cache_stats = {'cached': 0, 'lemmatized': 0}
+
+
+    def lemmatize_unique(self, raw_skills):
+        '''
+        Lemmatize distinct raw skills, only the ones missing from the cache go through WordNet.
+        Returns a dict of raw skill to lemma
+
+        Inputs:
+        - raw_skills: list of distinct strings
+        '''
+        new_skills = [i for i in raw_skills if i not in self.lemmas]
+
+        self.cache_stats['cached'] += len(raw_skills) - len(new_skills)
+        self.cache_stats['lemmatized'] += len(new_skills)
+
+        if len(new_skills) > 0:
+            if self.lemmatizer is None:
+                from nltk.stem import WordNetLemmatizer
+                self.lemmatizer = WordNetLemmatizer()
+
+            new_lemmas = [(i, self.lemmatizer.lemmatize(i.lower())) for i in new_skills]
+            self.connection.executemany('INSERT OR REPLACE INTO lemmas VALUES (?, ?)', new_lemmas)
+            self.lemmas.update(new_lemmas)
+
+        return {i: self.lemmas[i] for i in raw_skills}
+
+
+    def normalize(self, raw_skills, skill_taxonomy=None, rollup=False):
+        '''
+        Normalize a column of raw skills (one skill per row), returns a categorical series with the same index.
+        Missing values stay missing
+
+        Inputs:
+        - raw_skills: pandas series of strings
+        - skill_taxonomy: SkillTaxonomy, maps the lemmas to canonical skills (lemmas are kept as they are if None)
+        - rollup: bool, count every skill as its top most parent in the taxonomy
+        '''
+        raw_codes, raw_uniques = pd.factorize(raw_skills)
+
+        lemmas = self.lemmatize_unique(list(raw_uniques))
+        normalized_uniques = [lemmas[i] for i in raw_uniques]
+        if skill_taxonomy is not None:
+            normalized_uniques = skill_taxonomy.map_skills(normalized_uniques, rollup=rollup)
+
+        ### several raw skills can end up as the same normalized skill
+        normalized_codes, normalized_categories = pd.factorize(pd.Series(normalized_uniques, dtype=object))
+        codes = np.full(len(raw_codes), -1)
+        codes[raw_codes >= 0] = normalized_codes[raw_codes[raw_codes >= 0]]
+
+        return pd.Series(
+            pd.Categorical.from_codes(codes, categories=normalized_categories),
+            index = raw_skills.index
+        )
+
+
+    def close(self):
+        '''
+        Close the sqlite connection
+        '''
+        self.connection.close()
@@ -0,0 +1,138 @@
+'''
+Code for loading the skill taxonomy and mapping normalized skills to their canonical names
+
+Note:
+- The taxonomy lives in `data/skill_taxonomy.json` (versioned), every canonical skill has:
+    - aliases: exact names that are counted as the canonical skill
+    - patterns: regular expressions for variants (e.g. "python 3.8"), matched against the whole skill
+    - parent: optional broader skill, only used when rolling skills up (`rollup=True`)
+- Skills are matched as whole strings, so all aliases go into one hash map (a single lookup per skill) and all
+  patterns are compiled into one alternation regex, tried only for skills that are not an alias
+- The taxonomy is checked when it is loaded: an alias of two canonical skills, an alias that is itself a canonical
+  skill (alias chains such as 'data warehousing' <-> 'data warehouse architecture') or a cycle in the parents raise a ValueError
+'''
+
+######### Imports #########
+
+### generic imports
+import re
+import json
+
+
+######### Initializations #########
+SKILL_TAXONOMY_FILENAME = 'data/skill_taxonomy.json'
+
+
+######### Define Helper Functions #########
+
+class SkillTaxonomy:
+    '''
+    Compiled skill taxonomy
+
+    Inputs:
+    - taxonomy: dict, contents of the taxonomy file ({'version': ..., 'skills': {canonical: {...}}})
+    '''
+
+    def __init__(self, taxonomy):
+        self.version = taxonomy['version']
+        skills = taxonomy['skills']
+
+        self.alias_map = {}
+        for canonical, entry in skills.items():
+            for alias in entry.get('aliases', []):
+                alias = alias.lower()
+                if alias in skills:
+                    raise ValueError(
+                        'Alias "' + alias + '" of "' + canonical + '" is a canonical skill itself, merge the two entries'
+                    )
+                if self.alias_map.get(alias, canonical) != canonical:
+                    raise ValueError(
+                        'Alias "' + alias + '" belongs to both "' + self.alias_map[alias] + '" and "' + canonical + '"'
+                    )
+                self.alias_map[alias] = canonical
+
+        self.parents = {
+            canonical: entry['parent'] for canonical, entry in skills.items() if entry.get('parent', '') != ''
+        }
+        self.check_parents()
+
+        ### one named group per canonical skill, the name of the group that matched gives the canonical skill
+        self.pattern_canonicals = [canonical for canonical, entry in skills.items() if len(entry.get('patterns', [])) > 0]
+        self.pattern_regex = None
+        if len(self.pattern_canonicals) > 0:
+            self.pattern_regex = re.compile('|'.join(
+                '(?P<g' + str(idx) + '>' + '|'.join('(?:' + i + ')' for i in skills[canonical]['patterns']) + ')'
+                for idx, canonical in enumerate(self.pattern_canonicals)
+            ))
+
+
+    def check_parents(self):
+        '''
+        Raise a ValueError if following the parents of a skill ever leads back to it
+        '''
+        for canonical in self.parents:
+            seen = [canonical]
+            parent = self.parents[canonical]
+
+            while parent is not None:
+                if parent in seen:
+                    raise ValueError('Cycle in the skill parents: ' + ' -> '.join(seen + [parent]))
+                seen.append(parent)
+                parent = self.parents.get(parent)
+
+
+    def canonical_skill(self, skill):
+        '''
+        Canonical name of a single (lemmatized, lower case) skill, the skill itself if the taxonomy does not know it
+
+        Inputs:
+        - skill: string
+        '''
+        if skill in self.alias_map:
+            return self.alias_map[skill]
+
+        if self.pattern_regex is not None:
+            pattern_match = self.pattern_regex.fullmatch(skill)
+            if pattern_match is not None:
+                return self.pattern_canonicals[int(pattern_match.lastgroup[1:])]
+
+        return skill
+
+
+    def rollup_skill(self, skill):
+        '''
+        Top most parent of a canonical skill
+
+        Inputs:
+        - skill: string, canonical skill
+        '''
+        while skill in self.parents:
+            skill = self.parents[skill]
+        return skill
+
+
+    def map_skills(self, skills, rollup=False):
+        '''
+        Canonical names of a list of skills, meant to be called with the distinct skills only
+
+        Inputs:
+        - skills: list of strings
+        - rollup: bool, replace every skill with its top most parent
+        '''
+        canonical_skills = [self.canonical_skill(i) for i in skills]
+
+        if rollup:
+            canonical_skills = [self.rollup_skill(i) for i in canonical_skills]
+
+        return canonical_skills
+
+
+def load_skill_taxonomy(taxonomy_filename=SKILL_TAXONOMY_FILENAME):
+    '''
+    Helper function for loading and checking the taxonomy file
+
+    Inputs:
+    - taxonomy_filename: string, json file with the taxonomy
+    '''
+    with open(taxonomy_filename, encoding='utf-8') as f:
+        return SkillTaxonomy(json.load(f))
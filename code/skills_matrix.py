@@ -0,0 +1,278 @@
+'''
+Code for storing the cleaned skills as a long table and a sparse profile x skill matrix
+
+Note:
+- Replaces the dense one-hot pivot (one column per distinct skill, mostly zeros)
+- The long table has one row per (profile, skill), profiles without any skill keep a single row with a missing skill
+  so they still count towards the number of people. Saved as parquet with the skill as a dictionary encoded column
+- The matrix is a scipy CSR matrix with the profile ids and the skill vocabulary next to it, saved in one `.npz` file
+- Size on disk and in memory grows with the number of skill mentions instead of profiles x distinct skills
+- `SkillsMatrixWriter` writes the same two files batch by batch, only the (profile, skill) codes are kept in memory
+- `python code/skills_matrix.py` converts the wide `skills_info.csv` files of earlier runs once
+'''
+
+######### Imports #########
+
+### generic imports
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
+
+
+######### Initializations #########
+SKILLS_LONG_FILENAME = 'skills_long.parquet'
+
+SKILLS_MATRIX_FILENAME = 'skills_matrix.npz'
+
+SKILLS_LONG_SCHEMA = pa.schema([
+    ('profile_id_dummy', pa.int64()),
+    ('skill', pa.dictionary(pa.int32(), pa.string()))
+])
+
+### columns of the wide skills csv files that are not skills
+WIDE_SKILLS_ID_COLUMNS = ['profile_id_dummy', 'all_skills_link', 'skills_list', 'profile_category']
+
+
+######### Define Helper Functions #########
+
+def build_skills_long_df(profile_ids, skills):
+    '''
+    Helper function for building the long skills table from the exploded cleaned skills
+
+    Inputs:
+    - profile_ids: pandas series, profile id of every row
+    - skills: pandas series, one cleaned skill per row (missing for profiles without skills), same index as `profile_ids`
+    '''
+    skills_long_df = pd.DataFrame({
+        'profile_id_dummy': profile_ids,
+        'skill': skills
+    })
+
+    skills_long_df = skills_long_df.drop_duplicates().reset_index(drop=True)
+    skills_long_df['skill'] = skills_long_df['skill'].astype('category')
+
+    return skills_long_df
+
+
+def wide_skills_to_long_df(skills_wide_df):
+    '''
+    Helper function for converting a wide one-hot skills table (written by earlier runs) into the long table
+
+    Inputs:
+    - skills_wide_df: dataframe with one 0/1 column per skill
+    '''
+    id_columns = [i for i in ['profile_id_dummy', 'profile_category'] if i in skills_wide_df.columns]
+    skill_columns = skills_wide_df.columns.difference(WIDE_SKILLS_ID_COLUMNS)
+
+    profile_num, skill_num = np.nonzero(skills_wide_df[skill_columns].fillna(0).to_numpy() > 0)
+    skills_long_df = skills_wide_df[id_columns].iloc[profile_num].reset_index(drop=True)
+    skills_long_df['skill'] = np.asarray(skill_columns)[skill_num]
+
+    ### profiles without any skill keep a single row
+    no_skills_df = skills_wide_df.loc[
+        ~skills_wide_df.index.isin(skills_wide_df.index[profile_num]), id_columns
+    ].reset_index(drop=True)
+
+    ### a profile can have more than one wide row, its skills are only kept once
+    skills_long_df = pd.concat([skills_long_df, no_skills_df]).drop_duplicates().reset_index(drop=True)
+    skills_long_df['skill'] = skills_long_df['skill'].astype('category')
+
+    return skills_long_df
+
+
+def build_skills_matrix(skills_long_df):
+    '''
+    Helper function for building the sparse profile x skill matrix of a long skills table.
+    Returns the CSR matrix, the sorted profile id of every row and the sorted skill of every column
+
+    Inputs:
+    - skills_long_df: dataframe with the columns profile_id_dummy and skill (categorical)
+    '''
+    profile_codes, profile_ids = pd.factorize(skills_long_df['profile_id_dummy'], sort=True)
+
+    ### a categorical read from parquet or concatenated keeps its categories in first seen order,
+    ### the columns are sorted so a full run and a batched run (`SkillsMatrixWriter`) write the same matrix
+    skill_column = skills_long_df['skill'].astype('category')
+    skill_categories = skill_column.cat.reorder_categories(sorted(skill_column.cat.categories, key=str)).cat
+
+    has_skill = skill_categories.codes.to_numpy() >= 0
+
+    skills_matrix = sparse.csr_matrix(
+        (
+            np.ones(has_skill.sum(), dtype=np.int8),
+            (profile_codes[has_skill], skill_categories.codes.to_numpy()[has_skill])
+        ),
+        shape = (len(profile_ids), len(skill_categories.categories))
+    )
+    ### a skill listed twice by a profile is still a single flag
+    skills_matrix.sum_duplicates()
+    skills_matrix.data[:] = 1
+
+    return skills_matrix, np.asarray(profile_ids), np.asarray(skill_categories.categories)
+
+
+def write_skills_matrix_file(skills_matrix, profile_ids, skill_vocabulary, folder_path):
+    '''
+    Helper function for writing a sparse skills matrix with its profile ids and skill vocabulary
+
+    Inputs:
+    - skills_matrix: scipy CSR matrix, profiles x skills
+    - profile_ids: numpy array, profile id of every row (stored as int64 like `profile_id_dummy`)
+    - skill_vocabulary: numpy array, skill of every column
+    - folder_path: string, folder the file is written to
+    '''
+    np.savez_compressed(
+        os.path.join(folder_path, SKILLS_MATRIX_FILENAME),
+        data = skills_matrix.data,
+        indices = skills_matrix.indices,
+        indptr = skills_matrix.indptr,
+        shape = skills_matrix.shape,
+        profile_ids = profile_ids.astype(np.int64),
+        skill_vocabulary = skill_vocabulary.astype(str)
+    )
+
+    print('Skills Matrix: ', skills_matrix.shape, ' Mentions: ', skills_matrix.nnz)
+
+
+def save_skills_matrix(skills_long_df, folder_path):
+    '''
+    Helper function for writing the long skills table and the sparse matrix of it to a folder
+
+    Inputs:
+    - skills_long_df: dataframe with the columns profile_id_dummy and skill (categorical)
+    - folder_path: string, folder the files are written to
+    '''
+    skills_long_df.to_parquet(os.path.join(folder_path, SKILLS_LONG_FILENAME), index=False)
+
+    skills_matrix, profile_ids, skill_vocabulary = build_skills_matrix(skills_long_df)
+    write_skills_matrix_file(skills_matrix, profile_ids, skill_vocabulary, folder_path)
+
+
+class SkillsMatrixWriter:
+    '''
+    Writes the long skills table and the sparse skills matrix of a folder batch by batch.
+    The long table is appended to the parquet file, the matrix is kept as (profile, skill) codes and
+    written on `close` with the profiles and skills sorted like `build_skills_matrix`
+
+    Inputs:
+    - folder_path: string, folder the files are written to
+    '''
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.parquet_writer = pq.ParquetWriter(os.path.join(folder_path, SKILLS_LONG_FILENAME), SKILLS_LONG_SCHEMA)
+
+        self.profile_codes = {}
+        self.skill_codes = {}
+        self.row_codes = []
+        self.column_codes = []
+
+
+    def add(self, skills_long_df):
+        '''
+        Append a batch of the long skills table
+
+        Inputs:
+        - skills_long_df: dataframe with the columns profile_id_dummy and skill (categorical)
+        '''
+        skills_long_df = skills_long_df[['profile_id_dummy', 'skill']].astype({'skill': 'category'})
+        self.parquet_writer.write_table(
+            pa.Table.from_pandas(skills_long_df, schema=SKILLS_LONG_SCHEMA, preserve_index=False)
+        )
+
+        ### profiles without skills still get a row
+        for single_profile_id in skills_long_df['profile_id_dummy'].unique():
+            self.profile_codes.setdefault(single_profile_id, len(self.profile_codes))
+
+        has_skill = skills_long_df['skill'].notna()
+        for skill in skills_long_df['skill'].cat.categories:
+            self.skill_codes.setdefault(skill, len(self.skill_codes))
+
+        self.row_codes.append(skills_long_df.loc[has_skill, 'profile_id_dummy'].map(self.profile_codes).to_numpy(np.int32))
+        self.column_codes.append(
+            skills_long_df.loc[has_skill, 'skill'].astype(object).map(self.skill_codes).to_numpy(np.int32)
+        )
+
+
+    def close(self):
+        '''
+        Close the long table and write the matrix
+        '''
+        self.parquet_writer.close()
+
+        profile_ids = np.array(list(self.profile_codes.keys()))
+        skill_vocabulary = np.array(list(self.skill_codes.keys()), dtype=object)
+
+        ### new code of every profile/skill after sorting them
+        profile_order = np.argsort(profile_ids, kind='stable')
+        profile_recode = np.empty(len(profile_ids), dtype=np.int32)
+        profile_recode[profile_order] = np.arange(len(profile_ids))
+
+        skill_order = np.argsort(skill_vocabulary.astype(str), kind='stable')
+        skill_recode = np.empty(len(skill_vocabulary), dtype=np.int32)
+        skill_recode[skill_order] = np.arange(len(skill_vocabulary))
+
+        row_codes = np.concatenate(self.row_codes) if len(self.row_codes) > 0 else np.array([], dtype=np.int32)
+        column_codes = np.concatenate(self.column_codes) if len(self.column_codes) > 0 else np.array([], dtype=np.int32)
+
+        skills_matrix = sparse.csr_matrix(
+            (np.ones(len(row_codes), dtype=np.int8), (profile_recode[row_codes], skill_recode[column_codes])),
+            shape = (len(profile_ids), len(skill_vocabulary))
+        )
+        ### a profile read in two batches (scraped twice) counts a skill once
+        skills_matrix.sum_duplicates()
+        skills_matrix.data[:] = 1
+
+        write_skills_matrix_file(skills_matrix, profile_ids[profile_order], skill_vocabulary[skill_order], self.folder_path)
+
+
+def load_skills_long_df(folder_path):
+    '''
+    Helper function for reading the long skills table of a folder
+
+    Inputs:
+    - folder_path: string, folder with the skills files
+    '''
+    return pd.read_parquet(os.path.join(folder_path, SKILLS_LONG_FILENAME))
+
+
+def load_skills_matrix(folder_path):
+    '''
+    Helper function for reading the sparse skills matrix of a folder.
+    Returns the CSR matrix, the sorted profile id of every row and the sorted skill of every column
+
+    Inputs:
+    - folder_path: string, folder with the skills files
+    '''
+    with np.load(os.path.join(folder_path, SKILLS_MATRIX_FILENAME)) as matrix_file:
+        skills_matrix = sparse.csr_matrix(
+            (matrix_file['data'], matrix_file['indices'], matrix_file['indptr']),
+            shape = tuple(matrix_file['shape'])
+        )
+        return skills_matrix, matrix_file['profile_ids'], matrix_file['skill_vocabulary']
+
+
+######### Main block for converting the wide skills csv files of earlier runs #########
+
+if __name__ == '__main__':
+    import sys
+
+    ### folders with a `skills_info.csv`, defaults to the cleaned folders of all profile types
+    cleaned_folders = sys.argv[1:] if len(sys.argv) > 1 else [
+        'data/cleaned_consultant_files/',
+        'data/cleaned_cto_files/',
+        'data/cleaned_data_science_files/'
+    ]
+
+    for folder_path in cleaned_folders:
+        wide_filename = os.path.join(folder_path, 'skills_info.csv')
+        if not os.path.exists(wide_filename):
+            print('No wide skills file in ', folder_path)
+            continue
+
+        skills_long_df = wide_skills_to_long_df(pd.read_csv(wide_filename))
+        print(folder_path, skills_long_df.shape)
+        save_skills_matrix(skills_long_df, folder_path)